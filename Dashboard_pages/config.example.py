@@ -34,6 +34,34 @@ DEFAULT_GROUPING = "ディレクトリ（階層）"           # Initial grouping
 DEFAULT_DIR_DEPTH = 2                              # Directory hierarchy depth
 DEFAULT_SHOW_ONLY_OPEN_GROUPS = False              # Show only OPEN groups initially
 
+# --- Cache DB Storage Format ---
+# Default: uncompressed JSON (the PR list reads only the fields it needs inside SQLite).
+# Compress only the tables where DB size matters more:
+#   "zlib-json", "zstd-json" (requires: pip install zstandard), "msgpack" / "zlib-msgpack" (requires: pip install msgpack)
+# Changing this rewrites the existing rows on the next start
+STORAGE_CODECS = {
+    # "issue_cache": "zlib-json",
+}
+
+# --- Business Calendar (used for business-hours / business-day metrics) ---
+# Default: weekdays, all day, UTC. Example for a team in Japan:
+#   "regions": ["JP"],                           # National holidays (requires: pip install holidays)
+#   "holidays": ["12-29/01-03", "08-13/08-15"],  # Company holidays ("YYYY-MM-DD" also accepted)
+#   "hours": (9, 18),                            # Working hours window (None = all day)
+#   "tz": "Asia/Tokyo",
+BUSINESS_CALENDAR = {
+    "weekmask": "1111100",   # Mon..Sun working days (1 = working)
+    "regions": [],
+    "holidays": [],
+    "hours": None,
+    "tz": "UTC",
+}
+
+# --- Four Keys Failure Detection ---
+# A merged PR whose title or labels contain any of these (case-insensitive) counts as a failure
+# Changing this rebuilds the Four Keys rollups on the next start
+FOUR_KEYS_FAILURE_KEYWORDS = ["revert", "hotfix", "urgent", "fix", "rollback", "emergency", "critical"]
+
 # --- GitHub Enterprise Configuration ---
 # Only set this if you're using GitHub Enterprise Server
 # Leave empty for github.com
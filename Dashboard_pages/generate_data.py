@@ -17,6 +17,7 @@ sys.path.insert(0, str(parent_dir / "dashboard"))
 try:
     import config
     import db_cache
+    import business_hours
 except ImportError as e:
     print(f"Error importing dashboard modules: {e}")
     print("Make sure the dashboard directory is accessible")
@@ -60,10 +61,21 @@ def generate_prs_json(output_dir: Path, repositories: list):
             try:
                 cached_prs = db_cache.load_prs(owner, repo)
                 
+                # Business hours/days until merge/close/now on the shared calendar (config.BUSINESS_CALENDAR)
+                # The static pages read businessHours / businessDays instead of their own approximation
+                now_iso = datetime.now(timezone.utc).isoformat()
+                calendar = business_hours.default_calendar()
+                hours = calendar.business_hours(
+                    [pr.get('createdAt') for pr in cached_prs],
+                    [pr.get('mergedAt') or pr.get('closedAt') or now_iso for pr in cached_prs]
+                )
+                
                 # Add owner/repo to each PR for filtering
-                for pr in cached_prs:
+                for pr, pr_hours in zip(cached_prs, hours):
                     pr['owner'] = owner
                     pr['repo'] = repo
+                    pr['businessHours'] = round(float(pr_hours), 2)
+                    pr['businessDays'] = round(float(pr_hours) / calendar.hours_per_day, 2)
                 
                 all_prs.extend(cached_prs)
                 print(f"    Loaded {len(cached_prs)} PRs from cache")
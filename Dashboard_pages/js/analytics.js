@@ -82,6 +82,12 @@ function loadResidenceAnalysis() {
     openPRs.forEach(pr => {
         const created = new Date(pr.createdAt);
         pr.age_hours = (now - created) / (1000 * 60 * 60);
+        // generate_data.py が共通の営業カレンダーで計算した値があればそれを使う
+        if (typeof pr.businessHours === 'number') {
+            pr.business_hours = pr.businessHours;
+            pr.business_days = typeof pr.businessDays === 'number' ? pr.businessDays : pr.businessHours / 24;
+            return;
+        }
         try {
             if (typeof calculateBusinessHours === 'function') {
                 const bh = calculateBusinessHours(pr.createdAt, now);
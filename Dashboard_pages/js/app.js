@@ -985,7 +985,13 @@ function enrichPRData() {
         const createdDt = pr.createdAt ? new Date(pr.createdAt) : now;
         pr.age_hours = Math.max(0, (endRef - createdDt) / (1000 * 60 * 60));
 
-        // Business hours/days (utilの高精度計算を優先。フェールバックに簡易版)
+        // Business hours/days (generate_data.py が共通の営業カレンダーで計算した値を優先。
+        // 無ければutilの高精度計算、フェールバックに簡易版)
+        if (typeof pr.businessHours === 'number') {
+            pr.business_hours = pr.businessHours;
+            pr.business_days = typeof pr.businessDays === 'number' ? pr.businessDays : pr.businessHours / 24;
+            return;
+        }
         try {
             if (typeof window.calculateBusinessHours === 'function') {
                 const bh = window.calculateBusinessHours(pr.createdAt, endRef);
@@ -1,7 +1,13 @@
 # action_tracker.py - PRのアクション担当者を判定
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Optional
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+# classify_actions の列（determine_action_owner の戻り値と同じキー）
+ACTION_COLUMNS = ["action", "waiting_for", "reason"]
+
 def determine_action_owner(pr: dict) -> Dict:
     """
     PRの現在のアクション担当者を判定
@@ -149,3 +155,140 @@ def format_action_for_hover(pr: dict) -> str:
         waiting += f" (+{len(action_info['waiting_for']) - 3})"
     
     return f"{action_info['reason']} → {waiting}"
+
+
+def _list_column(prs: pd.DataFrame, column: str) -> pd.Series:
+    """リスト型の列を行位置（0..n-1）のインデックスで展開する（無い列・欠損・空リストは行なし）"""
+    if column not in prs.columns:
+        return pd.Series([], dtype=object)
+    return pd.Series(prs[column].to_numpy(), index=np.arange(len(prs))).explode().dropna()
+
+
+def _latest_reviews(prs: pd.DataFrame) -> pd.DataFrame:
+    """
+    PR×レビュアーごとの最新レビュー（1行 = 1人）
+    列: pr（行位置）, reviewer, state。行は PRごとに新しいレビュー順（同時刻は元の並び順）
+    """
+    exploded = _list_column(prs, "review_details")
+    details = exploded.tolist()
+    reviews = pd.DataFrame({
+        "author": pd.Series([d.get("author") for d in details], dtype=object),
+        "state": pd.Series([d.get("state") for d in details], dtype=object),
+        "createdAt": pd.Series([d.get("createdAt") for d in details], dtype=object),
+    })
+    reviews["pr"] = exploded.index.to_numpy(dtype=np.int64)
+    reviews["seq"] = np.arange(len(reviews))
+    # 作成日時は文字列のまま比較する（欠損は最も古い扱い）。昇順の連番にしておく
+    reviews["created_rank"], _ = pd.factorize(reviews["createdAt"].fillna("").astype(str), sort=True)
+    reviews = reviews[reviews["author"].notna() & (reviews["author"] != "")]
+    latest = reviews.loc[reviews.groupby(["pr", "author"], sort=False)["created_rank"].idxmax()]
+    latest = latest.sort_values(["pr", "created_rank", "seq"], ascending=[True, False, True])
+    return latest.rename(columns={"author": "reviewer"})[["pr", "reviewer", "state"]]
+
+
+def _collect(pr: np.ndarray, values: np.ndarray, n: int) -> List[list]:
+    """行位置 pr ごとに values をリストにまとめる（順序は保つ。長さ n, 無い行は空リスト）"""
+    lists = [[] for _ in range(n)]
+    for position, value in zip(pr.tolist(), values.tolist()):
+        lists[position].append(value)
+    return lists
+
+
+def classify_actions(prs: pd.DataFrame) -> pd.DataFrame:
+    """
+    determine_action_owner をPRのDataFrame全体にまとめて適用する
+    review_details を展開した表から人ごとの最新レビューを求め、判定は列単位で行う
+    Returns: prs と同じ index の DataFrame（列: action, waiting_for, reason）
+    """
+    n = len(prs)
+    positions = np.arange(n)
+    state = prs["state"] if "state" in prs.columns else pd.Series([None] * n, index=prs.index)
+    author = prs["author"] if "author" in prs.columns else pd.Series([None] * n, index=prs.index)
+    
+    def numeric(column: str) -> np.ndarray:
+        if column not in prs.columns:
+            return np.zeros(n)
+        return pd.to_numeric(prs[column], errors="coerce").fillna(0).to_numpy()
+    
+    latest = _latest_reviews(prs)
+    per_pr = latest.groupby("pr", sort=False)
+    reviewed = per_pr.size().reindex(positions, fill_value=0).to_numpy()
+    approved = (latest["state"] == "APPROVED").groupby(latest["pr"]).sum().reindex(positions, fill_value=0)
+    changes = latest[latest["state"] == "CHANGES_REQUESTED"]
+    changes_by = np.array([", ".join(users) for users in
+                           _collect(changes["pr"].to_numpy(), changes["reviewer"].to_numpy(), n)], dtype=object)
+    
+    # 待ちレビュアー: 依頼中でまだレビューしていない人（依頼順）→ COMMENTED のみの人（最新レビュー順）
+    requested = _list_column(prs, "requested_reviewers_list")
+    requested = pd.DataFrame({"pr": requested.index.to_numpy(), "user": requested.to_numpy()})
+    has_requests = requested.groupby("pr").size().reindex(positions, fill_value=0).to_numpy() > 0
+    done = pd.MultiIndex.from_arrays([latest["pr"], latest["reviewer"]])
+    not_reviewed = requested[~pd.MultiIndex.from_arrays([requested["pr"], requested["user"]]).isin(done)]
+    commented = latest.loc[latest["state"] == "COMMENTED", ["pr", "reviewer"]].rename(columns={"reviewer": "user"})
+    waiting = pd.concat([not_reviewed, commented], ignore_index=True)
+    waiting_reviewers = np.empty(n, dtype=object)
+    waiting_reviewers[:] = _collect(waiting["pr"].to_numpy(), waiting["user"].to_numpy(), n)
+    waiting_count = np.fromiter((len(users) for users in waiting_reviewers), dtype=np.int64, count=n)
+    
+    unresolved = numeric("unresolved_threads")
+    unresolved_text = (prs["unresolved_threads"].astype(str).to_numpy() if "unresolved_threads" in prs.columns
+                       else np.full(n, "0"))
+    conditions = [
+        state.isin(["CLOSED", "MERGED"]).to_numpy(),
+        numeric("changes_requested") > 0,
+        unresolved > 0,
+        waiting_count > 0,
+        approved.to_numpy() > 0,
+        ~has_requests & (reviewed == 0),
+    ]
+    action = np.select(conditions, ["none", "author", "author", "reviewers", "ready_to_merge", "author"],
+                       default="unknown")
+    # 待っている人: 0 = なし, 1 = 作成者, 2 = 待ちレビュアー
+    waiting_kind = np.select(conditions, [0, 1, 1, 2, 1, 1], default=0)
+    has_author = (author.notna() & (author != "")).tolist()
+    authors = author.tolist()
+    waiting_for = [
+        waiting_reviewers[i] if kind == 2 else [authors[i]] if kind == 1 and has_author[i] else []
+        for i, kind in enumerate(waiting_kind.tolist())
+    ]
+    reasons = [
+        "PR is " + state.astype(str).to_numpy().astype(object),
+        "修正要求あり (by: " + changes_by + ")",
+        "未解決の会話あり (" + unresolved_text.astype(object) + "件)",
+        "レビュー待ち (" + waiting_count.astype(str).astype(object) + "人)",
+        "マージ可能 (承認: " + approved.to_numpy().astype(str).astype(object) + "人)",
+        np.full(n, "レビュー依頼なし", dtype=object),
+    ]
+    reason = np.select(conditions, reasons, default="状態不明")
+    return pd.DataFrame({"action": action, "waiting_for": waiting_for, "reason": reason}, index=prs.index)
+
+
+def format_actions_for_hover(actions: pd.DataFrame) -> pd.Series:
+    """format_action_for_hover の列版（classify_actions の結果から作る）"""
+    waiting = actions["waiting_for"]
+    extra = waiting.str.len() - 3
+    text = waiting.str[:3].str.join(", ")
+    text = text.where(extra <= 0, text + " (+" + extra.astype(str) + ")")
+    return (actions["reason"] + " → " + text).where(actions["action"] != "none", "")
+
+
+def action_summary_frame(prs: pd.DataFrame, actions: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    人ごとにアクションが必要なOPENのPR（build_action_summary の DataFrame版）
+    Returns: index が (user, number) の DataFrame（列: prs の列 + role, action, reason）
+             行の順は build_action_summary と同じ（人の初出順、人ごとにPRの順）
+             人ごとの集計は groupby(level="user", sort=False) で行う
+    """
+    if actions is None:
+        actions = classify_actions(prs)
+    open_mask = (prs["state"] == "OPEN").to_numpy()
+    rows = prs[open_mask].copy()
+    for column in ACTION_COLUMNS:
+        rows[column] = actions[column].to_numpy()[open_mask]
+    rows = rows.explode("waiting_for").dropna(subset=["waiting_for"]).rename(columns={"waiting_for": "user"})
+    # 人の初出順に並べ直す（同じ人の中ではPRの順を保つ）
+    codes, _ = pd.factorize(rows["user"])
+    rows = rows.iloc[np.argsort(codes, kind="stable")]
+    rows["role"] = np.where(rows["user"] == rows["author"], "author", "reviewer")
+    return rows.set_index(["user", "number"])
+
@@ -0,0 +1,94 @@
+# analytics_engine.py
+"""
+分析ページの集計エンジン（DuckDB, 任意）
+
+DuckDB がインストールされていれば pr_cache.db を読み取り専用でアタッチし、
+正規化テーブル（pull_requests, reviews, pr_files など）への集計SQLを
+DuckDB のベクトル化・マルチスレッド実行で処理する。
+DuckDB が無い・sqlite 拡張を読み込めない環境では同じSQLを SQLite（db_cache）で実行する。
+SQLは両者の共通部分（? プレースホルダ、標準的な集計関数）で書くこと。
+
+    df = analytics_engine.query("SELECT state, COUNT(*) AS n FROM pull_requests GROUP BY state")
+    stats = analytics_engine.reviewer_stats(owner, repo, since=cutoff_dt)
+"""
+import threading
+from typing import Optional, List, Sequence
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # DuckDB は任意（無ければ SQLite で集計する）
+    duckdb = None
+
+import db_cache
+
+_local = threading.local()
+_disabled_reason: Optional[str] = None
+
+
+def _duckdb_connection():
+    """
+    スレッドごとに再利用する DuckDB 接続（DB_PATH ごとに1つ）
+    使えない場合は None（理由は engine_name() で確認できる）
+    """
+    global _disabled_reason
+    if duckdb is None or _disabled_reason:
+        return None
+    path = str(db_cache.DB_PATH)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        # スキーマ作成・移行は db_cache 側で済ませておく
+        db_cache.get_connection()
+        try:
+            conn = duckdb.connect()
+            try:
+                conn.execute("LOAD sqlite")
+            except duckdb.Error:
+                conn.execute("INSTALL sqlite")
+                conn.execute("LOAD sqlite")
+            escaped = path.replace("'", "''")
+            conn.execute(f"ATTACH '{escaped}' AS cache (TYPE sqlite, READ_ONLY)")
+            conn.execute("USE cache")
+        except duckdb.Error as e:
+            _disabled_reason = str(e)
+            print(f"[WARN] DuckDB unavailable, using SQLite for analytics: {e}")
+            return None
+        connections[path] = conn
+    return conn
+
+
+def engine_name() -> str:
+    """実際に使われる集計エンジン（"duckdb" または "sqlite"）"""
+    return "duckdb" if _duckdb_connection() is not None else "sqlite"
+
+
+def query(sql: str, params: Sequence = ()) -> pd.DataFrame:
+    """
+    集計SQLを実行して DataFrame を返す
+    DuckDB が使えれば DuckDB で、使えなければ SQLite で実行する
+    """
+    conn = _duckdb_connection()
+    if conn is None:
+        return pd.read_sql_query(sql, db_cache.get_connection(), params=list(params))
+    return conn.execute(sql, list(params)).df()
+
+
+def reviewer_stats(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """レビュワー別の集計（列は db_cache.reviewer_stats と同じ）"""
+    return db_cache.reviewer_stats(owner, repo, since=since, states=states, read_sql=query)
+
+
+def file_change_stats(owner: str, repo: str, since=None, states: Optional[List[str]] = None,
+                      limit: Optional[int] = None) -> pd.DataFrame:
+    """ファイル別の変更頻度（列は db_cache.file_change_stats と同じ）"""
+    return db_cache.file_change_stats(owner, repo, since=since, states=states, limit=limit, read_sql=query)
+
+
+def weekly_pr_counts(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """週×ステータスごとのPR作成数（列は db_cache.weekly_pr_counts と同じ）"""
+    return db_cache.weekly_pr_counts(owner, repo, since=since, states=states, read_sql=query)
@@ -4,7 +4,7 @@ from datetime import datetime, timezone, timedelta
 import threading
 import config
 import db_cache
-import fetcher
+from fetch_data import fetch_pr_stream
 
 st.set_page_config(
     page_title="GitHub PR Dashboard",
@@ -180,9 +180,8 @@ def check_and_update_cache():
             'age_hours': None
         }
     
-    # 最終更新時刻
-    latest_fetch_str = cache_info['latest_fetch']
-    latest_fetch = datetime.fromisoformat(latest_fetch_str.replace('Z', '+00:00'))
+    # 最終取得時刻（差分同期で変更なしの場合も同期時刻が反映される）
+    latest_fetch = datetime.fromisoformat(cache_info['latest_fetch'].replace('Z', '+00:00'))
     now = datetime.now(timezone.utc)
     age = now - latest_fetch
     age_hours = age.total_seconds() / 3600
@@ -216,23 +215,10 @@ def auto_update_background():
         # fetch_data.py と同じロジック
         cutoff_dt = datetime.now(timezone.utc) - timedelta(days=config.DEFAULT_DAYS)
         
-        etag_info = db_cache.get_etag(owner, repo)
-        etag = etag_info["etag"] if etag_info else None
-        last_modified = etag_info["last_modified"] if etag_info else None
-        
-        pr_list, new_etag, new_last_modified, is_modified = fetcher.run_query(
-            owner, repo,
-            cutoff_dt=cutoff_dt,
-            etag=etag,
-            last_modified=last_modified
-        )
-        
-        # ETag情報を保存
-        if new_etag or new_last_modified:
-            db_cache.save_etag(owner, repo, new_etag, new_last_modified)
-        
-        if is_modified and pr_list:
-            db_cache.save_prs(owner, repo, pr_list)
+        # ページごとに保存し、全ページ保存後に最高水位を更新する
+        result = fetch_pr_stream(owner, repo, cutoff_dt)
+        if result["pr_status"] == "error":
+            raise RuntimeError(result.get("pr_error"))
         
         st.session_state.auto_update_done = True
     except Exception as e:
@@ -0,0 +1,293 @@
+# async_fetcher.py
+"""
+asyncio版のGitHub APIクライアント（aiohttp）
+
+fetcher.py の同期API（requests.Session）と同じクエリ・正規化処理を使い、
+ネットワーク待ちを重ねられる iter_pr_pages / iter_issue_pages（と run_query / run_issue_query）を提供する。
+1つの AsyncGitHubClient が接続プール（keep-alive, gzip）を管理し、GraphQL と REST の両方で共有できる。
+同時実行数・最小リクエスト間隔・レートリミット時の一時停止は同期側と同じ REQUEST_BUDGET に従い、
+ページサイズは AdaptivePager で調整する。
+
+    async with AsyncGitHubClient(max_concurrency=4) as client:
+        prs, _ = await run_query(client, owner, repo, cutoff_dt)
+"""
+import os
+import json
+import asyncio
+import time
+import datetime as dt
+from contextlib import asynccontextmanager
+from typing import Optional, List, Tuple, AsyncIterator
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp は --async 利用時のみ必要
+    aiohttp = None
+
+from fetcher import (
+    API_URL_DEFAULT, PR_QUERY, ISSUE_QUERY, PR_PAGE_SIZE, ISSUE_PAGE_SIZE,
+    PR_CONNECTION_QUERIES, THREAD_COMMENTS_QUERY, SCHEDULER, REQUEST_BUDGET, RateLimitScheduler, AdaptivePager,
+    normalize_pr, normalize_issue, rate_limit_wait,
+)
+from dateutil import parser as dp
+
+# リトライ対象のステータスとバックオフ（fetcher のRetry設定に合わせる）
+RETRY_STATUSES = {502, 503, 504, 520, 522}
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.2
+# REQUEST_BUDGET の枠が空くのを待つ間隔（秒）
+SLOT_POLL_SECONDS = 0.05
+
+
+class AsyncGitHubClient:
+    """
+    GraphQL/REST共通の非同期クライアント
+    セッションは async with の間だけ保持し、接続はkeep-aliveで再利用する。
+    リクエストは同期側と共有の REQUEST_BUDGET の枠（同時実行数・最小間隔・一時停止）を取ってから送る。
+    """
+
+    def __init__(self, token: Optional[str] = None, max_concurrency: int = 4, timeout: int = 30):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the async client (pip install aiohttp)")
+        self.token = token or os.getenv("GITHUB_TOKEN")
+        if not self.token:
+            raise RuntimeError("GITHUB_TOKEN is not set")
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Accept-Encoding": "gzip, deflate",
+            },
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    @asynccontextmanager
+    async def _slot(self):
+        """REQUEST_BUDGET.slot の非同期版（枠が空くまでイベントループを止めずに待つ）"""
+        while (delay := REQUEST_BUDGET.try_acquire()) is None:
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            REQUEST_BUDGET.release()
+    
+    async def _request(self, method: str, url: str, **kwargs) -> Tuple[int, dict, str, float]:
+        """
+        REQUEST_BUDGET の枠を取ってリクエストを送る
+        5xx はバックオフ付きで再試行し、レートリミット応答では同期側も含めて全体を一時停止させる。
+        Returns: (status, headers, body, 最後のリクエストの往復秒数)
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            async with self._slot():
+                started = time.monotonic()
+                async with self._session.request(method, url, **kwargs) as resp:
+                    body = await resp.text()
+                    status, headers = resp.status, dict(resp.headers)
+                elapsed = time.monotonic() - started
+            wait = rate_limit_wait(status, headers)
+            if wait is not None and attempt == 0:
+                REQUEST_BUDGET.pause(min(wait, RateLimitScheduler.MAX_WAIT_SECONDS))
+                continue
+            if status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+                continue
+            return status, headers, body, elapsed
+        return status, headers, body, elapsed
+
+    async def graphql(self, query: str, variables: dict, kind: str) -> Tuple[dict, dict, float]:
+        """
+        GraphQLを実行し、rateLimit をスケジューラに記録して (headers, data, 往復秒数) を返す
+        往復秒数は AdaptivePager 用（枠待ち・一時停止・再試行の待機は含めない）
+        """
+        SCHEDULER.before_request(kind)
+        status, headers, body, elapsed = await self._request(
+            "POST", API_URL_DEFAULT, json={"query": query, "variables": variables})
+        if status >= 400:
+            raise RuntimeError(f"GraphQL HTTP error: {status} - {body[:200]}")
+        data = json.loads(body)
+        if "errors" in data:
+            msgs = []
+            for err in data["errors"]:
+                path = ".".join(str(p) for p in err.get("path", [])) if err.get("path") else ""
+                msgs.append(f"{err.get('message')}({path})")
+            raise RuntimeError("GraphQL errors: " + " | ".join(msgs))
+        SCHEDULER.observe((data.get("data") or {}).get("rateLimit"), kind)
+        return headers, data, elapsed
+
+    async def rest_get(self, url: str, params: Optional[dict] = None,
+                       headers: Optional[dict] = None) -> Tuple[int, str, Optional[object]]:
+        """REST GET。Returns: (status, 本文, JSON（200以外は None）)"""
+        status, _, body, _ = await self._request("GET", url, params=params, headers=headers)
+        return status, body, json.loads(body) if status == 200 else None
+
+
+async def _fetch_remaining_nodes(client: AsyncGitHubClient, query: str, node_id: str,
+                                 cursor: Optional[str]) -> List[dict]:
+    nodes = []
+    while True:
+        _, data, _ = await client.graphql(query, {"id": node_id, "cursor": cursor}, "pr_detail")
+        node = (data.get("data") or {}).get("node") or {}
+        conn = next(iter(node.values()), None) if node else None
+        if not conn:
+            break
+        nodes.extend(conn.get("nodes") or [])
+        if not conn["pageInfo"]["hasNextPage"]:
+            break
+        cursor = conn["pageInfo"]["endCursor"]
+    return nodes
+
+
+async def complete_pr_node(client: AsyncGitHubClient, n: dict) -> dict:
+    """fetcher.complete_pr_node の非同期版。追加取得は並行に行う"""
+    async def fill(conn: dict, query: str, node_id: str):
+        conn["nodes"] = (conn.get("nodes") or []) + await _fetch_remaining_nodes(
+            client, query, node_id, conn["pageInfo"].get("endCursor"))
+        conn["pageInfo"] = {"hasNextPage": False, "endCursor": None}
+
+    tasks = []
+    for field, query in PR_CONNECTION_QUERIES.items():
+        conn = n.get(field) or {}
+        if (conn.get("pageInfo") or {}).get("hasNextPage") and n.get("id"):
+            tasks.append(fill(conn, query, n["id"]))
+    await asyncio.gather(*tasks)
+    # スレッド一覧が揃ってからコメントを補完する
+    tasks = []
+    for thread in (n.get("reviewThreads") or {}).get("nodes") or []:
+        comments = thread.get("comments") or {}
+        if (comments.get("pageInfo") or {}).get("hasNextPage") and thread.get("id"):
+            tasks.append(fill(comments, THREAD_COMMENTS_QUERY, thread["id"]))
+    await asyncio.gather(*tasks)
+    return n
+
+
+async def iter_pr_pages(
+    client: AsyncGitHubClient,
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50,
+    updated_since: Optional[dt.datetime] = None,
+    cursor: Optional[str] = None
+) -> AsyncIterator[Tuple[List[dict], Optional[str]]]:
+    """fetcher.iter_pr_pages の非同期版（返す値・次ページのカーソルの扱いも同じ）"""
+    order_field = "UPDATED_AT" if updated_since else "CREATED_AT"
+    pages = 0
+    pager = AdaptivePager()
+
+    while pages < max_pages:
+        variables = {
+            "owner": owner, "name": repo, "cursor": cursor, "orderField": order_field,
+            "pageSize": SCHEDULER.page_size(pager.size, "pr"),
+        }
+        try:
+            _, data, elapsed = await client.graphql(PR_QUERY, variables, "pr")
+        except (aiohttp.ClientError, TimeoutError, RuntimeError) as e:
+            if pager.shrink(e):
+                continue
+            raise
+        pager.observe(elapsed)
+
+        repo_obj = (data.get("data") or {}).get("repository")
+        if not repo_obj:
+            raise RuntimeError(f"Repository not found or inaccessible: {owner}/{repo}")
+
+        prs = repo_obj["pullRequests"]
+        accepted, quit_early = [], False
+        for n in prs["nodes"] or []:
+            if updated_since and dp.parse(n["updatedAt"]) < updated_since:
+                quit_early = True
+                break
+            if cutoff_dt and dp.parse(n["createdAt"]) < cutoff_dt:
+                if updated_since:
+                    continue
+                quit_early = True
+                break
+            accepted.append(n)
+        completed = await asyncio.gather(*(complete_pr_node(client, n) for n in accepted))
+        pages += 1
+        done = quit_early or not prs["pageInfo"]["hasNextPage"]
+        cursor = None if done else prs["pageInfo"]["endCursor"]
+        yield [normalize_pr(n) for n in completed], cursor
+        if done:
+            break
+
+
+async def run_query(
+    client: AsyncGitHubClient,
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50,
+    updated_since: Optional[dt.datetime] = None
+) -> Tuple[List[dict], bool]:
+    """fetcher.run_query の非同期版（戻り値も同じ）"""
+    all_prs = []
+    async for page_prs, _ in iter_pr_pages(client, owner, repo, cutoff_dt, max_pages, updated_since):
+        all_prs.extend(page_prs)
+
+    is_modified = bool(all_prs) if updated_since else True
+    return all_prs, is_modified
+
+
+async def iter_issue_pages(
+    client: AsyncGitHubClient,
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50,
+    cursor: Optional[str] = None
+) -> AsyncIterator[Tuple[List[dict], Optional[str]]]:
+    """fetcher.iter_issue_pages の非同期版（返す値・次ページのカーソルの扱いも同じ）"""
+    pages = 0
+
+    while pages < max_pages:
+        variables = {
+            "owner": owner, "name": repo, "cursor": cursor,
+            "pageSize": SCHEDULER.page_size(ISSUE_PAGE_SIZE, "issue"),
+        }
+        _, data, _ = await client.graphql(ISSUE_QUERY, variables, "issue")
+
+        repo_obj = (data.get("data") or {}).get("repository")
+        if not repo_obj:
+            raise RuntimeError(f"Repository not found or inaccessible: {owner}/{repo}")
+
+        issues = repo_obj["issues"]
+        page_issues, quit_early = [], False
+        for n in issues["nodes"] or []:
+            if cutoff_dt and dp.parse(n["createdAt"]) < cutoff_dt:
+                quit_early = True
+                break
+            page_issues.append(normalize_issue(n))
+        pages += 1
+        done = quit_early or not issues["pageInfo"]["hasNextPage"]
+        cursor = None if done else issues["pageInfo"]["endCursor"]
+        yield page_issues, cursor
+        if done:
+            break
+
+
+async def run_issue_query(
+    client: AsyncGitHubClient,
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50
+) -> List[dict]:
+    """fetcher.run_issue_query の非同期版"""
+    all_issues = []
+    async for page_issues, _ in iter_issue_pages(client, owner, repo, cutoff_dt, max_pages):
+        all_issues.extend(page_issues)
+    return all_issues
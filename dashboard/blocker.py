@@ -0,0 +1,198 @@
+# blocker.py
+"""
+OPEN PR の未クローズ原因（ブロッカー）の推定（列単位のベクトル化版）
+
+従来ページごとにあった infer_blocker（1行ずつ if/else を辿る）と同じ判定を、
+ルールごとの真偽マスク（列の比較）にして np.select で一度に選ぶ。
+マスクは先に並んだルールが優先され、どれにも当たらなければ "Unknown"、
+OPEN 以外の行は None になる（従来と同じ）。
+
+ルールの順序は order で入れ替えられる（ラベルは RULES のキー）。
+Stale は「マージ可能で経過時間が stale_hours 以上」または「経過時間が stale_hours 以上」で、
+Ready to merge より後に置けば従来の判定と一致する。
+
+    open_prs["blocker"] = blocker.classify_blockers(open_prs, stale_hours=168)
+
+python blocker.py で従来の判定との一致確認とベンチマーク（2万件）を行う。
+"""
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STALE_HOURS = 168
+UNKNOWN = "Unknown"
+
+CHECKS_FAILING = ("FAILURE", "FAILED")
+CHECKS_PENDING = ("PENDING", "EXPECTED")
+CONFLICT_STATUSES = ("DIRTY", "BEHIND", "BLOCKED")
+READY_STATUSES = ("CLEAN", "UNSTABLE", "HAS_HOOKS")
+
+
+def _column(prs: pd.DataFrame, name: str) -> pd.Series:
+    """列（無ければ全行 None。row.get(name) と同じ扱い）"""
+    if name in prs.columns:
+        return prs[name]
+    return pd.Series([None] * len(prs), index=prs.index, dtype=object)
+
+
+def _truthy(values: pd.Series) -> np.ndarray:
+    """Python の真偽値と同じ判定（None・False・0・空文字は偽、NaN は真）"""
+    if not isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        if pd.api.types.is_bool_dtype(values.dtype):
+            return values.to_numpy()
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            return values.to_numpy() != 0
+    return values.to_numpy(dtype=object).astype(bool)
+
+
+class _Labels:
+    """文字列の列を一度だけ factorize し、値の判定は重複を除いた値に対して行う"""
+
+    def __init__(self, values: pd.Series):
+        self.codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self.uniques = list(uniques)
+
+    def isin(self, choices: Sequence[str], transform: Optional[Callable] = None) -> np.ndarray:
+        uniques = self.uniques if transform is None else [transform(u) for u in self.uniques]
+        matched = np.array([u in choices for u in uniques] + [False], dtype=bool)
+        return matched[self.codes]  # 欠損（-1）は末尾の False
+
+
+def _positive(values: pd.Series) -> np.ndarray:
+    """値 > 0（欠損・数値でない値は偽）"""
+    return (pd.to_numeric(values, errors="coerce") > 0).to_numpy()
+
+
+def _features(prs: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """ルールが参照する列（行ごとの真偽・数値の配列）"""
+    review_decision = _Labels(_column(prs, "reviewDecision"))
+    merge_state = _Labels(_column(prs, "mergeStateStatus"))
+    mergeable = _Labels(_column(prs, "mergeable"))
+    checks = _Labels(_column(prs, "checks_state"))
+
+    # float(age_hours or 0.0): 偽の値は 0、NaN はそのまま（どの比較も偽になる）
+    age_hours = _column(prs, "age_hours")
+    age = pd.to_numeric(age_hours, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    age = np.where(_truthy(age_hours), age, 0.0)
+
+    return {
+        "draft": _truthy(_column(prs, "isDraft")),
+        "changes_requested": review_decision.isin(["CHANGES_REQUESTED"])
+                             | _positive(_column(prs, "changes_requested")),
+        "checks_failing": checks.isin(CHECKS_FAILING, transform=str.upper),
+        "checks_pending": checks.isin(CHECKS_PENDING, transform=str.upper),
+        "conflict": mergeable.isin(["CONFLICTING"]) | merge_state.isin(CONFLICT_STATUSES),
+        "review_required": review_decision.isin(["REVIEW_REQUIRED"]),
+        "has_reviewers": _positive(_column(prs, "requested_reviewers")),
+        "mergeable": mergeable.isin(["MERGEABLE"]) | merge_state.isin(READY_STATUSES),
+        "age": age,
+    }
+
+
+# ラベル → マスク（引数: _features の結果, stale_hours）。並び順が既定の優先順位
+RULES: Dict[str, Callable[[Dict[str, np.ndarray], float], np.ndarray]] = {
+    "Draft": lambda f, stale: f["draft"],
+    "Changes requested": lambda f, stale: f["changes_requested"],
+    "Checks failing": lambda f, stale: f["checks_failing"],
+    "Checks pending": lambda f, stale: f["checks_pending"],
+    "Merge conflict": lambda f, stale: f["conflict"],
+    "Waiting for review": lambda f, stale: f["review_required"] & f["has_reviewers"],
+    "No reviewer": lambda f, stale: f["review_required"] & ~f["has_reviewers"],
+    "Ready to merge": lambda f, stale: f["mergeable"] & (f["age"] < stale),
+    # 経過時間が NaN の場合、マージ可能なら Stale・そうでなければ Unknown（従来どおり）
+    "Stale": lambda f, stale: (f["mergeable"] & ~(f["age"] < stale)) | (f["age"] >= stale),
+}
+DEFAULT_ORDER = tuple(RULES)
+
+
+def classify_blockers(
+    prs: pd.DataFrame,
+    stale_hours: float = DEFAULT_STALE_HOURS,
+    order: Optional[Sequence[str]] = None
+) -> pd.Series:
+    """
+    PRごとのブロッカー（infer_blocker の列版）
+    Args:
+        prs: PRのDataFrame（列が無い項目は未設定として扱う）
+        stale_hours: Stale とみなす経過時間
+        order: 判定するルールの順（RULES のキー。省略時は DEFAULT_ORDER）
+    Returns: prs と同じ index の Series（OPEN 以外は None）
+    """
+    order = DEFAULT_ORDER if order is None else tuple(order)
+    unknown_rules = [label for label in order if label not in RULES]
+    if unknown_rules:
+        raise ValueError(f"Unknown blocker rules: {unknown_rules} (available: {list(RULES)})")
+
+    features = _features(prs)
+    is_open = _Labels(_column(prs, "state")).isin(["OPEN"])
+    conditions = [~is_open] + [RULES[label](features, stale_hours) for label in order]
+    # 選ぶのはラベルの番号（文字列の配列で np.select するより速い）
+    labels = np.array([None, *order, UNKNOWN], dtype=object)
+    codes = np.select(conditions, np.arange(len(conditions)), default=len(conditions)) if len(prs) else []
+    return pd.Series(labels[codes], index=prs.index, dtype=object, name="blocker")
+
+
+def _infer_blocker_row(row: pd.Series, stale_hours: int = DEFAULT_STALE_HOURS) -> Optional[str]:
+    """従来の1行ずつの判定（一致確認・ベンチマーク用）"""
+    if row["state"] != "OPEN":
+        return None
+    if row.get("isDraft"):
+        return "Draft"
+    if row.get("reviewDecision") == "CHANGES_REQUESTED" or row.get("changes_requested", 0) > 0:
+        return "Changes requested"
+    checks = (row.get("checks_state") or "").upper()
+    if checks in ("FAILURE", "FAILED"):
+        return "Checks failing"
+    if checks in ("PENDING", "EXPECTED"):
+        return "Checks pending"
+    if row.get("mergeable") == "CONFLICTING" or row.get("mergeStateStatus") in ("DIRTY", "BEHIND", "BLOCKED"):
+        return "Merge conflict"
+    if row.get("reviewDecision") == "REVIEW_REQUIRED":
+        if row.get("requested_reviewers", 0) > 0:
+            return "Waiting for review"
+        return "No reviewer"
+    age = float(row.get("age_hours") or 0.0)
+    if row.get("mergeable") == "MERGEABLE" or row.get("mergeStateStatus") in ("CLEAN", "UNSTABLE", "HAS_HOOKS"):
+        return "Ready to merge" if age < stale_hours else "Stale"
+    return "Stale" if age >= stale_hours else "Unknown"
+
+
+def _benchmark(n: int = 20_000, seed: int = 0) -> None:
+    import time
+
+    rng = np.random.default_rng(seed)
+
+    def pick(choices, p_missing=0.0, missing=None):
+        values = rng.choice(np.array(choices, dtype=object), n)
+        values[rng.random(n) < p_missing] = missing
+        return values
+
+    df = pd.DataFrame({
+        "state": pick(["OPEN"] * 8 + ["MERGED", "CLOSED"]),
+        "isDraft": rng.random(n) < 0.1,
+        "reviewDecision": pick(["APPROVED", "CHANGES_REQUESTED", "REVIEW_REQUIRED", ""], 0.2),
+        "changes_requested": rng.choice([0, 0, 0, 1, 2], n),
+        "checks_state": pick(["SUCCESS", "FAILURE", "PENDING", "EXPECTED", "ERROR"], 0.2, ""),
+        "mergeable": pick(["MERGEABLE", "CONFLICTING", "UNKNOWN"], 0.1),
+        "mergeStateStatus": pick(["CLEAN", "DIRTY", "BEHIND", "BLOCKED", "UNSTABLE", "HAS_HOOKS", "UNKNOWN"], 0.1),
+        "requested_reviewers": rng.choice([0, 0, 1, 2], n),
+        "age_hours": np.where(rng.random(n) < 0.02, np.nan, rng.exponential(150, n)),
+    })
+    t0 = time.perf_counter()
+    loop = df.apply(lambda row: _infer_blocker_row(row, stale_hours=168), axis=1)
+    apply_time = time.perf_counter() - t0
+    vectorized_time = float("inf")
+    for _ in range(5):  # 2回目以降（ページの再実行時）の値を見るため最小値を取る
+        t0 = time.perf_counter()
+        vectorized = classify_blockers(df, stale_hours=168)
+        vectorized_time = min(vectorized_time, time.perf_counter() - t0)
+
+    mismatches = int((loop.fillna("-") != vectorized.fillna("-")).sum())
+    print(f"{n} PRs: apply {apply_time * 1000:.0f}ms, vectorized {vectorized_time * 1000:.1f}ms "
+          f"({apply_time / max(vectorized_time, 1e-9):.0f}x), mismatches {mismatches}")
+    assert mismatches == 0, "vectorized result differs from infer_blocker"
+
+
+if __name__ == "__main__":
+    _benchmark()
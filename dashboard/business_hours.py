@@ -0,0 +1,314 @@
+# business_hours.py
+"""
+営業カレンダーに沿った経過時間（列単位のベクトル化版）
+
+曜日（weekmask）・祝日（地域の祝日と任意の休業日）・1日の営業時間帯を
+config.BUSINESS_CALENDAR で設定する。既定は平日の0時〜24時（UTC）で、
+従来ページごとにあった calculate_business_hours（1日ずつループ）と同じ値になる。
+
+カレンダーは対象期間の日ごとに「その日の0時までの累積営業秒数」を配列で持つ。
+時刻 t までの累積営業時間は
+    累積[tの日] + (tの日が営業日なら 営業開始〜t の秒数（営業時間帯で切り詰め）)
+で、区間の営業時間は終了・開始の累積値の差（配列の参照2回と引き算）になる。
+配列はデータの範囲に合わせて年単位で作り、範囲外の日付が来たら作り直す。
+
+    df["business_hours"] = business_hours.business_hours(df["createdAt_dt"], df["end_dt"])
+
+    # 日本の祝日と年末年始・お盆休みを除く（地域の祝日は holidays パッケージが必要）
+    jst = BusinessCalendar(tz="Asia/Tokyo", regions=["JP"], holidays=["12-29/01-03", "08-13/08-15"])
+
+python business_hours.py で従来のループとの一致確認とベンチマーク（5万件）を行う。
+"""
+import datetime as dt
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import holidays as holidays_lib
+except ImportError:  # 地域の祝日（regions）を使う場合のみ必要
+    holidays_lib = None
+
+import config
+
+SECONDS_PER_DAY = 86400.0
+_ONE_SECOND = np.timedelta64(1, "s")
+_ONE_HOUR = np.timedelta64(1, "h")
+
+# config.BUSINESS_CALENDAR が無い・キーが足りない場合の値（平日の終日, UTC）
+DEFAULT_CALENDAR = {
+    "weekmask": "1111100",
+    "regions": [],
+    "holidays": [],
+    "hours": None,
+    "tz": "UTC",
+}
+
+
+def _to_datetime64(values, tz: str = "UTC") -> np.ndarray:
+    """
+    日時（Series, DatetimeIndex, 配列, ISO8601文字列, スカラー）を
+    tz の現地時刻の datetime64 配列（タイムゾーン無し）に変換する。欠損は NaT
+    タイムゾーンの無い日時はUTCとみなす
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and pd.api.types.is_datetime64_any_dtype(values.dtype):
+        index = pd.DatetimeIndex(values)  # 変換済みの列はそのまま使う
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+    else:
+        if values is None or pd.api.types.is_scalar(values):
+            values = [values]
+        index = pd.DatetimeIndex(pd.to_datetime(pd.Index(list(values), dtype=object), format="ISO8601",
+                                                utc=True, errors="coerce"))
+    return index.tz_convert(tz).tz_localize(None).to_numpy()
+
+
+def _parse_day(text: str, year: Optional[int] = None) -> dt.date:
+    """"YYYY-MM-DD" または "MM-DD"（year 年として解釈）"""
+    parts = [int(p) for p in text.strip().split("-")]
+    if len(parts) == 3:
+        return dt.date(*parts)
+    return dt.date(year, parts[0], parts[1])
+
+
+def _expand_holiday(spec, first_year: int, last_year: int) -> list:
+    """
+    休業日の指定を日付のリストに展開する
+    "YYYY-MM-DD" / "MM-DD"（毎年）/ "開始/終了"（両端を含む。MM-DD の範囲は年をまたいでよい）
+    """
+    if isinstance(spec, dt.date):
+        return [spec]
+    first, _, last = str(spec).partition("/")
+    recurring = len(first.strip().split("-")) == 2
+    years = range(first_year - 1, last_year + 1) if recurring else [None]
+    days = []
+    for year in years:
+        begin = _parse_day(first, year)
+        end = _parse_day(last, year) if last else begin
+        if end < begin and recurring:
+            end = _parse_day(last, year + 1)  # 例: "12-29/01-03"
+        days.extend(begin + dt.timedelta(days=i) for i in range((end - begin).days + 1))
+    return days
+
+
+class BusinessCalendar:
+    """
+    営業カレンダー（曜日・祝日・営業時間帯・タイムゾーン）
+    weekmask: 月〜日の営業日（np.busdaycalendar と同じ "1111100" 形式）
+    regions: 祝日を除く地域（holidays パッケージの国コード, 例: "JP"）
+    holidays: 追加の休業日（"YYYY-MM-DD", 毎年の "MM-DD", 範囲 "開始/終了"）
+    hours: 1日の営業時間帯 (開始時, 終了時)。None なら0〜24時
+    tz: 日の区切りと営業時間帯のタイムゾーン
+    """
+    
+    def __init__(
+        self,
+        weekmask: str = "1111100",
+        regions: Sequence[str] = (),
+        holidays: Sequence = (),
+        hours: Optional[Tuple[float, float]] = None,
+        tz: str = "UTC"
+    ):
+        self.weekmask = weekmask
+        self.regions = tuple(regions)
+        self.holidays = tuple(holidays)
+        self.hours = tuple(hours) if hours else None
+        self.tz = tz
+        open_hour, close_hour = self.hours or (0, 24)
+        if not 0 <= open_hour < close_hour <= 24:
+            raise ValueError(f"Invalid business hours: {hours}")
+        self._open_seconds = open_hour * 3600.0
+        self._day_seconds = (close_hour - open_hour) * 3600.0
+        if self.regions and holidays_lib is None:
+            print(f"[WARN] holidays package not installed; regional holidays {list(self.regions)} are ignored")
+        # (先頭の日, 営業日フラグ, 累積営業秒数) をまとめて差し替える（スレッド間で共有）
+        self._index = None
+        self._lock = threading.Lock()
+    
+    @property
+    def hours_per_day(self) -> float:
+        """営業日1日分の営業時間（営業時間 → 営業日数の換算に使う）"""
+        return self._day_seconds / 3600.0
+    
+    @property
+    def key(self) -> str:
+        """設定の識別子（保存済みの営業時間がどのカレンダーで計算されたかの照合に使う）"""
+        # 地域の祝日は holidays パッケージがある場合だけ効くので、その有無も含める
+        regions = self.regions if holidays_lib is not None else ()
+        return repr((self.weekmask, regions, self.holidays, self.hours, self.tz))
+    
+    @classmethod
+    def from_config(cls, settings: Optional[dict] = None) -> "BusinessCalendar":
+        """config.BUSINESS_CALENDAR（無いキーは DEFAULT_CALENDAR）から作る"""
+        if settings is None:
+            settings = getattr(config, "BUSINESS_CALENDAR", None) or {}
+        merged = {**DEFAULT_CALENDAR, **settings}
+        return cls(weekmask=merged["weekmask"], regions=merged["regions"], holidays=merged["holidays"],
+                   hours=merged["hours"], tz=merged["tz"])
+    
+    def holiday_dates(self, first_year: int, last_year: int) -> np.ndarray:
+        """first_year〜last_year の休業日（datetime64[D], 重複なし）"""
+        days = set()
+        for spec in self.holidays:
+            days.update(_expand_holiday(spec, first_year, last_year))
+        if holidays_lib is not None:
+            for region in self.regions:
+                days.update(holidays_lib.country_holidays(region, years=range(first_year, last_year + 1)))
+        return np.array(sorted(days), dtype="datetime64[D]")
+    
+    def _build_index(self, first_day: np.datetime64, last_day: np.datetime64):
+        """first_day〜last_day の年をすべて含む累積営業秒数の配列を作る"""
+        first_year = int(str(first_day)[:4])
+        last_year = int(str(last_day)[:4])
+        start = np.datetime64(f"{first_year:04d}-01-01", "D")
+        days = np.arange(start, np.datetime64(f"{last_year + 1:04d}-01-01", "D"))
+        is_open = np.is_busday(days, weekmask=self.weekmask,
+                               holidays=self.holiday_dates(first_year, last_year))
+        cumulative = np.concatenate([[0.0], np.cumsum(is_open * self._day_seconds)])
+        return start, is_open, cumulative
+    
+    def _index_for(self, first_day: np.datetime64, last_day: np.datetime64):
+        index = self._index
+        if index is not None:
+            start, is_open, _ = index
+            if start <= first_day and last_day < start + len(is_open):
+                return index
+        with self._lock:
+            if self._index is not None:
+                # 既存の範囲とまとめて作り直す（範囲が縮まないように）
+                start, is_open, _ = self._index
+                first_day = min(first_day, start)
+                last_day = max(last_day, start + len(is_open) - 1)
+            self._index = self._build_index(first_day, last_day)
+            return self._index
+    
+    def _cumulative_seconds(self, local: np.ndarray, index) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        各時刻までの累積営業秒数と、その日が営業日かどうか
+        営業日の当日分は営業時間帯の中の経過秒数（帯の外は切り詰める）
+        """
+        start, is_open, cumulative = index
+        day = local.astype("datetime64[D]")
+        pos = (day - start).astype(np.int64)
+        elapsed = (local - day) / _ONE_SECOND - self._open_seconds
+        today = np.where(is_open[pos], np.clip(elapsed, 0.0, self._day_seconds), 0.0)
+        return cumulative[pos] + today, is_open[pos]
+    
+    def business_hours(self, start, end) -> np.ndarray:
+        """
+        start〜end の営業時間（時間単位の float64 配列）
+        start / end は同じ長さの日時の列。どちらかをスカラーにすると全行に使う（例: 現在時刻）
+        どちらかが欠損の行は 0.0
+        """
+        s, e = np.broadcast_arrays(_to_datetime64(start, self.tz), _to_datetime64(end, self.tz))
+        valid = ~(np.isnat(s) | np.isnat(e))
+        if not valid.any():
+            return np.zeros(s.shape)
+        # 欠損行は範囲内の値で埋めておき、最後に 0.0 にする
+        fill = s[valid][0]
+        s = np.where(valid, s, fill)
+        e = np.where(valid, e, fill)
+        
+        days = np.concatenate([s, e]).astype("datetime64[D]")
+        index = self._index_for(days.min(), days.max())
+        s_cum, _ = self._cumulative_seconds(s, index)
+        e_cum, e_open = self._cumulative_seconds(e, index)
+        hours = (e_cum - s_cum) / 3600.0
+        # 終了日が開始日より前（データの不整合）は従来どおり、終了日が営業日なら単純な差分
+        reversed_days = e.astype("datetime64[D]") < s.astype("datetime64[D]")
+        hours = np.where(reversed_days, np.where(e_open, (e - s) / _ONE_HOUR, 0.0), hours)
+        return np.where(valid, hours, 0.0)
+
+
+_default_calendar: Optional[BusinessCalendar] = None
+
+
+def default_calendar() -> BusinessCalendar:
+    """config.BUSINESS_CALENDAR のカレンダー（プロセス内で共有）"""
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = BusinessCalendar.from_config()
+    return _default_calendar
+
+
+def business_hours(start, end, calendar: Optional[BusinessCalendar] = None) -> np.ndarray:
+    """
+    start〜end の営業時間（時間単位の float64 配列）
+    calendar を省略すると config.BUSINESS_CALENDAR のカレンダーを使う
+    """
+    return (calendar or default_calendar()).business_hours(start, end)
+
+
+def business_days(start, end, calendar: Optional[BusinessCalendar] = None) -> np.ndarray:
+    """start〜end の営業日数（営業時間を1日分の営業時間で割った値）"""
+    calendar = calendar or default_calendar()
+    return calendar.business_hours(start, end) / calendar.hours_per_day
+
+
+def calculate_business_hours(start_dt, end_dt, calendar: Optional[BusinessCalendar] = None) -> float:
+    """
+    1件分の営業時間（時間単位）。従来の calculate_business_hours と同じ呼び出し方
+    start_dt / end_dt は datetime, Timestamp, ISO8601文字列のいずれか（欠損なら 0.0）
+    """
+    if start_dt is None or end_dt is None or pd.isna(start_dt) or pd.isna(end_dt):
+        return 0.0
+    return float(business_hours(start_dt, end_dt, calendar)[0])
+
+
+def _loop_business_hours(start_dt: pd.Timestamp, end_dt: pd.Timestamp) -> float:
+    """従来の1日ずつのループ（平日の終日, ベンチマークの比較用）"""
+    if pd.isna(start_dt) or pd.isna(end_dt):
+        return 0.0
+    if start_dt.date() == end_dt.date():
+        if start_dt.weekday() >= 5:
+            return 0.0
+        return (end_dt - start_dt).total_seconds() / 3600
+    current = start_dt
+    total_hours = 0.0
+    while current.date() < end_dt.date():
+        if current.weekday() < 5:
+            next_day = dt.datetime.combine(current.date() + dt.timedelta(days=1), dt.time.min, tzinfo=current.tzinfo)
+            total_hours += (next_day - current).total_seconds() / 3600
+        current = dt.datetime.combine(current.date() + dt.timedelta(days=1), dt.time.min, tzinfo=current.tzinfo)
+    if end_dt.weekday() < 5:
+        total_hours += (end_dt - current).total_seconds() / 3600
+    return total_hours
+
+
+def _benchmark(n: int = 50_000, seed: int = 0) -> None:
+    import time
+
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp("2026-01-01", tz="UTC")
+    start = now - pd.to_timedelta(rng.integers(0, 730 * 86400, n), unit="s")
+    # 大半は数日以内、一部は数ヶ月オープンのまま（指数分布）
+    duration = pd.to_timedelta(np.minimum(rng.exponential(5 * 86400, n), 365 * 86400).astype(np.int64), unit="s")
+    df = pd.DataFrame({"start": start, "end": start + duration})
+    df.loc[df.sample(frac=0.01, random_state=seed).index, "end"] = pd.NaT
+    df.loc[df.sample(frac=0.01, random_state=seed + 1).index, "end"] = df["start"] - pd.Timedelta(hours=30)
+
+    t0 = time.perf_counter()
+    loop = df.apply(lambda row: _loop_business_hours(row["start"], row["end"]), axis=1).to_numpy()
+    t1 = time.perf_counter()
+    vectorized = business_hours(df["start"], df["end"], BusinessCalendar())
+    t2 = time.perf_counter()
+
+    max_diff = float(np.max(np.abs(loop - vectorized)))
+    print(f"{n} PRs: loop {t1 - t0:.2f}s, vectorized {t2 - t1:.3f}s "
+          f"({(t1 - t0) / max(t2 - t1, 1e-9):.0f}x), max diff {max_diff:.2e} h")
+    assert max_diff < 1e-6, "vectorized result differs from the loop"
+
+    # 祝日・休業日と営業時間帯ありのカレンダー（累積配列の作成を含む）
+    jst = BusinessCalendar(tz="Asia/Tokyo", regions=["JP"], holidays=["12-29/01-03", "08-13/08-15"],
+                           hours=(9, 18))
+    t0 = time.perf_counter()
+    hours = business_hours(df["start"], df["end"], jst)
+    t1 = time.perf_counter()
+    print(f"{n} PRs with {jst.tz} holidays and 9-18h: {t1 - t0:.3f}s, "
+          f"median {np.median(hours):.1f} h (weekdays only: {np.median(vectorized):.1f} h)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -30,3 +30,31 @@ DEFAULT_SHOW_ONLY_OPEN_GROUPS = False                          # OPENグルー
 # GitHub Enterprise Server の場合だけ設定（例: "https://git.example.co.jp/api/graphql"）
 # 何も書かない場合は https://api.github.com/graphql を使用
 GITHUB_API_URL = ""   # または環境変数 GITHUB_API_URL を使ってもOK
+
+# --- キャッシュDBの保存形式 ---
+# 既定は非圧縮JSON（PR一覧の読み込みで必要な項目だけを SQLite 側で取り出せる）。
+# DBサイズを優先するテーブルだけ圧縮する場合に指定:
+#   "zlib-json"、"zstd-json"（pip install zstandard）、"msgpack" / "zlib-msgpack"（pip install msgpack）
+# 変更すると次回起動時に既存の行も書き直す
+STORAGE_CODECS = {
+    # "issue_cache": "zlib-json",
+}
+
+# --- 営業カレンダー（営業日・営業時間の計算に使用） ---
+# 既定は平日の0時〜24時（UTC）。日本のチームなら例:
+#   "regions": ["JP"],                                   # 祝日（pip install holidays が必要）
+#   "holidays": ["12-29/01-03", "08-13/08-15"],          # 年末年始・お盆（"YYYY-MM-DD" も可）
+#   "hours": (9, 18),                                    # 営業時間帯（None なら終日）
+#   "tz": "Asia/Tokyo",
+BUSINESS_CALENDAR = {
+    "weekmask": "1111100",   # 月〜日の営業日（1=営業）
+    "regions": [],
+    "holidays": [],
+    "hours": None,
+    "tz": "UTC",
+}
+
+# --- Four Keys の失敗判定 ---
+# タイトルまたはラベルにいずれかを含むマージ済みPRを「失敗」とみなす（大文字小文字を区別しない）
+# 変更すると次回起動時に集計（ロールアップ）を作り直す
+FOUR_KEYS_FAILURE_KEYWORDS = ["revert", "hotfix", "urgent", "fix", "rollback", "emergency", "critical"]
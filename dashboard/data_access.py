@@ -0,0 +1,159 @@
+# data_access.py
+"""
+ページ共通のデータ読み込み（st.cache_data でメモ化）
+
+Streamlit はウィジェットを操作するたびにページを先頭から再実行するため、
+DBの読み込み・DataFrame の構築・日時変換・集計SQLをここでまとめてメモ化する。
+キーは (owner, repo, data_version, days, states)。data_version は db_cache のデータ版で、
+PRの保存・削除・キャッシュクリアで進むので、データが変われば別のキーになり古い結果は返らない。
+days の期間は読み込み時刻から数えるため、同じ版でも CACHE_TTL ごとに読み直す。
+
+戻り値はメモ化された値のコピーなので、呼び出し側で列を追加・変更してよい。
+
+    data_version = data_access.get_data_version(owner, repo)
+    raw_df = data_access.load_pr_frame(owner, repo, data_version, days=30, columns=PR_COLUMNS)
+"""
+import datetime as dt
+from typing import Optional, List, Tuple, Dict
+
+import pandas as pd
+import streamlit as st
+
+import db_cache
+import derived
+import four_keys
+import snapshot
+import analytics_engine
+
+# 期間の起点（現在時刻）がずれるため、同じデータ版でも1時間で読み直す
+CACHE_TTL = 3600
+# リポジトリ×期間×ステータスの組み合わせごとに保持する件数
+MAX_ENTRIES = 32
+
+_cache = st.cache_data(show_spinner=False, ttl=CACHE_TTL, max_entries=MAX_ENTRIES)
+
+
+def get_data_version(owner: str, repo: str) -> int:
+    """メモ化のキーにするデータ版（主キー参照のみなのでメモ化しない）"""
+    return db_cache.get_data_version(owner, repo)
+
+
+def cutoff_for(days: Optional[int]) -> Optional[dt.datetime]:
+    """過去 days 日の起点（UTC）。days が None なら全期間"""
+    if days is None:
+        return None
+    return dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=days)
+
+
+def _states(states) -> Optional[List[str]]:
+    return list(states) if states else None
+
+
+@_cache
+def load_pr_frame(
+    owner: str,
+    repo: str,
+    data_version: int,
+    days: Optional[int] = None,
+    columns: Optional[Tuple[str, ...]] = None
+) -> pd.DataFrame:
+    """
+    PR一覧（pr_cache のJSONのキーを列にした DataFrame）
+    派生列（derived.DERIVED_COLUMNS: 日時列, end_dt, lead_time_hours など）は計算済み。
+    現在時刻で変わる列（age_hours など）は含まないので derived.add_age_columns で追加する。
+    列指向スナップショットが使えればそれを、使えなければ db_cache.load_prs を使う
+    Returns: DataFrame（該当なしなら空）
+    """
+    cutoff = cutoff_for(days)
+    columns = list(columns) if columns else None
+    df = snapshot.load_frame(owner, repo, since=cutoff, columns=columns)
+    if df is not None:
+        return df
+
+    df = pd.DataFrame(db_cache.load_prs(owner, repo, since=cutoff, columns=columns))
+    if df.empty:
+        return df
+    return derived.add_derived_columns(df)
+
+
+@_cache
+def load_pr_table(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                  states: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """正規化テーブルのPR一覧（db_cache.load_pr_frame）"""
+    return db_cache.load_pr_frame(owner, repo, since=cutoff_for(days), states=_states(states))
+
+
+@_cache
+def four_keys_summary(owner: str, repo: str, data_version: int, days: Optional[int] = None) -> Dict:
+    """期間の Four Keys（four_keys.summary。期間はマージ日で絞る）"""
+    return four_keys.summary(db_cache.get_connection(), owner, repo, since=cutoff_for(days))
+
+
+@_cache
+def four_keys_daily(owner: str, repo: str, data_version: int, days: Optional[int] = None) -> pd.DataFrame:
+    """日次ロールアップ（four_keys.daily）"""
+    return four_keys.daily(db_cache.get_connection(), owner, repo, since=cutoff_for(days))
+
+
+@_cache
+def four_keys_weekly(owner: str, repo: str, data_version: int, days: Optional[int] = None) -> pd.DataFrame:
+    """週次ロールアップ（four_keys.weekly）"""
+    return four_keys.weekly(db_cache.get_connection(), owner, repo, since=cutoff_for(days))
+
+
+@_cache
+def four_keys_lead_times(owner: str, repo: str, data_version: int, days: Optional[int] = None) -> pd.DataFrame:
+    """デプロイごとのリードタイム（four_keys.lead_times）"""
+    return four_keys.lead_times(db_cache.get_connection(), owner, repo, since=cutoff_for(days))
+
+
+@_cache
+def four_keys_deploys(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                      failures_only: bool = False, order_by_lead_time: bool = False,
+                      limit: Optional[int] = None) -> pd.DataFrame:
+    """デプロイ（マージ済みPR）の一覧（four_keys.load_deploys）"""
+    return four_keys.load_deploys(db_cache.get_connection(), owner, repo, since=cutoff_for(days),
+                                  failures_only=failures_only, order_by_lead_time=order_by_lead_time,
+                                  limit=limit)
+
+
+@_cache
+def load_reviews_frame(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                       states: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """レビュー1件 = 1行（db_cache.load_reviews_frame）"""
+    return db_cache.load_reviews_frame(owner, repo, since=cutoff_for(days), states=_states(states))
+
+
+@_cache
+def load_thread_frame(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                      states: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """レビュースレッド1件 = 1行（db_cache.load_thread_frame）"""
+    return db_cache.load_thread_frame(owner, repo, since=cutoff_for(days), states=_states(states))
+
+
+@_cache
+def reviewer_stats(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                   states: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """レビュワー別の集計（analytics_engine.reviewer_stats）"""
+    return analytics_engine.reviewer_stats(owner, repo, since=cutoff_for(days), states=_states(states))
+
+
+@_cache
+def file_change_stats(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                      states: Optional[Tuple[str, ...]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+    """ファイル別の変更頻度（analytics_engine.file_change_stats）"""
+    return analytics_engine.file_change_stats(owner, repo, since=cutoff_for(days),
+                                              states=_states(states), limit=limit)
+
+
+@_cache
+def weekly_pr_counts(owner: str, repo: str, data_version: int, days: Optional[int] = None,
+                     states: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """週×ステータスごとのPR作成数（analytics_engine.weekly_pr_counts）"""
+    return analytics_engine.weekly_pr_counts(owner, repo, since=cutoff_for(days), states=_states(states))
+
+
+@_cache
+def load_pr(owner: str, repo: str, data_version: int, pr_number: int, prefetch: int = 0) -> Optional[Dict]:
+    """PRを1件（db_cache.get_pr）。無ければ None"""
+    return db_cache.get_pr(owner, repo, pr_number, prefetch=prefetch)
@@ -2,26 +2,104 @@
 import sqlite3
 import json
 import os
-from datetime import datetime, timezone
-from typing import List, Dict, Optional, Tuple
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Optional, Tuple
 from pathlib import Path
 import pandas as pd
 
+import config
+import derived
+import four_keys
+
+try:
+    import zstandard
+except ImportError:  # zstd コーデックは zstandard がある場合のみ
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack コーデックは msgpack がある場合のみ
+    msgpack = None
+
 
 DB_PATH = Path(__file__).parent / "pr_cache.db"
 
 
+# 接続ごとに設定するプラグマ
+# WAL: 読み取りが書き込み（cron/自動更新スレッド）にブロックされない
+# busy_timeout: 書き込み同士が競合した場合はロック解放を待つ
+_PRAGMAS = (
+    "PRAGMA busy_timeout = 10000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    スレッドごとに再利用する接続を返す（DB_PATH ごとに1つ）
+    スキーマ作成はプロセス内で DB_PATH ごとに1回だけ行う
+    """
+    path = str(DB_PATH)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        connections[path] = conn
+    elif conn.in_transaction:
+        # 前の呼び出しが例外で中断した場合の書きかけを破棄
+        conn.rollback()
+    
+    if path not in _initialized_paths:
+        with _init_lock:
+            if path not in _initialized_paths:
+                _create_schema(conn)
+                _initialized_paths.add(path)
+    return conn
+
+
+def close_connection() -> None:
+    """現在のスレッドの接続を閉じる"""
+    connections = getattr(_local, "connections", None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
 def init_db():
     """データベースを初期化"""
-    conn = sqlite3.connect(DB_PATH)
+    get_connection()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     
+    _drop_legacy_cache_tables(cursor)
+    
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS pr_cache (
             owner TEXT NOT NULL,
             repo TEXT NOT NULL,
             pr_number INTEGER NOT NULL,
             data TEXT NOT NULL,
+            content_hash TEXT,
+            codec TEXT NOT NULL DEFAULT 'json',
             fetched_at TEXT NOT NULL,
             PRIMARY KEY (owner, repo, pr_number)
         )
@@ -32,45 +110,51 @@ def init_db():
         ON pr_cache(owner, repo, fetched_at)
     """)
     
-    # ETag管理テーブル
+    # リポジトリごとのデータ版（PR/Issue の内容が変わるたびに増える）
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS etag_cache (
+        CREATE TABLE IF NOT EXISTS data_version (
             owner TEXT NOT NULL,
             repo TEXT NOT NULL,
-            etag TEXT,
-            last_modified TEXT,
-            checked_at TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
             PRIMARY KEY (owner, repo)
         )
     """)
     
-    # 集計データキャッシュテーブル
+    # 一度だけ行う移行の記録など（key → value）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    
+    # 集計データキャッシュテーブル（データ版 + フィルタ条件がキー）
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS aggregated_stats (
             owner TEXT NOT NULL,
             repo TEXT NOT NULL,
             stat_type TEXT NOT NULL,
+            params TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
             stat_key TEXT NOT NULL,
             stat_data TEXT NOT NULL,
             computed_at TEXT NOT NULL,
-            PRIMARY KEY (owner, repo, stat_type, stat_key)
+            PRIMARY KEY (owner, repo, stat_type, params, stat_key)
         )
     """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_stats_type 
-        ON aggregated_stats(owner, repo, stat_type, computed_at)
-    """)
-    
     # ファイルツリーキャッシュテーブル
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS file_tree_cache (
             owner TEXT NOT NULL,
             repo TEXT NOT NULL,
+            params TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
             all_paths TEXT NOT NULL,
             path_tree TEXT NOT NULL,
             computed_at TEXT NOT NULL,
-            PRIMARY KEY (owner, repo)
+            PRIMARY KEY (owner, repo, params)
         )
     """)
     
@@ -79,18 +163,20 @@ def init_db():
         CREATE TABLE IF NOT EXISTS dir_stats_cache (
             owner TEXT NOT NULL,
             repo TEXT NOT NULL,
+            params TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
             dir_path TEXT NOT NULL,
             total_prs INTEGER NOT NULL,
             open_count INTEGER NOT NULL,
             last_activity TEXT NOT NULL,
             computed_at TEXT NOT NULL,
-            PRIMARY KEY (owner, repo, dir_path)
+            PRIMARY KEY (owner, repo, params, dir_path)
         )
     """)
     
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_dir_stats_activity 
-        ON dir_stats_cache(owner, repo, last_activity DESC)
+        ON dir_stats_cache(owner, repo, params, last_activity DESC)
     """)
     
     # Issue cache table
@@ -100,6 +186,8 @@ def init_db():
             repo TEXT NOT NULL,
             issue_number INTEGER NOT NULL,
             data TEXT NOT NULL,
+            content_hash TEXT,
+            codec TEXT NOT NULL DEFAULT 'json',
             fetched_at TEXT NOT NULL,
             PRIMARY KEY (owner, repo, issue_number)
         )
@@ -110,90 +198,728 @@ def init_db():
         ON issue_cache(owner, repo, fetched_at)
     """)
     
+    # 差分同期の状態管理テーブル（updatedAt の最高水位）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            watermark TEXT,
+            window_start TEXT,
+            synced_at TEXT NOT NULL,
+            PRIMARY KEY (owner, repo, kind)
+        )
+    """)
+    
+    # 取得途中のカーソル（中断したページ走査の再開用）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fetch_checkpoint (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            cursor TEXT NOT NULL,
+            params TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (owner, repo, kind)
+        )
+    """)
+    
+    # 正規化テーブル（pr_cache の JSON を列・子テーブルに展開したもの。保存時に同時更新）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pull_requests (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            title TEXT,
+            url TEXT,
+            state TEXT,
+            is_draft INTEGER NOT NULL DEFAULT 0,
+            author TEXT,
+            created_at TEXT,
+            closed_at TEXT,
+            merged_at TEXT,
+            updated_at TEXT,
+            review_decision TEXT,
+            mergeable TEXT,
+            merge_state_status TEXT,
+            checks_state TEXT,
+            additions INTEGER NOT NULL DEFAULT 0,
+            deletions INTEGER NOT NULL DEFAULT 0,
+            changed_files INTEGER NOT NULL DEFAULT 0,
+            comments_count INTEGER NOT NULL DEFAULT 0,
+            review_threads INTEGER NOT NULL DEFAULT 0,
+            unresolved_threads INTEGER NOT NULL DEFAULT 0,
+            approvals INTEGER NOT NULL DEFAULT 0,
+            changes_requested INTEGER NOT NULL DEFAULT 0,
+            base_ref TEXT,
+            head_ref TEXT,
+            lead_time_hours REAL,
+            first_review_at TEXT,
+            PRIMARY KEY (owner, repo, pr_number)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pull_requests_created
+        ON pull_requests(owner, repo, created_at)
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pull_requests_state
+        ON pull_requests(owner, repo, state, created_at)
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reviews (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            state TEXT,
+            author TEXT,
+            created_at TEXT,
+            PRIMARY KEY (owner, repo, pr_number, seq)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_author
+        ON reviews(owner, repo, author)
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_threads (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            thread_index INTEGER NOT NULL,
+            is_resolved INTEGER NOT NULL DEFAULT 0,
+            is_outdated INTEGER NOT NULL DEFAULT 0,
+            resolved_by TEXT,
+            total_comments INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (owner, repo, pr_number, thread_index)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS thread_comments (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            thread_index INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            author TEXT,
+            body TEXT,
+            created_at TEXT,
+            PRIMARY KEY (owner, repo, pr_number, thread_index, seq)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pr_files (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (owner, repo, pr_number, path)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pr_files_path
+        ON pr_files(owner, repo, path)
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pr_labels (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            PRIMARY KEY (owner, repo, pr_number, label)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS requested_reviewers (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            reviewer TEXT NOT NULL,
+            PRIMARY KEY (owner, repo, pr_number, reviewer)
+        )
+    """)
+    
+    # Four Keys のロールアップ（PR保存時に影響する日だけ集計し直す）
+    four_keys.create_tables(cursor)
+    
+    _migrate(cursor)
+    for table in TABLE_CODECS:
+        _recode_if_changed(cursor, table)
+    _backfill_pr_tables(cursor)
+    four_keys.ensure_rollups(cursor)
+    
     conn.commit()
-    conn.close()
 
 
-def save_prs(owner: str, repo: str, pr_list: List[Dict]) -> None:
-    """PRデータをDBに保存（UPSERT）"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+# データ版をキーにする派生キャッシュ（いつでも再計算できる）
+_DERIVED_CACHE_TABLES = ("aggregated_stats", "file_tree_cache", "dir_stats_cache")
+
+
+def _drop_legacy_cache_tables(cursor) -> None:
+    """有効期限（computed_at）で管理していた旧形式の派生キャッシュは作り直す"""
+    for table in _DERIVED_CACHE_TABLES:
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if columns and "data_version" not in columns:
+            cursor.execute(f"DROP TABLE {table}")
+
+
+def _add_column(cursor, table: str, column: str, definition: str) -> bool:
+    """既存DBに列が無ければ追加（追加したかどうかを返す）"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+    return False
+
+
+# 保存しなくなったキー（旧バージョンで保存した行からは移行時に取り除く）
+# 内容ハッシュはこれらを除いて計算していたので、取り除いても保存済みのハッシュと一致する
+_LEGACY_FIELDS = ("age_hours",)
+
+
+def _get_meta(cursor, key: str) -> Optional[str]:
+    row = cursor.execute("SELECT value FROM cache_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(cursor, key: str, value: str) -> None:
+    cursor.execute("INSERT OR REPLACE INTO cache_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _strip_item(item: Dict) -> Dict:
+    for key in _LEGACY_FIELDS:
+        item.pop(key, None)
+    return item
+
+
+def _migrate(cursor) -> None:
+    """旧バージョンで作成されたDBのスキーマ移行"""
+    # ETag管理テーブル（GraphQL の POST では条件付きリクエストが効かず、差分同期は sync_state で行う）
+    cursor.execute("DROP TABLE IF EXISTS etag_cache")
+    # 内容ハッシュ（NULL の行は次回保存時に「変更あり」として書き直される）
+    _add_column(cursor, "pr_cache", "content_hash", "TEXT")
+    _add_column(cursor, "issue_cache", "content_hash", "TEXT")
+    # 保存形式（既存の行は非圧縮JSONテキスト）
+    _add_column(cursor, "pr_cache", "codec", "TEXT NOT NULL DEFAULT 'json'")
+    _add_column(cursor, "issue_cache", "codec", "TEXT NOT NULL DEFAULT 'json'")
+    # 取り込み時の派生列（derived.derive_pr と同じ値を既存の行にSQLで埋める）
+    if _add_column(cursor, "pull_requests", "lead_time_hours", "REAL"):
+        cursor.execute("""
+            UPDATE pull_requests 
+            SET lead_time_hours = (strftime('%s', merged_at) - strftime('%s', created_at)) / 3600.0 
+            WHERE merged_at IS NOT NULL AND created_at IS NOT NULL
+        """)
+    if _add_column(cursor, "pull_requests", "first_review_at", "TEXT"):
+        cursor.execute("""
+            UPDATE pull_requests 
+            SET first_review_at = (
+                SELECT MIN(r.created_at) FROM reviews r 
+                WHERE r.owner = pull_requests.owner AND r.repo = pull_requests.repo 
+                  AND r.pr_number = pull_requests.pr_number 
+                  AND r.created_at IS NOT NULL AND r.created_at != '' 
+                  AND IFNULL(r.author, '') != IFNULL(pull_requests.author, '')
+            )
+        """)
+    # 取得時刻で変わる値を保存していた旧形式の行（json_extract で読む非圧縮の行。圧縮形式は _decode で取り除く）
+    # 全行を走査するので、_LEGACY_FIELDS が変わったときだけ行う
+    legacy = ",".join(_LEGACY_FIELDS)
+    if _get_meta(cursor, "legacy_fields") != legacy:
+        for table in ("pr_cache", "issue_cache"):
+            for key in _LEGACY_FIELDS:
+                cursor.execute(f"""
+                    UPDATE {table} 
+                    SET data = json_remove(data, '$.{key}') 
+                    WHERE codec = 'json' AND json_type(data, '$.{key}') IS NOT NULL
+                """)
+        _set_meta(cursor, "legacy_fields", legacy)
+
+
+# ---- data 列の保存形式（コーデック） ----
+# タグは "<名前>/<版>"。行ごとに codec 列へ記録し、読み込み時はその行のタグで復号する
+# "json" は旧形式（非圧縮のJSONテキスト。SQLite の json_extract で直接読める）
+
+def _json_bytes(item: Dict) -> bytes:
+    return json.dumps(item, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+_CODECS: Dict[str, Tuple[Callable[[Dict], object], Callable[[object], Dict]]] = {
+    "json": (json.dumps, json.loads),
+    "zlib-json/1": (lambda item: zlib.compress(_json_bytes(item), 6),
+                    lambda blob: json.loads(zlib.decompress(blob))),
+}
+if zstandard is not None:
+    _CODECS["zstd-json/1"] = (lambda item: zstandard.ZstdCompressor(level=6).compress(_json_bytes(item)),
+                              lambda blob: json.loads(zstandard.ZstdDecompressor().decompress(blob)))
+if msgpack is not None:
+    _CODECS["msgpack/1"] = (msgpack.packb, lambda blob: msgpack.unpackb(blob, raw=False))
+    _CODECS["zlib-msgpack/1"] = (lambda item: zlib.compress(msgpack.packb(item), 6),
+                                 lambda blob: msgpack.unpackb(zlib.decompress(blob), raw=False))
+    if zstandard is not None:
+        _CODECS["zstd-msgpack/1"] = (
+            lambda item: zstandard.ZstdCompressor(level=6).compress(msgpack.packb(item)),
+            lambda blob: msgpack.unpackb(zstandard.ZstdDecompressor().decompress(blob), raw=False))
+
+# テーブルごとの書き込みコーデック（版なしの名前で指定し、その最新版で書く）
+# 既定は非圧縮の "json"（load_prs(columns=...) が json_extract で必要なキーだけ読める）。
+# 圧縮は config.STORAGE_CODECS で指定したテーブルだけ（例: {"issue_cache": "zlib-json"}）
+# 変更すると次回の接続時に既存の行も書き直される
+DEFAULT_CODEC = "json"
+TABLE_CODECS = {
+    "pr_cache": DEFAULT_CODEC,
+    "issue_cache": DEFAULT_CODEC,
+}
+TABLE_CODECS.update(getattr(config, "STORAGE_CODECS", None) or {})
+
+
+_warned_codecs = set()
+
+
+def _codec_version(tag: str) -> int:
+    return int(tag.split("/")[1]) if "/" in tag else 0
+
+
+def _write_codec(table: str) -> str:
+    """テーブルの書き込みコーデックのタグ（依存パッケージが無ければ DEFAULT_CODEC）"""
+    name = TABLE_CODECS.get(table, DEFAULT_CODEC)
+    tags = [tag for tag in _CODECS if tag.split("/")[0] == name]
+    if not tags:
+        if name not in _warned_codecs:
+            _warned_codecs.add(name)
+            print(f"[WARN] Storage codec '{name}' is unavailable, using {DEFAULT_CODEC}")
+        tags = [tag for tag in _CODECS if tag.split("/")[0] == DEFAULT_CODEC]
+    return max(tags, key=_codec_version)
+
+
+def _decode(codec: str, data) -> Dict:
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown storage codec: {codec} (missing optional dependency?)")
+    return _strip_item(_CODECS[codec][1](data))
+
+
+def _recode_table(cursor, table: str) -> int:
+    """
+    書き込みコーデックと異なる形式の行を書き直す（内容ハッシュと fetched_at は変えない）
+    復号できない形式（依存パッケージが無いなど）の行はそのまま残す
+    Returns: 書き直した行数
+    """
+    tag = _write_codec(table)
+    encode = _CODECS[tag][0]
+    others = [t for t in _CODECS if t != tag]
+    total = 0
+    while True:
+        cursor.execute(f"""
+            SELECT rowid, codec, data FROM {table} 
+            WHERE codec IN ({",".join("?" * len(others))}) 
+            LIMIT ?
+        """, (*others, _IN_CHUNK))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(f"UPDATE {table} SET data = ?, codec = ? WHERE rowid = ?",
+                           [(encode(_decode(codec, data)), tag, rowid) for rowid, codec, data in rows])
+        total += len(rows)
+    return total
+
+
+def _recode_if_changed(cursor, table: str) -> int:
+    """
+    書き込みコーデックか復号できるコーデックの一覧が前回と変わったときだけ _recode_table を行う
+    （codec 列は索引が無く全行の走査になるため、起動のたびには行わない）
+    """
+    state = _write_codec(table) + ";" + ",".join(sorted(_CODECS))
+    if _get_meta(cursor, f"codec:{table}") == state:
+        return 0
+    total = _recode_table(cursor, table)
+    _set_meta(cursor, f"codec:{table}", state)
+    return total
+
+
+# pull_requests の子テーブル（PR保存時に削除→再挿入する）
+_PR_CHILD_TABLES = ("reviews", "review_threads", "thread_comments", "pr_files", "pr_labels", "requested_reviewers")
+
+
+def _write_pr_tables(cursor, owner: str, repo: str, pr_list: List[Dict]) -> None:
+    """PRのJSONを正規化テーブルに展開（呼び出し側のトランザクション内で実行）"""
+    keys = [(owner, repo, pr["number"]) for pr in pr_list]
+    _forget_prs(owner, repo, [pr["number"] for pr in pr_list])
+    for table in _PR_CHILD_TABLES:
+        cursor.executemany(f"""
+            DELETE FROM {table} 
+            WHERE owner = ? AND repo = ? AND pr_number = ?
+        """, keys)
+    
+    pr_rows, review_rows, thread_rows, comment_rows = [], [], [], []
+    file_rows, label_rows, reviewer_rows = [], [], []
+    for pr in pr_list:
+        key = (owner, repo, pr["number"])
+        derived_values = derived.derive_pr(pr)
+        pr_rows.append(key + (
+            pr.get("title"), pr.get("url"), pr.get("state"), int(bool(pr.get("isDraft"))),
+            pr.get("author"), pr.get("createdAt"), pr.get("closedAt"), pr.get("mergedAt"),
+            pr.get("updatedAt"), pr.get("reviewDecision"), pr.get("mergeable"),
+            pr.get("mergeStateStatus"), pr.get("checks_state"),
+            pr.get("additions") or 0, pr.get("deletions") or 0, pr.get("changedFiles") or 0,
+            pr.get("comments_count") or 0, pr.get("review_threads") or 0,
+            pr.get("unresolved_threads") or 0, pr.get("approvals") or 0,
+            pr.get("changes_requested") or 0, pr.get("baseRefName"), pr.get("headRefName"),
+            derived_values["lead_time_hours"], derived_values["first_review_at"],
+        ))
+        for seq, review in enumerate(pr.get("review_details") or []):
+            review_rows.append(key + (seq, review.get("state"), review.get("author"), review.get("createdAt")))
+        for index, thread in enumerate(pr.get("thread_details") or []):
+            thread_rows.append(key + (
+                index, int(bool(thread.get("isResolved"))), int(bool(thread.get("isOutdated"))),
+                thread.get("resolvedBy"), thread.get("totalComments") or 0,
+            ))
+            for seq, comment in enumerate(thread.get("comments") or []):
+                comment_rows.append(key + (index, seq, comment.get("author"), comment.get("body"), comment.get("createdAt")))
+        file_rows.extend(key + (path,) for path in pr.get("files") or [])
+        label_rows.extend(key + (label,) for label in pr.get("labels") or [])
+        reviewer_rows.extend(key + (reviewer,) for reviewer in pr.get("requested_reviewers_list") or [] if reviewer)
+    
+    cursor.executemany("""
+        INSERT OR REPLACE INTO pull_requests 
+        (owner, repo, pr_number, title, url, state, is_draft, author,
+         created_at, closed_at, merged_at, updated_at, review_decision, mergeable,
+         merge_state_status, checks_state, additions, deletions, changed_files,
+         comments_count, review_threads, unresolved_threads, approvals, changes_requested,
+         base_ref, head_ref, lead_time_hours, first_review_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, pr_rows)
+    cursor.executemany("INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?)", review_rows)
+    cursor.executemany("INSERT INTO review_threads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", thread_rows)
+    cursor.executemany("INSERT INTO thread_comments VALUES (?, ?, ?, ?, ?, ?, ?, ?)", comment_rows)
+    cursor.executemany("INSERT OR IGNORE INTO pr_files VALUES (?, ?, ?, ?)", file_rows)
+    cursor.executemany("INSERT OR IGNORE INTO pr_labels VALUES (?, ?, ?, ?)", label_rows)
+    cursor.executemany("INSERT OR IGNORE INTO requested_reviewers VALUES (?, ?, ?, ?)", reviewer_rows)
+    four_keys.update_rollups(cursor, owner, repo, [pr["number"] for pr in pr_list])
+
+
+def _backfill_pr_tables(cursor) -> None:
+    """正規化テーブル導入前のDB向けに、pull_requests に無いキャッシュ済みPRを展開する"""
+    cursor.execute("""
+        SELECT c.owner, c.repo, c.pr_number, c.codec, c.data 
+        FROM pr_cache c 
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pull_requests p 
+            WHERE p.owner = c.owner AND p.repo = c.repo AND p.pr_number = c.pr_number
+        )
+    """)
+    by_repo = {}
+    for owner, repo, number, codec, data in cursor.fetchall():
+        pr = _decode(codec, data)
+        pr["number"] = number
+        by_repo.setdefault((owner, repo), []).append(pr)
+    for (owner, repo), pr_list in by_repo.items():
+        _write_pr_tables(cursor, owner, repo, pr_list)
+
+
+# IN 句に渡すパラメータ数の上限（SQLITE_MAX_VARIABLE_NUMBER より十分小さく）
+_IN_CHUNK = 500
+
+
+def content_hash(item: Dict) -> str:
+    """変更検出用の内容ハッシュ"""
+    return hashlib.sha1(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _upsert_items(table: str, number_col: str, owner: str, repo: str, items: List[Dict],
+                  checkpoint: Optional[Dict] = None,
+                  on_write: Optional[Callable] = None) -> Dict[str, int]:
+    """
+    内容ハッシュで新規・変更・変更なしを判定し、新規と変更だけを1トランザクションでまとめて書き込む
+    on_write(cursor, owner, repo, 書き込んだ項目) で派生テーブルも同じトランザクションで更新する
+    """
+    conn = get_connection()
     cursor = conn.cursor()
     
-    now = datetime.now(timezone.utc).isoformat()
+    by_number = {}
+    for item in items:
+        if item.get("number"):
+            by_number[item["number"]] = item
+    
+    numbers = list(by_number)
+    existing = {}
+    for i in range(0, len(numbers), _IN_CHUNK):
+        chunk = numbers[i:i + _IN_CHUNK]
+        cursor.execute(f"""
+            SELECT {number_col}, content_hash FROM {table} 
+            WHERE owner = ? AND repo = ? AND {number_col} IN ({",".join("?" * len(chunk))})
+        """, (owner, repo, *chunk))
+        existing.update(cursor.fetchall())
     
-    for pr in pr_list:
-        pr_number = pr.get("number")
-        if not pr_number:
+    now = datetime.now(timezone.utc).isoformat()
+    codec = _write_codec(table)
+    encode = _CODECS[codec][0]
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+    rows = []
+    written = []
+    for number, item in by_number.items():
+        digest = content_hash(item)
+        if number not in existing:
+            counts["new"] += 1
+        elif existing[number] != digest:
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
             continue
-            
-        cursor.execute("""
-            INSERT OR REPLACE INTO pr_cache 
-            (owner, repo, pr_number, data, fetched_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (owner, repo, pr_number, json.dumps(pr), now))
+        rows.append((owner, repo, number, encode(item), codec, digest, now))
+        written.append(item)
+    
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO {table} 
+        (owner, repo, {number_col}, data, codec, content_hash, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    
+    if written:
+        _bump_data_version(cursor, owner, repo)
+    if on_write and written:
+        on_write(cursor, owner, repo, written)
+    
+    if checkpoint:
+        _write_checkpoint(cursor, owner, repo, checkpoint)
     
     conn.commit()
-    conn.close()
+    return counts
 
 
-def load_prs(owner: str, repo: str, max_age_hours: Optional[int] = None) -> List[Dict]:
-    """DBからPRデータを読み込み"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def save_prs(owner: str, repo: str, pr_list: List[Dict], checkpoint: Optional[Dict] = None) -> Dict[str, int]:
+    """
+    PRデータをDBに保存（UPSERT）
+    内容ハッシュが変わらないPRは書き込まず、fetched_at も更新しない（fetched_at = 最終変更時刻）。
+    checkpoint を渡すと同じトランザクションで取得カーソルも記録する（_write_checkpoint 参照）
+    Returns: {"new": 件数, "changed": 件数, "unchanged": 件数}
+    """
+    return _upsert_items("pr_cache", "pr_number", owner, repo, pr_list, checkpoint,
+                         on_write=_write_pr_tables)
+
+
+def load_prs(owner: str, repo: str, since=None, until=None, states: Optional[List[str]] = None,
+             columns: Optional[List[str]] = None) -> List[Dict]:
+    """
+    DBからPRデータを読み込み
+    since / until: 作成日時の範囲（since 以上 until 未満）, states: 対象ステータス
+    columns: 取り出すキー（None なら全体）。非圧縮JSON（codec = 'json'）の行はSQLite側で部分抽出し、
+    必要なキーだけをデシリアライズする（元データに無いキーは結果にも含めない）
+    絞り込みは pull_requests の created_at / state インデックスで行う
+    """
+    conn = get_connection()
     cursor = conn.cursor()
     
-    if max_age_hours:
-        cutoff = datetime.now(timezone.utc).timestamp() - (max_age_hours * 3600)
-        cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-        
-        cursor.execute("""
-            SELECT data FROM pr_cache 
-            WHERE owner = ? AND repo = ? AND fetched_at >= ?
-            ORDER BY pr_number DESC
-        """, (owner, repo, cutoff_iso))
+    where, params = _pr_filter(owner, repo, since, states)
+    if until is not None:
+        where += " AND p.created_at < ?"
+        params.append(_iso_utc(until))
+    
+    if columns:
+        # 圧縮された行は json_extract できないので data ごと読んで復号する
+        paths = [f'$."{key}"' for key in columns]
+        select = "c.codec, CASE WHEN c.codec = 'json' THEN NULL ELSE c.data END, " + ", ".join(
+            "CASE WHEN c.codec = 'json' THEN json_type(c.data, ?) END, "
+            "CASE WHEN c.codec = 'json' THEN json_extract(c.data, ?) END"
+            for _ in columns)
+        params = [path for path in paths for _ in (0, 1)] + params
     else:
-        cursor.execute("""
-            SELECT data FROM pr_cache 
-            WHERE owner = ? AND repo = ?
-            ORDER BY pr_number DESC
-        """, (owner, repo))
+        select = "c.codec, c.data"
+    
+    cursor.execute(f"""
+        SELECT {select} 
+        FROM pr_cache c 
+        JOIN pull_requests p 
+          ON p.owner = c.owner AND p.repo = c.repo AND p.pr_number = c.pr_number 
+        WHERE {where} 
+        ORDER BY c.pr_number DESC
+    """, params)
     
     rows = cursor.fetchall()
-    conn.close()
     
-    return [json.loads(row[0]) for row in rows]
+    if not columns:
+        return [_decode(codec, data) for codec, data in rows]
+    items = []
+    for row in rows:
+        if row[0] == "json":
+            items.append(_project_row(row[2:], columns))
+        else:
+            items.append(_project_item(_decode(row[0], row[1]), columns))
+    return items
+
+
+def _project_row(row: tuple, columns: List[str]) -> Dict:
+    """(json_type, json_extract) の組の並びを dict に戻す"""
+    item = {}
+    for i, key in enumerate(columns):
+        kind, value = row[2 * i], row[2 * i + 1]
+        if kind is None:
+            continue
+        if kind in ("array", "object"):
+            value = json.loads(value)
+        elif kind in ("true", "false"):
+            value = kind == "true"
+        item[key] = value
+    return item
+
+
+def _project_item(item: Dict, columns: List[str]) -> Dict:
+    """復号済みのPRから指定キーだけを取り出す（_project_row と同じ形）"""
+    return {key: item[key] for key in columns if key in item}
+
+
+# get_pr 用のLRU: (DB_PATH, owner, repo, 番号) → (content_hash, PR)
+# 別プロセス（cron）の更新も反映されるよう、ヒット時は主キーで content_hash を照合する
+PR_LRU_SIZE = 256
+_pr_lru = OrderedDict()
+_pr_lru_lock = threading.Lock()
+
+
+def _forget_prs(owner: str, repo: str, pr_numbers: Optional[List[int]] = None) -> None:
+    """LRUから指定PR（None ならリポジトリ全体）を捨てる"""
+    with _pr_lru_lock:
+        if pr_numbers is None:
+            for key in [k for k in _pr_lru if k[1:3] == (owner, repo)]:
+                del _pr_lru[key]
+        else:
+            for number in pr_numbers:
+                _pr_lru.pop((str(DB_PATH), owner, repo, number), None)
+
+
+def get_pr(owner: str, repo: str, pr_number: int, prefetch: int = 0) -> Optional[Dict]:
+    """
+    PRを1件、主キーで取得（無ければ None）
+    prefetch > 0 の場合、キャッシュに無ければ前後 prefetch 件の番号のPRも同じクエリで読み込み、
+    LRUに入れておく（タイムラインで隣のPRを続けて開く場合に再デシリアライズしない）
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    path = str(DB_PATH)
+    
+    cursor.execute("""
+        SELECT content_hash FROM pr_cache 
+        WHERE owner = ? AND repo = ? AND pr_number = ?
+    """, (owner, repo, pr_number))
+    row = cursor.fetchone()
+    if not row:
+        _forget_prs(owner, repo, [pr_number])
+        return None
+    
+    key = (path, owner, repo, pr_number)
+    with _pr_lru_lock:
+        hit = _pr_lru.get(key)
+        if hit and hit[0] == row[0]:
+            _pr_lru.move_to_end(key)
+            return dict(hit[1])
+    
+    cursor.execute("""
+        SELECT pr_number, content_hash, codec, data FROM pr_cache 
+        WHERE owner = ? AND repo = ? AND pr_number BETWEEN ? AND ?
+    """, (owner, repo, pr_number - prefetch, pr_number + prefetch))
+    
+    found = None
+    with _pr_lru_lock:
+        for number, digest, codec, data in cursor.fetchall():
+            cached = _pr_lru.get((path, owner, repo, number))
+            if cached and cached[0] == digest and number != pr_number:
+                continue
+            item = _decode(codec, data)
+            _pr_lru[(path, owner, repo, number)] = (digest, item)
+            _pr_lru.move_to_end((path, owner, repo, number))
+            if number == pr_number:
+                found = item
+        while len(_pr_lru) > PR_LRU_SIZE:
+            _pr_lru.popitem(last=False)
+    
+    return dict(found) if found is not None else None
+
+
+def get_open_pr_numbers(owner: str, repo: str) -> List[int]:
+    """キャッシュ上で OPEN のPR番号一覧（新しい順）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT pr_number 
+        FROM pull_requests 
+        WHERE owner = ? AND repo = ? AND state = 'OPEN'
+        ORDER BY pr_number DESC
+    """, (owner, repo))
+    
+    numbers = [row[0] for row in cursor.fetchall()]
+    
+    return numbers
+
+
+def delete_prs(owner: str, repo: str, pr_numbers: List[int]) -> int:
+    """指定番号のPRをキャッシュから削除"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    keys = [(owner, repo, number) for number in pr_numbers]
+    cursor.executemany("""
+        DELETE FROM pr_cache 
+        WHERE owner = ? AND repo = ? AND pr_number = ?
+    """, keys)
+    
+    deleted = cursor.rowcount
+    if deleted > 0:
+        _bump_data_version(cursor, owner, repo)
+    
+    _forget_prs(owner, repo, pr_numbers)
+    for table in ("pull_requests",) + _PR_CHILD_TABLES:
+        cursor.executemany(f"""
+            DELETE FROM {table} 
+            WHERE owner = ? AND repo = ? AND pr_number = ?
+        """, keys)
+    four_keys.update_rollups(cursor, owner, repo, list(pr_numbers))
+    
+    conn.commit()
+    
+    return deleted
 
 
 def get_cache_info(owner: str, repo: str) -> Optional[Dict]:
-    """キャッシュの最終更新情報を取得"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    """
+    キャッシュの最終更新情報を取得
+    latest_fetch: 最後にAPIから取得した時刻（変更なしの同期も含む）
+    latest_change: 最後に内容が変わったPRの保存時刻
+    """
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
-        SELECT COUNT(*), MAX(fetched_at), MIN(fetched_at)
+        SELECT COUNT(*), MAX(fetched_at), MIN(fetched_at),
+               (SELECT synced_at FROM sync_state WHERE owner = ? AND repo = ? AND kind = 'pr')
         FROM pr_cache 
         WHERE owner = ? AND repo = ?
-    """, (owner, repo))
+    """, (owner, repo, owner, repo))
     
     row = cursor.fetchone()
-    conn.close()
     
     if not row or row[0] == 0:
         return None
     
     return {
         "count": row[0],
-        "latest_fetch": row[1],
+        "latest_fetch": max(row[1], row[3]) if row[3] else row[1],
+        "latest_change": row[1],
         "oldest_fetch": row[2]
     }
 
 
 def clear_cache(owner: str, repo: str) -> int:
     """特定リポジトリのキャッシュをクリア"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -201,104 +927,425 @@ def clear_cache(owner: str, repo: str) -> int:
         WHERE owner = ? AND repo = ?
     """, (owner, repo))
     
+    deleted = cursor.rowcount
+    _bump_data_version(cursor, owner, repo)
+    
+    _forget_prs(owner, repo)
+    for table in ("pull_requests",) + _PR_CHILD_TABLES:
+        cursor.execute(f"""
+            DELETE FROM {table} 
+            WHERE owner = ? AND repo = ?
+        """, (owner, repo))
+    four_keys.update_rollups(cursor, owner, repo)
+    
     cursor.execute("""
-        DELETE FROM etag_cache 
+        DELETE FROM sync_state 
+        WHERE owner = ? AND repo = ?
+    """, (owner, repo))
+    
+    cursor.execute("""
+        DELETE FROM fetch_checkpoint 
         WHERE owner = ? AND repo = ?
     """, (owner, repo))
     
-    deleted = cursor.rowcount
     conn.commit()
-    conn.close()
     
     return deleted
 
 
-def get_etag(owner: str, repo: str) -> Optional[Dict]:
-    """ETag情報を取得"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+# pull_requests の列 → DataFrame の列名（normalize_pr のキーに合わせる）
+_PR_FRAME_COLUMNS = (
+    ("pr_number", "number"), ("title", "title"), ("url", "url"), ("state", "state"),
+    ("is_draft", "isDraft"), ("author", "author"), ("created_at", "createdAt"),
+    ("closed_at", "closedAt"), ("merged_at", "mergedAt"), ("updated_at", "updatedAt"),
+    ("review_decision", "reviewDecision"), ("mergeable", "mergeable"),
+    ("merge_state_status", "mergeStateStatus"), ("checks_state", "checks_state"),
+    ("additions", "additions"), ("deletions", "deletions"), ("changed_files", "changedFiles"),
+    ("comments_count", "comments_count"), ("review_threads", "review_threads"),
+    ("unresolved_threads", "unresolved_threads"), ("approvals", "approvals"),
+    ("changes_requested", "changes_requested"), ("base_ref", "baseRefName"), ("head_ref", "headRefName"),
+    ("lead_time_hours", "lead_time_hours"), ("first_review_at", "firstReviewAt"),
+)
+
+
+def _iso_utc(value) -> str:
+    """
+    datetime を GitHub と同じ形式（UTC, 秒精度, Z）の文字列にする
+    GitHub の日時は秒精度なので、端数は切り上げても >= / < の比較結果は変わらない
+    """
+    if isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    if value.microsecond:
+        value = value.replace(microsecond=0) + timedelta(seconds=1)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _pr_filter(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> Tuple[str, list]:
+    """pull_requests（別名 p）に対する WHERE 句とパラメータ"""
+    clauses = ["p.owner = ?", "p.repo = ?"]
+    params = [owner, repo]
+    if since is not None:
+        clauses.append("p.created_at >= ?")
+        params.append(_iso_utc(since))
+    if states:
+        clauses.append(f"p.state IN ({','.join('?' * len(states))})")
+        params.extend(states)
+    return " AND ".join(clauses), params
+
+
+# 集計SQLの実行関数 (sql, params) -> DataFrame
+# 集計SQLは SQLite と DuckDB（analytics_engine.query）の共通部分で書き、どちらでも実行できるようにする
+SqlReader = Callable[[str, list], pd.DataFrame]
+
+
+def _read_sql(sql: str, params: list) -> pd.DataFrame:
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+
+def _read_frame(sql: str, params: list, dates=(), bools=()) -> pd.DataFrame:
+    """SQLの結果を DataFrame にし、日時列（<列名>_dt, UTC）と真偽値列を型変換する"""
+    df = pd.read_sql_query(sql, get_connection(), params=params)
+    for col in dates:
+        df[f"{col}_dt"] = pd.to_datetime(df[col], format="ISO8601", utc=True, errors="coerce")
+    for col in bools:
+        df[col] = df[col].fillna(0).astype(bool)
+    return df
+
+
+def load_pr_frame(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    PRの一覧を列型付きの DataFrame で返す（JSONの展開なし）
+    since: 作成日時の下限, states: 対象ステータス（None なら全て）
+    """
+    where, params = _pr_filter(owner, repo, since, states)
+    columns = ", ".join(f"p.{col} AS {name}" for col, name in _PR_FRAME_COLUMNS)
+    return _read_frame(f"""
+        SELECT {columns} 
+        FROM pull_requests p 
+        WHERE {where} 
+        ORDER BY p.created_at DESC
+    """, params, dates=("createdAt", "closedAt", "mergedAt", "updatedAt", "firstReviewAt"), bools=("isDraft",))
+
+
+def load_reviews_frame(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """レビュー1件 = 1行の DataFrame（PRのタイトル・作成者・状態などを結合済み）"""
+    where, params = _pr_filter(owner, repo, since, states)
+    return _read_frame(f"""
+        SELECT r.pr_number AS number, r.seq, r.author AS reviewer, r.state AS review_state,
+               r.created_at AS reviewedAt, p.title, p.author, p.state, p.url,
+               p.unresolved_threads, p.comments_count 
+        FROM reviews r 
+        JOIN pull_requests p 
+          ON p.owner = r.owner AND p.repo = r.repo AND p.pr_number = r.pr_number 
+        WHERE {where} 
+        ORDER BY r.pr_number DESC, r.seq
+    """, params, dates=("reviewedAt",))
+
+
+def load_thread_frame(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    レビュースレッド1件 = 1行の DataFrame
+    最初のコメント（指摘）と最後のコメント（最終返信）の作成者・日時を含む
+    """
+    where, params = _pr_filter(owner, repo, since, states)
+    return _read_frame(f"""
+        WITH c AS (
+            SELECT pr_number, thread_index, COUNT(*) AS comment_count,
+                   MIN(seq) AS first_seq, MAX(seq) AS last_seq 
+            FROM thread_comments 
+            WHERE owner = ? AND repo = ? 
+            GROUP BY pr_number, thread_index
+        )
+        SELECT t.pr_number AS number, t.thread_index, t.is_resolved AS isResolved,
+               t.is_outdated AS isOutdated, t.resolved_by AS resolvedBy,
+               t.total_comments AS totalComments, c.comment_count,
+               f.author AS first_author, f.created_at AS firstCommentedAt,
+               l.author AS last_author, l.created_at AS lastCommentedAt,
+               p.title, p.author, p.state, p.url 
+        FROM review_threads t 
+        JOIN pull_requests p 
+          ON p.owner = t.owner AND p.repo = t.repo AND p.pr_number = t.pr_number 
+        JOIN c ON c.pr_number = t.pr_number AND c.thread_index = t.thread_index 
+        JOIN thread_comments f 
+          ON f.owner = t.owner AND f.repo = t.repo AND f.pr_number = t.pr_number 
+         AND f.thread_index = t.thread_index AND f.seq = c.first_seq 
+        JOIN thread_comments l 
+          ON l.owner = t.owner AND l.repo = t.repo AND l.pr_number = t.pr_number 
+         AND l.thread_index = t.thread_index AND l.seq = c.last_seq 
+        WHERE {where} 
+        ORDER BY t.pr_number DESC, t.thread_index
+    """, [owner, repo] + params,
+        dates=("firstCommentedAt", "lastCommentedAt"), bools=("isResolved", "isOutdated"))
+
+
+def load_pr_files_frame(owner: str, repo: str, since=None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """PRで変更されたファイル1件 = 1行の DataFrame（PRの規模・状態を結合済み）"""
+    where, params = _pr_filter(owner, repo, since, states)
+    return _read_frame(f"""
+        SELECT f.pr_number AS number, f.path, p.author, p.state,
+               p.additions, p.deletions, p.changed_files AS changedFiles, p.created_at AS createdAt 
+        FROM pr_files f 
+        JOIN pull_requests p 
+          ON p.owner = f.owner AND p.repo = f.repo AND p.pr_number = f.pr_number 
+        WHERE {where} 
+        ORDER BY f.pr_number DESC, f.path
+    """, params, dates=("createdAt",))
+
+
+def reviewer_stats(owner: str, repo: str, since=None, states: Optional[List[str]] = None,
+                   read_sql: Optional[SqlReader] = None) -> pd.DataFrame:
+    """
+    レビュワー別の集計（SQLで集計）
+    列: reviewer, prs_reviewed（レビューしたPR数）, total_reviews（総レビュー回数）, レビュー状態ごとの件数
+    """
+    read_sql = read_sql or _read_sql
+    where, params = _pr_filter(owner, repo, since, states)
+    base = f"""
+        FROM reviews r 
+        JOIN pull_requests p 
+          ON p.owner = r.owner AND p.repo = r.repo AND p.pr_number = r.pr_number 
+        WHERE {where} AND r.author IS NOT NULL AND r.author != ''
+    """
+    totals = read_sql(f"""
+        SELECT r.author AS reviewer, COUNT(DISTINCT r.pr_number) AS prs_reviewed,
+               COUNT(r.state) AS total_reviews 
+        {base} 
+        GROUP BY r.author 
+        ORDER BY prs_reviewed DESC, r.author
+    """, params)
+    by_state = read_sql(f"""
+        SELECT r.author AS reviewer, r.state, COUNT(*) AS reviews 
+        {base} AND r.state IS NOT NULL 
+        GROUP BY r.author, r.state
+    """, params)
+    if by_state.empty:
+        return totals
+    by_state = by_state.pivot(index="reviewer", columns="state", values="reviews").fillna(0).astype(int)
+    by_state.columns.name = None
+    return totals.merge(by_state.reset_index(), on="reviewer", how="left")
+
+
+def file_change_stats(owner: str, repo: str, since=None, states: Optional[List[str]] = None,
+                      limit: Optional[int] = None, read_sql: Optional[SqlReader] = None) -> pd.DataFrame:
+    """
+    ファイル別の変更頻度（SQLで集計）
+    列: path, change_count（変更したPR数）, total_lines（それらのPRの追加+削除行数の合計）
+    """
+    where, params = _pr_filter(owner, repo, since, states)
+    sql = f"""
+        SELECT f.path, COUNT(*) AS change_count, CAST(SUM(p.additions + p.deletions) AS BIGINT) AS total_lines 
+        FROM pr_files f 
+        JOIN pull_requests p 
+          ON p.owner = f.owner AND p.repo = f.repo AND p.pr_number = f.pr_number 
+        WHERE {where} 
+        GROUP BY f.path 
+        ORDER BY change_count DESC, f.path
+    """
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return (read_sql or _read_sql)(sql, params)
+
+
+def weekly_pr_counts(owner: str, repo: str, since=None, states: Optional[List[str]] = None,
+                     read_sql: Optional[SqlReader] = None) -> pd.DataFrame:
+    """
+    週（月曜始まり, UTC）×ステータスごとのPR作成数
+    列: week（"YYYY-MM-DD/YYYY-MM-DD"）, state, count（週・ステータス順）
+    """
+    where, params = _pr_filter(owner, repo, since, states)
+    # 日単位まではSQLで集計し、週ラベルは小さい結果に対して pandas で付ける
+    daily = (read_sql or _read_sql)(f"""
+        SELECT substr(p.created_at, 1, 10) AS day, p.state, COUNT(*) AS count 
+        FROM pull_requests p 
+        WHERE {where} 
+        GROUP BY substr(p.created_at, 1, 10), p.state
+    """, params)
+    daily["week"] = pd.to_datetime(daily["day"]).dt.to_period("W").astype(str)
+    return daily.groupby(["week", "state"])["count"].sum().reset_index()
+
+
+def get_sync_state(owner: str, repo: str, kind: str = "pr") -> Optional[Dict]:
+    """
+    差分同期の状態を取得
+    watermark: 取得済みデータの updatedAt の最大値
+    window_start: 同期済みの期間の開始日時（createdAt基準）
+    """
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
-        SELECT etag, last_modified, checked_at 
-        FROM etag_cache 
-        WHERE owner = ? AND repo = ?
-    """, (owner, repo))
+        SELECT watermark, window_start, synced_at 
+        FROM sync_state 
+        WHERE owner = ? AND repo = ? AND kind = ?
+    """, (owner, repo, kind))
     
     row = cursor.fetchone()
-    conn.close()
     
     if not row:
         return None
     
     return {
-        "etag": row[0],
-        "last_modified": row[1],
-        "checked_at": row[2]
+        "watermark": row[0],
+        "window_start": row[1],
+        "synced_at": row[2]
     }
 
 
-def save_etag(owner: str, repo: str, etag: Optional[str], last_modified: Optional[str]) -> None:
-    """ETag情報を保存"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def save_sync_state(owner: str, repo: str, watermark: Optional[str], window_start: Optional[str], kind: str = "pr") -> None:
+    """差分同期の状態を保存"""
+    conn = get_connection()
     cursor = conn.cursor()
     
     now = datetime.now(timezone.utc).isoformat()
     
     cursor.execute("""
-        INSERT OR REPLACE INTO etag_cache 
-        (owner, repo, etag, last_modified, checked_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (owner, repo, etag, last_modified, now))
+        INSERT OR REPLACE INTO sync_state 
+        (owner, repo, kind, watermark, window_start, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (owner, repo, kind, watermark, window_start, now))
+    
+    conn.commit()
+
+
+def get_checkpoint(owner: str, repo: str, kind: str = "pr") -> Optional[Dict]:
+    """
+    中断したページ走査のチェックポイントを取得
+    cursor: 次に取得するページのカーソル
+    params: 走査条件（条件が一致する場合のみ再開する）
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT run_id, cursor, params, updated_at 
+        FROM fetch_checkpoint 
+        WHERE owner = ? AND repo = ? AND kind = ?
+    """, (owner, repo, kind))
+    
+    row = cursor.fetchone()
+    
+    if not row:
+        return None
+    
+    return {
+        "run_id": row[0],
+        "cursor": row[1],
+        "params": json.loads(row[2]),
+        "updated_at": row[3]
+    }
+
+
+def _write_checkpoint(cursor, owner: str, repo: str, checkpoint: Dict) -> None:
+    """
+    checkpoint = {"kind", "run_id", "cursor", "params"}
+    cursor が None（走査完了）の場合はチェックポイントを削除する
+    """
+    if checkpoint.get("cursor") is None:
+        cursor.execute("""
+            DELETE FROM fetch_checkpoint 
+            WHERE owner = ? AND repo = ? AND kind = ?
+        """, (owner, repo, checkpoint["kind"]))
+        return
+    
+    cursor.execute("""
+        INSERT OR REPLACE INTO fetch_checkpoint 
+        (owner, repo, kind, run_id, cursor, params, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (owner, repo, checkpoint["kind"], checkpoint["run_id"], checkpoint["cursor"],
+          json.dumps(checkpoint.get("params") or {}, sort_keys=True),
+          datetime.now(timezone.utc).isoformat()))
+
+
+def clear_checkpoint(owner: str, repo: str, kind: str = "pr") -> None:
+    """チェックポイントを削除"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    _write_checkpoint(cursor, owner, repo, {"kind": kind, "cursor": None})
     
     conn.commit()
-    conn.close()
 
 
-def save_aggregated_stats(owner: str, repo: str, stat_type: str, stats_dict: Dict[str, any]) -> None:
+def _bump_data_version(cursor, owner: str, repo: str) -> None:
+    """データ版を1つ進める（内容を変更したトランザクション内で呼ぶ）"""
+    cursor.execute("""
+        INSERT INTO data_version (owner, repo, version, updated_at) 
+        VALUES (?, ?, 1, ?) 
+        ON CONFLICT (owner, repo) DO UPDATE SET 
+            version = version + 1, updated_at = excluded.updated_at
+    """, (owner, repo, datetime.now(timezone.utc).isoformat()))
+
+
+def get_data_version(owner: str, repo: str) -> int:
+    """
+    リポジトリのデータ版（save_prs / save_issues で内容が変わるたびに増える。未保存なら 0）
+    派生キャッシュはこの版とフィルタ条件をキーにするので、データが変われば即座に無効になる
+    """
+    cursor = get_connection().cursor()
+    cursor.execute("""
+        SELECT version FROM data_version 
+        WHERE owner = ? AND repo = ?
+    """, (owner, repo))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _params_key(params: Optional[Dict]) -> str:
+    """フィルタ条件をキー文字列にする（リストは順序に依存しない）"""
+    params = params or {}
+    return json.dumps({k: sorted(v) if isinstance(v, (list, tuple, set)) else v
+                       for k, v in params.items()}, sort_keys=True)
+
+
+def save_aggregated_stats(owner: str, repo: str, stat_type: str, stats_dict: Dict[str, any],
+                          data_version: int, params: Optional[Dict] = None) -> None:
     """
     集計統計をDBに保存
     stat_type: 'dir_stats', 'file_stats', 'summary', etc.
     stats_dict: {key: value} の辞書
+    data_version: 集計元データを読む前に取得したデータ版, params: 集計時のフィルタ条件（days, states など）
     """
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     now = datetime.now(timezone.utc).isoformat()
+    params_key = _params_key(params)
     
-    for key, value in stats_dict.items():
-        cursor.execute("""
-            INSERT OR REPLACE INTO aggregated_stats 
-            (owner, repo, stat_type, stat_key, stat_data, computed_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (owner, repo, stat_type, key, json.dumps(value), now))
+    # 同じ条件の古い結果と、古い版の結果を捨てる
+    cursor.execute("""
+        DELETE FROM aggregated_stats 
+        WHERE owner = ? AND repo = ? AND stat_type = ? AND (params = ? OR data_version < ?)
+    """, (owner, repo, stat_type, params_key, data_version))
+    cursor.executemany("""
+        INSERT OR REPLACE INTO aggregated_stats 
+        (owner, repo, stat_type, params, data_version, stat_key, stat_data, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(owner, repo, stat_type, params_key, data_version, key, json.dumps(value), now)
+          for key, value in stats_dict.items()])
     
     conn.commit()
-    conn.close()
 
 
-def load_aggregated_stats(owner: str, repo: str, stat_type: str, max_age_minutes: int = 60) -> Optional[Dict]:
+def load_aggregated_stats(owner: str, repo: str, stat_type: str, params: Optional[Dict] = None,
+                          data_version: Optional[int] = None) -> Optional[Dict]:
     """
-    集計統計をDBから読み込み
-    max_age_minutes: 統計の有効期限（分）
+    集計統計をDBから読み込み（データ版とフィルタ条件が一致する場合のみ。無ければ None）
+    data_version: 省略時は現在のデータ版
     """
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    if data_version is None:
+        data_version = get_data_version(owner, repo)
+    conn = get_connection()
     cursor = conn.cursor()
     
-    cutoff = datetime.now(timezone.utc).timestamp() - (max_age_minutes * 60)
-    cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-    
     cursor.execute("""
         SELECT stat_key, stat_data, computed_at 
         FROM aggregated_stats 
-        WHERE owner = ? AND repo = ? AND stat_type = ? AND computed_at >= ?
-    """, (owner, repo, stat_type, cutoff_iso))
+        WHERE owner = ? AND repo = ? AND stat_type = ? AND params = ? AND data_version = ?
+    """, (owner, repo, stat_type, _params_key(params), data_version))
     
     rows = cursor.fetchall()
-    conn.close()
     
     if not rows:
         return None
@@ -312,8 +1359,7 @@ def load_aggregated_stats(owner: str, repo: str, stat_type: str, max_age_minutes
 
 def clear_aggregated_stats(owner: str, repo: str) -> int:
     """集計統計をクリア"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -323,19 +1369,23 @@ def clear_aggregated_stats(owner: str, repo: str) -> int:
     
     deleted = cursor.rowcount
     conn.commit()
-    conn.close()
     
     return deleted
 
 
-def save_file_tree(owner: str, repo: str, all_paths: List[str], path_tree: dict) -> None:
-    """ファイルツリー情報をDBに保存"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def save_file_tree(owner: str, repo: str, all_paths: List[str], path_tree: dict,
+                   data_version: int, params: Optional[Dict] = None) -> None:
+    """ファイルツリー情報をDBに保存（キーは save_aggregated_stats と同じ）"""
+    conn = get_connection()
     cursor = conn.cursor()
     
     now = datetime.now(timezone.utc).isoformat()
     
+    cursor.execute("""
+        DELETE FROM file_tree_cache 
+        WHERE owner = ? AND repo = ? AND data_version < ?
+    """, (owner, repo, data_version))
+    
     # setをlistに変換してからJSON化
     def convert_sets(obj):
         if isinstance(obj, dict):
@@ -348,31 +1398,29 @@ def save_file_tree(owner: str, repo: str, all_paths: List[str], path_tree: dict)
     
     cursor.execute("""
         INSERT OR REPLACE INTO file_tree_cache 
-        (owner, repo, all_paths, path_tree, computed_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (owner, repo, json.dumps(all_paths), json.dumps(tree_serializable), now))
+        (owner, repo, params, data_version, all_paths, path_tree, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (owner, repo, _params_key(params), data_version,
+          json.dumps(all_paths), json.dumps(tree_serializable), now))
     
     conn.commit()
-    conn.close()
 
 
-def load_file_tree(owner: str, repo: str, max_age_hours: int = 24) -> Optional[Tuple[List[str], dict]]:
-    """ファイルツリー情報をDBから読み込み"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def load_file_tree(owner: str, repo: str, params: Optional[Dict] = None,
+                   data_version: Optional[int] = None) -> Optional[Tuple[List[str], dict]]:
+    """ファイルツリー情報をDBから読み込み（データ版とフィルタ条件が一致する場合のみ）"""
+    if data_version is None:
+        data_version = get_data_version(owner, repo)
+    conn = get_connection()
     cursor = conn.cursor()
     
-    cutoff = datetime.now(timezone.utc).timestamp() - (max_age_hours * 3600)
-    cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-    
     cursor.execute("""
         SELECT all_paths, path_tree, computed_at 
         FROM file_tree_cache 
-        WHERE owner = ? AND repo = ? AND computed_at >= ?
-    """, (owner, repo, cutoff_iso))
+        WHERE owner = ? AND repo = ? AND params = ? AND data_version = ?
+    """, (owner, repo, _params_key(params), data_version))
     
     row = cursor.fetchone()
-    conn.close()
     
     if not row:
         return None
@@ -397,28 +1445,29 @@ def load_file_tree(owner: str, repo: str, max_age_hours: int = 24) -> Optional[T
     return all_paths, path_tree
 
 
-def save_dir_stats(owner: str, repo: str, dir_stats_df: pd.DataFrame) -> None:
-    """ディレクトリ統計をDBに保存"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def save_dir_stats(owner: str, repo: str, dir_stats_df: pd.DataFrame,
+                   data_version: int, params: Optional[Dict] = None) -> None:
+    """ディレクトリ統計をDBに保存（キーは save_aggregated_stats と同じ）"""
+    conn = get_connection()
     cursor = conn.cursor()
     
     now = datetime.now(timezone.utc).isoformat()
+    params_key = _params_key(params)
     
-    # 既存データを削除
+    # 同じ条件の既存データと、古い版のデータを削除
     cursor.execute("""
         DELETE FROM dir_stats_cache 
-        WHERE owner = ? AND repo = ?
-    """, (owner, repo))
+        WHERE owner = ? AND repo = ? AND (params = ? OR data_version < ?)
+    """, (owner, repo, params_key, data_version))
     
     # 新しいデータを挿入
     for _, row in dir_stats_df.iterrows():
         cursor.execute("""
             INSERT INTO dir_stats_cache 
-            (owner, repo, dir_path, total_prs, open_count, last_activity, computed_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (owner, repo, params, data_version, dir_path, total_prs, open_count, last_activity, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            owner, repo, 
+            owner, repo, params_key, data_version, 
             row['dir_key'], 
             int(row['total_prs']), 
             int(row['open_cnt']),
@@ -427,27 +1476,24 @@ def save_dir_stats(owner: str, repo: str, dir_stats_df: pd.DataFrame) -> None:
         ))
     
     conn.commit()
-    conn.close()
 
 
-def load_dir_stats(owner: str, repo: str, max_age_hours: int = 24) -> Optional[pd.DataFrame]:
-    """ディレクトリ統計をDBから読み込み"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+def load_dir_stats(owner: str, repo: str, params: Optional[Dict] = None,
+                   data_version: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """ディレクトリ統計をDBから読み込み（データ版とフィルタ条件が一致する場合のみ）"""
+    if data_version is None:
+        data_version = get_data_version(owner, repo)
+    conn = get_connection()
     cursor = conn.cursor()
     
-    cutoff = datetime.now(timezone.utc).timestamp() - (max_age_hours * 3600)
-    cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-    
     cursor.execute("""
         SELECT dir_path, total_prs, open_count, last_activity 
         FROM dir_stats_cache 
-        WHERE owner = ? AND repo = ? AND computed_at >= ?
+        WHERE owner = ? AND repo = ? AND params = ? AND data_version = ?
         ORDER BY last_activity DESC
-    """, (owner, repo, cutoff_iso))
+    """, (owner, repo, _params_key(params), data_version))
     
     rows = cursor.fetchall()
-    conn.close()
     
     if not rows:
         return None
@@ -460,8 +1506,7 @@ def load_dir_stats(owner: str, repo: str, max_age_hours: int = 24) -> Optional[p
 
 def clear_file_caches(owner: str, repo: str) -> int:
     """ファイル関連のキャッシュをクリア"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -477,66 +1522,35 @@ def clear_file_caches(owner: str, repo: str) -> int:
     deleted_stats = cursor.rowcount
     
     conn.commit()
-    conn.close()
     
     return deleted_tree + deleted_stats
 
 
-def save_issues(owner: str, repo: str, issue_list: List[Dict]) -> None:
-    """Save issue data to DB (UPSERT)"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
-    for issue in issue_list:
-        issue_number = issue.get("number")
-        if not issue_number:
-            continue
-            
-        cursor.execute("""
-            INSERT OR REPLACE INTO issue_cache 
-            (owner, repo, issue_number, data, fetched_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (owner, repo, issue_number, json.dumps(issue), now))
-    
-    conn.commit()
-    conn.close()
+def save_issues(owner: str, repo: str, issue_list: List[Dict], checkpoint: Optional[Dict] = None) -> Dict[str, int]:
+    """Save issue data to DB (UPSERT, unchanged issues are skipped). Returns new/changed/unchanged counts."""
+    return _upsert_items("issue_cache", "issue_number", owner, repo, issue_list, checkpoint)
 
 
-def load_issues(owner: str, repo: str, max_age_hours: Optional[int] = None) -> List[Dict]:
+def load_issues(owner: str, repo: str) -> List[Dict]:
     """Load issue data from DB"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
-    if max_age_hours:
-        cutoff = datetime.now(timezone.utc).timestamp() - (max_age_hours * 3600)
-        cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-        
-        cursor.execute("""
-            SELECT data FROM issue_cache 
-            WHERE owner = ? AND repo = ? AND fetched_at >= ?
-            ORDER BY issue_number DESC
-        """, (owner, repo, cutoff_iso))
-    else:
-        cursor.execute("""
-            SELECT data FROM issue_cache 
-            WHERE owner = ? AND repo = ?
-            ORDER BY issue_number DESC
-        """, (owner, repo))
+    # fetched_at は最後に内容が変わった時刻なので、取得時刻での絞り込みはしない
+    cursor.execute("""
+        SELECT codec, data FROM issue_cache 
+        WHERE owner = ? AND repo = ?
+        ORDER BY issue_number DESC
+    """, (owner, repo))
     
     rows = cursor.fetchall()
-    conn.close()
     
-    return [json.loads(row[0]) for row in rows]
+    return [_decode(codec, data) for codec, data in rows]
 
 
 def get_issue_cache_info(owner: str, repo: str) -> Optional[Dict]:
     """Get issue cache information"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -546,7 +1560,6 @@ def get_issue_cache_info(owner: str, repo: str) -> Optional[Dict]:
     """, (owner, repo))
     
     row = cursor.fetchone()
-    conn.close()
     
     if not row or row[0] == 0:
         return None
@@ -0,0 +1,125 @@
+# derived.py
+"""
+PRの派生列（取り込み時に1回だけ計算する列と、読み込み時に計算する時刻依存の列）
+
+時刻に依存しない値（日時の変換・終了日時・リードタイム・最初のレビュー・
+クローズ済みPRの営業時間）は取り込み時に計算して保存する。
+  - db_cache.save_prs: pull_requests の型付き列（lead_time_hours, first_review_at）に書く（derive_pr）
+  - snapshot: fetch_data.py の同期後の書き出しで列として持つ（add_derived_columns）
+経過時間（age_hours）・滞留バケット・OPEN のPRの営業時間のように現在時刻で変わる値は保存せず、
+ページの読み込み時に1つの now から計算する（add_age_columns）。
+
+    raw_df = data_access.load_pr_frame(owner, repo, data_version, days=30)  # 派生列は計算済み
+    derived.add_age_columns(raw_df, now_utc)  # age_hours, age_bucket, business_hours, business_days
+"""
+import datetime as dt
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from business_hours import BusinessCalendar, business_hours, default_calendar
+
+DATE_COLUMNS = ("createdAt", "closedAt", "mergedAt")
+# 取り込み時に作る列（snapshot は列の射影に関係なくこれらを含める）
+DERIVED_COLUMNS = (
+    "createdAt_dt", "closedAt_dt", "mergedAt_dt", "end_dt", "lead_time_hours",
+    "firstReviewAt_dt", "first_review_hours", "business_hours",
+)
+
+# 経過時間の滞留バケット（右端を含まない）
+AGE_BINS = [0, 24, 72, 168, 336, 672, 999999]
+AGE_LABELS = ["<1d", "1-3d", "3-7d", "7-14d", "14-28d", ">=28d"]
+
+
+def _parse(value: Optional[str]) -> Optional[dt.datetime]:
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _first_review(author: Optional[str], reviews) -> Optional[str]:
+    author = author or ""
+    times = [review.get("createdAt") for review in (reviews if isinstance(reviews, list) else [])
+             if review.get("createdAt") and (review.get("author") or "") != author]
+    return min(times) if times else None
+
+
+def first_review_at(pr: Dict) -> Optional[str]:
+    """作成者以外による最初のレビューの日時（ISO8601文字列。無ければ None）"""
+    return _first_review(pr.get("author"), pr.get("review_details"))
+
+
+def derive_pr(pr: Dict) -> Dict:
+    """PR1件の時刻に依存しない派生値（pull_requests の型付き列に保存する）"""
+    created, merged = _parse(pr.get("createdAt")), _parse(pr.get("mergedAt"))
+    return {
+        "lead_time_hours": (merged - created).total_seconds() / 3600 if created and merged else None,
+        "first_review_at": first_review_at(pr),
+    }
+
+
+def age_hours(pr: Dict, now: Optional[dt.datetime] = None) -> float:
+    """PR1件の経過時間（作成 → マージ/クローズ、OPEN なら now まで）"""
+    created = _parse(pr.get("createdAt"))
+    if created is None:
+        return 0.0
+    end = _parse(pr.get("mergedAt")) or _parse(pr.get("closedAt")) or now or dt.datetime.now(dt.timezone.utc)
+    return (end - created).total_seconds() / 3600
+
+
+def add_derived_columns(df: pd.DataFrame, calendar: Optional[BusinessCalendar] = None) -> pd.DataFrame:
+    """
+    時刻に依存しない派生列を追加する（df を変更して返す）
+    createdAt_dt / closedAt_dt / mergedAt_dt: 日時（UTC）
+    end_dt: マージ → クローズの日時（OPEN は NaT）
+    lead_time_hours: 作成 → マージ（マージされていなければ NaN）
+    firstReviewAt_dt / first_review_hours: 作成者以外による最初のレビュー（review_details がある場合）
+    business_hours: 作成 → end_dt の営業時間（OPEN は NaN。add_age_columns で埋める）
+    """
+    if "createdAt" not in df.columns:
+        return df
+    for col in DATE_COLUMNS:
+        source = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        df[f"{col}_dt"] = pd.to_datetime(source, format="ISO8601", utc=True, errors="coerce")
+    created = df["createdAt_dt"]
+    df["end_dt"] = df["mergedAt_dt"].fillna(df["closedAt_dt"])
+    df["lead_time_hours"] = (df["mergedAt_dt"] - created).dt.total_seconds() / 3600
+
+    if "review_details" in df.columns:
+        authors = df["author"] if "author" in df.columns else pd.Series(None, index=df.index, dtype=object)
+        first = [_first_review(author, reviews) for author, reviews in zip(authors, df["review_details"])]
+        df["firstReviewAt_dt"] = pd.to_datetime(pd.Series(first, index=df.index, dtype=object),
+                                               format="ISO8601", utc=True, errors="coerce")
+        df["first_review_hours"] = (df["firstReviewAt_dt"] - created).dt.total_seconds() / 3600
+
+    closed = df["end_dt"].notna().to_numpy()
+    hours = business_hours(created, df["end_dt"], calendar or default_calendar())
+    df["business_hours"] = np.where(closed, hours, np.nan)
+    return df
+
+
+def add_age_columns(df: pd.DataFrame, now: dt.datetime,
+                    calendar: Optional[BusinessCalendar] = None) -> pd.DataFrame:
+    """
+    現在時刻で変わる列を now から計算して追加する（df を変更して返す）
+    age_hours: 作成 → end_dt（OPEN は now）, age_bucket: AGE_BINS の区分
+    business_hours: OPEN のPRを now までの値で埋める, business_days: 営業時間 / 1日の営業時間
+    add_derived_columns の列が無い DataFrame では先にそれを計算する
+    """
+    if "end_dt" not in df.columns:
+        add_derived_columns(df, calendar)
+    if "createdAt_dt" not in df.columns:
+        return df
+    calendar = calendar or default_calendar()
+    now = pd.Timestamp(now)
+    now = now.tz_localize("UTC") if now.tzinfo is None else now.tz_convert("UTC")
+
+    created = df["createdAt_dt"]
+    df["age_hours"] = ((df["end_dt"].fillna(now) - created).dt.total_seconds() / 3600).fillna(0.0)
+    df["age_bucket"] = pd.cut(df["age_hours"], bins=AGE_BINS, labels=AGE_LABELS, right=False)
+
+    still_open = df["business_hours"].isna()
+    if still_open.any():
+        df.loc[still_open, "business_hours"] = business_hours(created[still_open], now, calendar)
+    df["business_days"] = (df["business_hours"] / calendar.hours_per_day).round(1)
+    return df
+
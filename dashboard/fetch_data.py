@@ -7,25 +7,54 @@ GitHub APIからPRデータを取得してローカルDBに保存
     python fetch_data.py                    # デフォルトリポジトリ
     python fetch_data.py owner/repo         # 特定リポジトリ
     python fetch_data.py --all              # config.pyの全リポジトリ
-    python fetch_data.py --force            # ETagを無視して強制取得
+    python fetch_data.py --all --workers 4  # 4並列で取得
+    python fetch_data.py --force            # 差分同期を無視して全期間を強制取得
+    python fetch_data.py --all --dry-run    # 消費ポイントの見積もりのみ表示
+    python fetch_data.py --all --estimate   # 見積もりに基づいてペース配分しながら取得
+    python fetch_data.py --all --batch-size 10  # 10リポジトリずつ1クエリにまとめて取得
+    python fetch_data.py --all --async --workers 8  # asyncioクライアントで8並列取得（要 aiohttp）
+    python fetch_data.py --all --open-only  # オープンPRだけを再取得（高速更新）
+
+差分同期:
+    前回取得時の updatedAt の最高水位を db_cache に保存し、次回以降は
+    UPDATED_AT 降順で最高水位に達するまでの変更PRだけを取得・保存する
+
+レートリミット:
+    --estimate / --dry-run 指定時は実行前に dryRun で1ページあたりのポイントを見積もり、
+    残ポイントを超える場合は resetAt までに使い切らないようリクエスト間隔を広げる。
+    指定しない場合も取得中の rateLimit 応答を見て、残ポイントが少なければ同時実行を絞り、
+    不足したら resetAt まで待機する
     
 定期実行（cron/Task Scheduler）:
     毎日午前2時に実行: 0 2 * * * cd /path/to/dashboard && python fetch_data.py
+    10分おきにオープンPRを更新: */10 * * * * cd /path/to/dashboard && python fetch_data.py --all --open-only
 """
 
 import sys
+import uuid
+import asyncio
 import argparse
-import requests  # REST API 用に追加（pip install requests が必要）
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 
 # カレントディレクトリをスクリプトの場所に設定
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
 import config
-from fetcher import run_query, run_issue_query
+from fetcher import (
+    iter_pr_pages, iter_issue_pages, iter_batch_pages, run_pr_numbers_query, configure_concurrency, get_session, estimate_page_cost,
+    REQUEST_BUDGET, SCHEDULER, PR_PAGE_SIZE, ISSUE_PAGE_SIZE,
+)
 import db_cache
+import async_fetcher
+import snapshot
+
+
+# この実行の識別子（チェックポイントに記録）
+RUN_ID = uuid.uuid4().hex
 
 
 def parse_repo_arg(repo_arg: str) -> tuple[str, str]:
@@ -36,132 +65,392 @@ def parse_repo_arg(repo_arg: str) -> tuple[str, str]:
     return config.DEFAULT_OWNER, repo_arg
 
 
-def run_query_rest(owner: str, repo: str, cutoff_dt: datetime) -> list:
-    """REST API を使用して PR データを取得（GraphQL フォールバック用）"""
-    endpoint = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-    headers = {
-        "Authorization": f"token {config.GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def resolve_updated_since(owner: str, repo: str, cutoff_dt: datetime, force: bool = False) -> Optional[datetime]:
+    """
+    差分同期の起点（前回の最高水位）を決定
+    強制取得・未同期・対象期間が前回より広がった場合は None（全件取得）
+    """
+    if force:
+        return None
+    state = db_cache.get_sync_state(owner, repo)
+    if not state or not state["watermark"] or not state["window_start"]:
+        return None
+    if cutoff_dt < _parse_iso(state["window_start"]):
+        return None
+    return _parse_iso(state["watermark"])
+
+
+def _later(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """ISO8601 文字列のうち新しい方（None は無視）"""
+    if not a or not b:
+        return a or b
+    return b if _parse_iso(b) > _parse_iso(a) else a
+
+
+def resume_cursor(owner: str, repo: str, kind: str, params: dict) -> Optional[str]:
+    """
+    前回中断した走査のカーソルを返す（走査条件が一致する場合のみ）
+    条件が異なるチェックポイントは破棄して最初から取得する
+    """
+    checkpoint = db_cache.get_checkpoint(owner, repo, kind)
+    if not checkpoint:
+        return None
+    if checkpoint["params"] != params:
+        db_cache.clear_checkpoint(owner, repo, kind)
+        return None
+    _log(owner, repo, f"Resuming {kind} fetch from checkpoint (run {checkpoint['run_id'][:8]}, "
+                      f"saved {checkpoint['updated_at']})")
+    return checkpoint["cursor"]
+
+
+def latest_updated_at(pr_list: list, current: Optional[str] = None) -> Optional[str]:
+    """PRリストの updatedAt の最大値（current より新しいもののみ採用）"""
+    latest = current
+    for pr in pr_list:
+        latest = _later(latest, pr.get("updatedAt"))
+    return latest
+
+
+def record_sync(owner: str, repo: str, pr_list: list, cutoff_dt: datetime, updated_since: Optional[datetime],
+                latest: Optional[str] = None) -> None:
+    """
+    取得結果から最高水位を更新
+    ページごとに保存した場合は pr_list の代わりに latest（取得したPRの最新 updatedAt）を渡す
+    """
+    state = db_cache.get_sync_state(owner, repo) if updated_since else None
+    watermark = state["watermark"] if state else None
+    window_start = state["window_start"] if state else cutoff_dt.isoformat()
     
-    params = {
-        "state": "all",
-        "sort": "updated",
-        "direction": "desc",
-        "per_page": 100  # 1回のリクエストで最大100件
-    }
+    watermark = _later(latest_updated_at(pr_list, watermark), latest)
     
+    db_cache.save_sync_state(owner, repo, watermark, window_start)
+
+
+def finish_sync(owner: str, repo: str, pr_list: list, cutoff_dt: datetime, updated_since: Optional[datetime],
+                complete: bool, latest: Optional[str] = None) -> None:
+    """
+    走査を終えた場合だけ最高水位を更新する
+    ページ上限で打ち切った場合に水位を進めると、未取得の古い変更PRが次回以降も取得されなくなる。
+    """
+    if complete:
+        record_sync(owner, repo, pr_list, cutoff_dt, updated_since, latest=latest)
+    else:
+        _log(owner, repo, "Stopped at the page limit; sync watermark kept until the walk completes")
+
+
+REST_API_URL = "https://api.github.com"
+REST_HEADERS = {"Accept": "application/vnd.github.v3+json"}  # 認証は共有セッションのヘッダーを使用
+
+REST_PR_PARAMS = {
+    "state": "all",
+    "sort": "updated",
+    "direction": "desc",
+    "per_page": 100  # 1回のリクエストで最大100件
+}
+
+REST_ISSUE_PARAMS = {
+    "state": "all",
+    "sort": "updated",
+    "direction": "desc",
+    "per_page": 100,
+    "filter": "all"  # Issues + PR を除外しない
+}
+
+
+def _check_rest_response(status: int, text: str) -> None:
+    if status == 403 and "API rate limit exceeded" in text:
+        raise Exception("REST API rate limit exceeded")
+    elif status != 200:
+        raise Exception(f"REST API error: {status} - {text}")
+
+
+def map_rest_prs(data: list, cutoff_dt: datetime) -> list:
+    """REST API の PR 一覧を GraphQL のデータ構造にマッピング"""
     pr_list = []
+    for pr in data:
+        created_at = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00"))
+        if created_at < cutoff_dt:
+            continue  # 対象期間外
+        
+        pr_list.append({
+            "number": pr["number"],
+            "title": pr["title"],
+            "state": pr["state"].upper(),  # "open" -> "OPEN", "closed" -> "CLOSED"
+            "author": pr["user"]["login"] if pr["user"] else None,
+            "createdAt": pr["created_at"],
+            "updatedAt": pr["updated_at"],
+            "closedAt": pr.get("closed_at"),
+            "mergedAt": pr.get("merged_at"),
+            "labels": [label["name"] for label in pr.get("labels", [])],
+            "comments_count": pr.get("comments", 0),
+            "reviews_count": 0,  # REST API では直接取得できないのでデフォルト0（必要に応じて拡張）
+            "additions": 0,  # 同上
+            "deletions": 0,  # 同上
+            "changedFiles": 0  # 同上
+        })
+    return pr_list
+
+
+def map_rest_issues(data: list, cutoff_dt: datetime) -> list:
+    """REST API の Issue 一覧を GraphQL のデータ構造にマッピング"""
+    issue_list = []
+    for issue in data:
+        # PR を除外（pull_request フィールドがあるものは PR）
+        if "pull_request" in issue:
+            continue
+        
+        created_at = datetime.fromisoformat(issue["created_at"].replace("Z", "+00:00"))
+        if created_at < cutoff_dt:
+            continue
+        
+        issue_list.append({
+            "number": issue["number"],
+            "title": issue["title"],
+            "state": issue["state"].upper(),
+            "author": issue["user"]["login"] if issue["user"] else None,
+            "createdAt": issue["created_at"],
+            "updatedAt": issue["updated_at"],
+            "closedAt": issue.get("closed_at"),
+            "labels": [label["name"] for label in issue.get("labels", [])],
+            "comments_count": issue.get("comments", 0),
+            "assignees": [assignee["login"] for assignee in issue.get("assignees", [])]
+        })
+    return issue_list
+
+
+def _run_rest(endpoint: str, base_params: dict, mapper, cutoff_dt: datetime) -> list:
+    sess = get_session()
+    params = dict(base_params)
+    items = []
     page = 1
     
     while True:
         params["page"] = page
-        response = requests.get(endpoint, headers=headers, params=params)
-        
-        if response.status_code == 403 and "API rate limit exceeded" in response.text:
-            raise Exception("REST API rate limit exceeded")
-        elif response.status_code != 200:
-            raise Exception(f"REST API error: {response.status_code} - {response.text}")
+        with REQUEST_BUDGET.slot():
+            response = sess.get(endpoint, headers=REST_HEADERS, params=params, timeout=30)
+        _check_rest_response(response.status_code, response.text)
         
         data = response.json()
         if not data:
             break
-        
-        for pr in data:
-            # GraphQL のデータ構造にマッピング
-            created_at = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00"))
-            if created_at < cutoff_dt:
-                continue  # 対象期間外
-            
-            mapped_pr = {
-                "number": pr["number"],
-                "title": pr["title"],
-                "state": pr["state"].upper(),  # "open" -> "OPEN", "closed" -> "CLOSED"
-                "author": pr["user"]["login"] if pr["user"] else None,
-                "createdAt": pr["created_at"],
-                "updatedAt": pr["updated_at"],
-                "closedAt": pr.get("closed_at"),
-                "mergedAt": pr.get("merged_at"),
-                "labels": [label["name"] for label in pr.get("labels", [])],
-                "comments_count": pr.get("comments", 0),
-                "reviews_count": 0,  # REST API では直接取得できないのでデフォルト0（必要に応じて拡張）
-                "additions": 0,  # 同上
-                "deletions": 0,  # 同上
-                "changedFiles": 0  # 同上
-            }
-            pr_list.append(mapped_pr)
+        items.extend(mapper(data, cutoff_dt))
         
         page += 1
         if len(data) < 100:  # 最終ページ
             break
     
-    return pr_list
+    return items
 
 
-def run_issue_query_rest(owner: str, repo: str, cutoff_dt: datetime) -> list:
-    """REST API を使用して Issue データを取得（GraphQL フォールバック用）"""
-    endpoint = f"https://api.github.com/repos/{owner}/{repo}/issues"
-    headers = {
-        "Authorization": f"token {config.GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    params = {
-        "state": "all",
-        "sort": "updated",
-        "direction": "desc",
-        "per_page": 100,
-        "filter": "all"  # Issues + PR を除外しない
-    }
-    
-    issue_list = []
+async def _run_rest_async(client, endpoint: str, base_params: dict, mapper, cutoff_dt: datetime) -> list:
+    params = dict(base_params)
+    items = []
     page = 1
     
     while True:
         params["page"] = page
-        response = requests.get(endpoint, headers=headers, params=params)
+        status, text, data = await client.rest_get(endpoint, params=params, headers=REST_HEADERS)
+        _check_rest_response(status, text)
         
-        if response.status_code == 403 and "API rate limit exceeded" in response.text:
-            raise Exception("REST API rate limit exceeded")
-        elif response.status_code != 200:
-            raise Exception(f"REST API error: {response.status_code} - {response.text}")
-        
-        data = response.json()
         if not data:
             break
+        items.extend(mapper(data, cutoff_dt))
         
-        for issue in data:
-            # PR を除外（pull_request フィールドがあるものは PR）
-            if "pull_request" in issue:
-                continue
+        page += 1
+        if len(data) < 100:  # 最終ページ
+            break
+    
+    return items
+
+
+def run_query_rest(owner: str, repo: str, cutoff_dt: datetime) -> list:
+    """REST API を使用して PR データを取得（GraphQL フォールバック用）"""
+    endpoint = f"{REST_API_URL}/repos/{owner}/{repo}/pulls"
+    return _run_rest(endpoint, REST_PR_PARAMS, map_rest_prs, cutoff_dt)
+
+
+def run_issue_query_rest(owner: str, repo: str, cutoff_dt: datetime) -> list:
+    """REST API を使用して Issue データを取得（GraphQL フォールバック用）"""
+    endpoint = f"{REST_API_URL}/repos/{owner}/{repo}/issues"
+    return _run_rest(endpoint, REST_ISSUE_PARAMS, map_rest_issues, cutoff_dt)
+
+
+async def run_query_rest_async(client, owner: str, repo: str, cutoff_dt: datetime) -> list:
+    """run_query_rest の非同期版（async_fetcher.AsyncGitHubClient を使用）"""
+    endpoint = f"{REST_API_URL}/repos/{owner}/{repo}/pulls"
+    return await _run_rest_async(client, endpoint, REST_PR_PARAMS, map_rest_prs, cutoff_dt)
+
+
+async def run_issue_query_rest_async(client, owner: str, repo: str, cutoff_dt: datetime) -> list:
+    """run_issue_query_rest の非同期版（async_fetcher.AsyncGitHubClient を使用）"""
+    endpoint = f"{REST_API_URL}/repos/{owner}/{repo}/issues"
+    return await _run_rest_async(client, endpoint, REST_ISSUE_PARAMS, map_rest_issues, cutoff_dt)
+
+
+def _log(owner: str, repo: str, message: str) -> None:
+    print(f"   [{owner}/{repo}] {message}")
+
+
+def add_counts(total: Optional[dict], counts: dict) -> dict:
+    """save_prs / save_issues の new/changed/unchanged 件数を合算"""
+    total = dict(total or {"new": 0, "changed": 0, "unchanged": 0})
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def _format_counts(counts: dict) -> str:
+    return f"{counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged"
+
+
+def pr_stream_result(owner: str, repo: str, saved_count: int, is_modified: bool,
+                     counts: Optional[dict] = None) -> dict:
+    """
+    保存件数からPRのステータスを決めてログ出力
+    counts（save_prs の戻り値）で新規・変更が無ければ unchanged とする
+    """
+    result = {"pr_status": "empty", "pr_count": 0}
+    if counts:
+        result["pr_changes"] = counts
+    if is_modified and saved_count and counts and not (counts["new"] or counts["changed"]):
+        _log(owner, repo, f"No changes ({_format_counts(counts)})")
+        result["pr_status"] = "unchanged"
+        result["pr_count"] = saved_count
+    elif is_modified and saved_count:
+        detail = f", {_format_counts(counts)}" if counts else ""
+        _log(owner, repo, f"Saved {saved_count} PRs (updated via GraphQL{detail})")
+        result["pr_status"] = "updated"
+        result["pr_count"] = saved_count
+    elif not is_modified:
+        cache_info = db_cache.get_cache_info(owner, repo)
+        cached_count = cache_info["count"] if cache_info else 0
+        _log(owner, repo, f"No changes (cached: {cached_count} PRs)")
+        result["pr_status"] = "unchanged"
+        result["pr_count"] = cached_count
+    else:
+        _log(owner, repo, "No PR data returned")
+    return result
+
+
+def issue_stream_result(owner: str, repo: str, saved_count: int, counts: Optional[dict]) -> dict:
+    """保存件数からIssueのステータスを決めてログ出力"""
+    result = {"issue_status": "empty", "issue_count": 0}
+    if saved_count:
+        _log(owner, repo, f"Saved {saved_count} Issues (via GraphQL, {_format_counts(counts)})")
+        result["issue_status"] = "updated"
+        result["issue_count"] = saved_count
+    else:
+        _log(owner, repo, "No issue data returned")
+    return result
+
+
+def fetch_pr_stream(owner: str, repo: str, cutoff_dt: datetime, force: bool = False) -> dict:
+    """PRを取得して保存（GraphQL -> REST フォールバック対応）"""
+    result = {"pr_status": "empty", "pr_count": 0}
+    updated_since = resolve_updated_since(owner, repo, cutoff_dt, force)
+    
+    try:
+        if updated_since:
+            _log(owner, repo, f"Incremental sync since {updated_since.isoformat()}")
+        
+        # ページごとに保存し、全PRをメモリに溜めない。
+        # 保存と同じトランザクションで次ページのカーソルを記録し、中断時はそこから再開する
+        params = {"updated_since": updated_since.isoformat() if updated_since else None}
+        cursor = resume_cursor(owner, repo, "pr", params)
+        saved_count, latest, counts, complete = 0, None, None, True
+        pages = iter_pr_pages(owner, repo, cutoff_dt=cutoff_dt, updated_since=updated_since, cursor=cursor)
+        for page_prs, next_cursor in pages:
+            checkpoint = {"kind": "pr", "run_id": RUN_ID, "cursor": next_cursor, "params": params}
+            counts = add_counts(counts, db_cache.save_prs(owner, repo, page_prs, checkpoint=checkpoint))
+            saved_count += len(page_prs)
+            latest = latest_updated_at(page_prs, latest)
+            complete = next_cursor is None
+        
+        # 最高水位は全ページを保存し終えてから更新する（途中で落ちても取りこぼさない）。
+        # ページ上限で打ち切った場合は水位を据え置き、次回はチェックポイントのカーソルから続きを取得する
+        is_modified = bool(saved_count) if updated_since else True
+        result.update(pr_stream_result(owner, repo, saved_count, is_modified, counts))
+        finish_sync(owner, repo, [], cutoff_dt, updated_since, complete, latest=latest)
             
-            created_at = datetime.fromisoformat(issue["created_at"].replace("Z", "+00:00"))
-            if created_at < cutoff_dt:
-                continue
+    except Exception as e:
+        pr_error = str(e)
+        _log(owner, repo, f"GraphQL PR Error: {pr_error}")
+        
+        # GraphQL がレートリミットなら REST API にフォールバック
+        if "rate limit" in pr_error.lower():
+            _log(owner, repo, "Falling back to REST API for PRs...")
+            try:
+                pr_list = run_query_rest(owner, repo, cutoff_dt)
+                if pr_list:
+                    db_cache.save_prs(owner, repo, pr_list)
+                    _log(owner, repo, f"Saved {len(pr_list)} PRs (updated via REST API)")
+                    result["pr_status"] = "updated"
+                    result["pr_count"] = len(pr_list)
+                else:
+                    _log(owner, repo, "No PR data from REST API")
+            except Exception as rest_e:
+                _log(owner, repo, f"REST API PR Error: {str(rest_e)}")
+                result["pr_status"] = "error"
+                result["pr_error"] = str(rest_e)
+        else:
+            result["pr_status"] = "error"
+            result["pr_error"] = pr_error
+    
+    return result
+
+
+def fetch_issue_stream(owner: str, repo: str, cutoff_dt: datetime) -> dict:
+    """Issueを取得して保存（GraphQL -> REST フォールバック対応）"""
+    result = {"issue_status": "empty", "issue_count": 0}
+    
+    try:
+        params = {}
+        cursor = resume_cursor(owner, repo, "issue", params)
+        saved_count, counts = 0, None
+        for page_issues, next_cursor in iter_issue_pages(owner, repo, cutoff_dt=cutoff_dt, cursor=cursor):
+            checkpoint = {"kind": "issue", "run_id": RUN_ID, "cursor": next_cursor, "params": params}
+            counts = add_counts(counts, db_cache.save_issues(owner, repo, page_issues, checkpoint=checkpoint))
+            saved_count += len(page_issues)
+        
+        result.update(issue_stream_result(owner, repo, saved_count, counts))
             
-            mapped_issue = {
-                "number": issue["number"],
-                "title": issue["title"],
-                "state": issue["state"].upper(),
-                "author": issue["user"]["login"] if issue["user"] else None,
-                "createdAt": issue["created_at"],
-                "updatedAt": issue["updated_at"],
-                "closedAt": issue.get("closed_at"),
-                "labels": [label["name"] for label in issue.get("labels", [])],
-                "comments_count": issue.get("comments", 0),
-                "assignees": [assignee["login"] for assignee in issue.get("assignees", [])]
-            }
-            issue_list.append(mapped_issue)
+    except Exception as e:
+        issue_error = str(e)
+        _log(owner, repo, f"GraphQL Issue Error: {issue_error}")
         
-        page += 1
-        if len(data) < 100:
-            break
+        # GraphQL がレートリミットなら REST API にフォールバック
+        if "rate limit" in issue_error.lower():
+            _log(owner, repo, "Falling back to REST API for Issues...")
+            try:
+                issue_list = run_issue_query_rest(owner, repo, cutoff_dt)
+                if issue_list:
+                    db_cache.save_issues(owner, repo, issue_list)
+                    _log(owner, repo, f"Saved {len(issue_list)} Issues (via REST API)")
+                    result["issue_status"] = "updated"
+                    result["issue_count"] = len(issue_list)
+                else:
+                    _log(owner, repo, "No issue data from REST API")
+            except Exception as rest_e:
+                _log(owner, repo, f"REST API Issue Error: {str(rest_e)}")
+                result["issue_status"] = "error"
+                result["issue_error"] = str(rest_e)
+        else:
+            result["issue_status"] = "error"
+            result["issue_error"] = issue_error
     
-    return issue_list
+    return result
 
 
-def fetch_repository(owner: str, repo: str, days: int = 365, force: bool = False, fetch_issues: bool = True) -> dict:
-    """単一リポジトリのデータを取得（GraphQL -> REST フォールバック対応）"""
+def fetch_repository(owner: str, repo: str, days: int = 365, force: bool = False, fetch_issues: bool = True,
+                     parallel_streams: bool = False) -> dict:
+    """
+    単一リポジトリのデータを取得（GraphQL -> REST フォールバック対応）
+    parallel_streams=True の場合はPRとIssueを並列に取得する
+    """
     print(f"Fetching: {owner}/{repo}")
     
     cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
@@ -174,117 +463,380 @@ def fetch_repository(owner: str, repo: str, days: int = 365, force: bool = False
         "issue_count": 0
     }
     
-    # Fetch PRs
-    etag_info = db_cache.get_etag(owner, repo) if not force else None
+    if fetch_issues and parallel_streams:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pr_future = pool.submit(fetch_pr_stream, owner, repo, cutoff_dt, force)
+            issue_future = pool.submit(fetch_issue_stream, owner, repo, cutoff_dt)
+            result.update(pr_future.result())
+            result.update(issue_future.result())
+    else:
+        result.update(fetch_pr_stream(owner, repo, cutoff_dt, force))
+        if fetch_issues:
+            result.update(fetch_issue_stream(owner, repo, cutoff_dt))
     
-    pr_list = None
-    pr_error = None
+    return _finalize_status(result)
+
+
+def _finalize_status(result: dict) -> dict:
+    """PR/Issueの結果から全体のステータスを決める"""
+    if result["pr_status"] == "error" and result["issue_status"] == "error":
+        result["status"] = "error"
+    elif "updated" in [result["pr_status"], result["issue_status"]]:
+        result["status"] = "updated"
+    elif "unchanged" in [result["pr_status"], result["issue_status"]]:
+        result["status"] = "unchanged"
+    else:
+        result["status"] = "empty"
+    
+    return result
+
+
+async def fetch_pr_stream_async(client, owner: str, repo: str, cutoff_dt: datetime, force: bool = False) -> dict:
+    """
+    fetch_pr_stream の非同期版
+    同期版と同じくページごとに保存してチェックポイントを記録し、中断時はそこから再開する
+    """
+    result = {"pr_status": "empty", "pr_count": 0}
+    updated_since = resolve_updated_since(owner, repo, cutoff_dt, force)
     
     try:
-        etag = etag_info["etag"] if etag_info else None
-        last_modified = etag_info["last_modified"] if etag_info else None
-        
-        pr_list, new_etag, new_last_modified, is_modified = run_query(
-            owner, repo,
-            cutoff_dt=cutoff_dt,
-            etag=etag,
-            last_modified=last_modified
-        )
+        if updated_since:
+            _log(owner, repo, f"Incremental sync since {updated_since.isoformat()}")
         
-        # ETag情報を保存
-        if new_etag or new_last_modified:
-            db_cache.save_etag(owner, repo, new_etag, new_last_modified)
+        params = {"updated_since": updated_since.isoformat() if updated_since else None}
+        cursor = resume_cursor(owner, repo, "pr", params)
+        saved_count, latest, counts, complete = 0, None, None, True
+        pages = async_fetcher.iter_pr_pages(client, owner, repo, cutoff_dt=cutoff_dt,
+                                            updated_since=updated_since, cursor=cursor)
+        async for page_prs, next_cursor in pages:
+            checkpoint = {"kind": "pr", "run_id": RUN_ID, "cursor": next_cursor, "params": params}
+            counts = add_counts(counts, db_cache.save_prs(owner, repo, page_prs, checkpoint=checkpoint))
+            saved_count += len(page_prs)
+            latest = latest_updated_at(page_prs, latest)
+            complete = next_cursor is None
         
-        if is_modified and pr_list:
-            db_cache.save_prs(owner, repo, pr_list)
-            print(f"   Saved {len(pr_list)} PRs (updated via GraphQL)")
-            result["pr_status"] = "updated"
-            result["pr_count"] = len(pr_list)
-        elif not is_modified:
-            cached_data = db_cache.load_prs(owner, repo)
-            print(f"   No changes (cached: {len(cached_data)} PRs)")
-            result["pr_status"] = "unchanged"
-            result["pr_count"] = len(cached_data)
-        else:
-            print(f"   No PR data returned")
-            
+        is_modified = bool(saved_count) if updated_since else True
+        result.update(pr_stream_result(owner, repo, saved_count, is_modified, counts))
+        finish_sync(owner, repo, [], cutoff_dt, updated_since, complete, latest=latest)
+    
     except Exception as e:
         pr_error = str(e)
-        print(f"   GraphQL PR Error: {pr_error}")
+        _log(owner, repo, f"GraphQL PR Error: {pr_error}")
         
-        # GraphQL がレートリミットなら REST API にフォールバック
         if "rate limit" in pr_error.lower():
-            print("   Falling back to REST API for PRs...")
+            _log(owner, repo, "Falling back to REST API for PRs...")
             try:
-                pr_list = run_query_rest(owner, repo, cutoff_dt)
+                pr_list = await run_query_rest_async(client, owner, repo, cutoff_dt)
                 if pr_list:
                     db_cache.save_prs(owner, repo, pr_list)
-                    print(f"   Saved {len(pr_list)} PRs (updated via REST API)")
+                    _log(owner, repo, f"Saved {len(pr_list)} PRs (updated via REST API)")
                     result["pr_status"] = "updated"
                     result["pr_count"] = len(pr_list)
                 else:
-                    print("   No PR data from REST API")
+                    _log(owner, repo, "No PR data from REST API")
             except Exception as rest_e:
-                print(f"   REST API PR Error: {str(rest_e)}")
+                _log(owner, repo, f"REST API PR Error: {str(rest_e)}")
                 result["pr_status"] = "error"
                 result["pr_error"] = str(rest_e)
         else:
             result["pr_status"] = "error"
             result["pr_error"] = pr_error
     
-    # Fetch Issues
-    if fetch_issues:
-        issue_list = None
-        issue_error = None
+    return result
+
+
+async def fetch_issue_stream_async(client, owner: str, repo: str, cutoff_dt: datetime) -> dict:
+    """fetch_issue_stream の非同期版（ページごとに保存してチェックポイントを記録する）"""
+    result = {"issue_status": "empty", "issue_count": 0}
+    
+    try:
+        params = {}
+        cursor = resume_cursor(owner, repo, "issue", params)
+        saved_count, counts = 0, None
+        pages = async_fetcher.iter_issue_pages(client, owner, repo, cutoff_dt=cutoff_dt, cursor=cursor)
+        async for page_issues, next_cursor in pages:
+            checkpoint = {"kind": "issue", "run_id": RUN_ID, "cursor": next_cursor, "params": params}
+            counts = add_counts(counts, db_cache.save_issues(owner, repo, page_issues, checkpoint=checkpoint))
+            saved_count += len(page_issues)
         
-        try:
-            issue_list = run_issue_query(owner, repo, cutoff_dt=cutoff_dt)
-            
-            if issue_list:
-                db_cache.save_issues(owner, repo, issue_list)
-                print(f"   Saved {len(issue_list)} Issues (via GraphQL)")
-                result["issue_status"] = "updated"
-                result["issue_count"] = len(issue_list)
-            else:
-                print(f"   No issue data returned")
-                
-        except Exception as e:
-            issue_error = str(e)
-            print(f"   GraphQL Issue Error: {issue_error}")
-            
-            # GraphQL がレートリミットなら REST API にフォールバック
-            if "rate limit" in issue_error.lower():
-                print("   Falling back to REST API for Issues...")
-                try:
-                    issue_list = run_issue_query_rest(owner, repo, cutoff_dt)
-                    if issue_list:
-                        db_cache.save_issues(owner, repo, issue_list)
-                        print(f"   Saved {len(issue_list)} Issues (via REST API)")
-                        result["issue_status"] = "updated"
-                        result["issue_count"] = len(issue_list)
-                    else:
-                        print("   No issue data from REST API")
-                except Exception as rest_e:
-                    print(f"   REST API Issue Error: {str(rest_e)}")
-                    result["issue_status"] = "error"
-                    result["issue_error"] = str(rest_e)
-            else:
-                result["issue_status"] = "error"
-                result["issue_error"] = issue_error
+        result.update(issue_stream_result(owner, repo, saved_count, counts))
     
-    # Overall status
-    if result["pr_status"] == "error" and result["issue_status"] == "error":
-        result["status"] = "error"
-    elif "updated" in [result["pr_status"], result["issue_status"]]:
-        result["status"] = "updated"
-    elif "unchanged" in [result["pr_status"], result["issue_status"]]:
-        result["status"] = "unchanged"
-    else:
-        result["status"] = "empty"
+    except Exception as e:
+        issue_error = str(e)
+        _log(owner, repo, f"GraphQL Issue Error: {issue_error}")
+        
+        if "rate limit" in issue_error.lower():
+            _log(owner, repo, "Falling back to REST API for Issues...")
+            try:
+                issue_list = await run_issue_query_rest_async(client, owner, repo, cutoff_dt)
+                if issue_list:
+                    db_cache.save_issues(owner, repo, issue_list)
+                    _log(owner, repo, f"Saved {len(issue_list)} Issues (via REST API)")
+                    result["issue_status"] = "updated"
+                    result["issue_count"] = len(issue_list)
+                else:
+                    _log(owner, repo, "No issue data from REST API")
+            except Exception as rest_e:
+                _log(owner, repo, f"REST API Issue Error: {str(rest_e)}")
+                result["issue_status"] = "error"
+                result["issue_error"] = str(rest_e)
+        else:
+            result["issue_status"] = "error"
+            result["issue_error"] = issue_error
     
     return result
 
 
+async def fetch_repository_async(client, owner: str, repo: str, days: int = 365, force: bool = False) -> dict:
+    """fetch_repository の非同期版。PRとIssueは同じクライアントで並行に取得する"""
+    print(f"Fetching: {owner}/{repo}")
+    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
+    result = {"owner": owner, "repo": repo}
+    pr_result, issue_result = await asyncio.gather(
+        fetch_pr_stream_async(client, owner, repo, cutoff_dt, force),
+        fetch_issue_stream_async(client, owner, repo, cutoff_dt),
+    )
+    result.update(pr_result)
+    result.update(issue_result)
+    return _finalize_status(result)
+
+
+def fetch_repositories_async(repositories: list, days: int, force: bool = False, workers: int = 4) -> list:
+    """
+    asyncio クライアントで複数リポジトリを取得
+    同時リクエスト数は同期版と同じ REQUEST_BUDGET で workers に制限し、接続は全リポジトリで共有する。
+    """
+    configure_concurrency(workers)
+    
+    async def _run():
+        async with async_fetcher.AsyncGitHubClient(max_concurrency=workers) as client:
+            return await asyncio.gather(*(
+                fetch_repository_async(client, owner, repo, days, force)
+                for owner, repo in repositories
+            ))
+    
+    return list(asyncio.run(_run()))
+
+
+def fetch_open_prs(owner: str, repo: str) -> dict:
+    """
+    キャッシュ上で OPEN のPRだけを番号指定で再取得（--open-only）
+    レビュー状態・マージ可否・チェック・スレッドなどオープンPRの可変項目を短い間隔で更新する。
+    新規PRは含まれないため差分同期の最高水位は更新しない（新規PRは通常の同期で取得）。
+    """
+    print(f"Refreshing open PRs: {owner}/{repo}")
+    result = {"owner": owner, "repo": repo, "pr_status": "empty", "pr_count": 0,
+              "issue_status": "empty", "issue_count": 0}
+    
+    numbers = db_cache.get_open_pr_numbers(owner, repo)
+    if not numbers:
+        _log(owner, repo, "No open PRs in cache")
+        return _finalize_status(result)
+    
+    try:
+        pr_list = run_pr_numbers_query(owner, repo, numbers)
+        counts = db_cache.save_prs(owner, repo, pr_list)
+        # 解決できなかった番号（削除・移管されたPR）は次回以降問い合わせないよう削除する
+        # 1件も返らなかった場合は取得側の異常とみなして消さない
+        missing = set(numbers) - {pr["number"] for pr in pr_list}
+        if missing and not pr_list:
+            _log(owner, repo, f"None of {len(numbers)} open PRs resolved; keeping the cache")
+        elif missing:
+            db_cache.delete_prs(owner, repo, sorted(missing))
+            _log(owner, repo, f"Removed {len(missing)} PRs that no longer exist")
+        closed = sum(1 for pr in pr_list if pr.get("state") != "OPEN")
+        _log(owner, repo, f"Refreshed {len(pr_list)}/{len(numbers)} open PRs "
+                          f"({_format_counts(counts)}, {closed} closed or merged since)")
+        if counts["new"] or counts["changed"]:
+            result["pr_status"] = "updated"
+        else:
+            result["pr_status"] = "unchanged" if pr_list else "empty"
+        result["pr_count"] = len(pr_list)
+    except Exception as e:
+        _log(owner, repo, f"GraphQL PR Error: {e}")
+        result["pr_status"] = "error"
+        result["pr_error"] = str(e)
+    
+    # Issue は取得しないため、PRの失敗をそのまま全体のエラーにする
+    if result["pr_status"] == "error":
+        result["issue_status"] = "error"
+    return _finalize_status(result)
+
+
+def fetch_open_repositories(repositories: list, workers: int = 1) -> list:
+    """複数リポジトリのオープンPRを再取得（workers > 1 でリポジトリ単位に並列）"""
+    if workers <= 1:
+        return [fetch_open_prs(owner, repo) for owner, repo in repositories]
+    
+    configure_concurrency(workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch_open_prs, owner, repo) for owner, repo in repositories]
+        return [f.result() for f in futures]
+
+
+def save_batch_pages(pages, kind: str, params: dict, streams: dict) -> None:
+    """
+    iter_batch_pages の各ページをリポジトリごとに保存する
+    単体取得と同じく保存と同じトランザクションでリポジトリごとのチェックポイントを記録し、
+    保存件数・最新の updatedAt・走査を終えたかを streams[(owner, repo)] に集計する
+    """
+    save = db_cache.save_prs if kind == "pr" else db_cache.save_issues
+    for (owner, repo), items, next_cursor in pages:
+        stream = streams[(owner, repo)]
+        checkpoint = {"kind": kind, "run_id": RUN_ID, "cursor": next_cursor, "params": params[(owner, repo)]}
+        stream["counts"] = add_counts(stream["counts"], save(owner, repo, items, checkpoint=checkpoint))
+        stream["saved"] += len(items)
+        stream["latest"] = latest_updated_at(items, stream["latest"])
+        stream["complete"] = next_cursor is None
+
+
+def _resume_batch(repositories: list, kind: str, params: dict) -> dict:
+    """バッチ内の各リポジトリのチェックポイント（再開カーソル）"""
+    return {key: resume_cursor(key[0], key[1], kind, params[key]) for key in repositories}
+
+
+def fetch_repository_batch(repositories: list, days: int = 365, force: bool = False) -> list:
+    """
+    複数リポジトリをエイリアス付きのバッチクエリでまとめて取得
+    差分同期できるリポジトリと全期間取得のリポジトリは並び順が異なるため別バッチにする。
+    バッチが失敗した場合はリポジトリ単位の取得にフォールバックする。
+    """
+    print("Fetching batch: " + ", ".join(f"{o}/{r}" for o, r in repositories))
+    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
+    since_map = {key: resolve_updated_since(key[0], key[1], cutoff_dt, force) for key in repositories}
+    incremental = [key for key in repositories if since_map[key]]
+    full = [key for key in repositories if not since_map[key]]
+    
+    pr_params = {key: {"updated_since": since.isoformat() if since else None} for key, since in since_map.items()}
+    issue_params = {key: {} for key in repositories}
+    pr_streams = {key: {"saved": 0, "latest": None, "counts": None, "complete": True} for key in repositories}
+    issue_streams = {key: {"saved": 0, "latest": None, "counts": None, "complete": True} for key in repositories}
+    
+    try:
+        # 単体取得と同じくページごとに保存し、中断時はチェックポイントから再開する
+        if incremental:
+            pages = iter_batch_pages(incremental, "pr", cutoff_dt, updated_since=since_map,
+                                     cursors=_resume_batch(incremental, "pr", pr_params))
+            save_batch_pages(pages, "pr", pr_params, pr_streams)
+        if full:
+            pages = iter_batch_pages(full, "pr", cutoff_dt, cursors=_resume_batch(full, "pr", pr_params))
+            save_batch_pages(pages, "pr", pr_params, pr_streams)
+        pages = iter_batch_pages(repositories, "issue", cutoff_dt,
+                                 cursors=_resume_batch(repositories, "issue", issue_params))
+        save_batch_pages(pages, "issue", issue_params, issue_streams)
+    except Exception as e:
+        # 保存済みのページはチェックポイントから続きを取得する
+        print(f"   Batch query failed ({e}); falling back to per-repository fetch")
+        return [fetch_repository(owner, repo, days, force) for owner, repo in repositories]
+    
+    results = []
+    for owner, repo in repositories:
+        updated_since = since_map[(owner, repo)]
+        if updated_since:
+            _log(owner, repo, f"Incremental sync since {updated_since.isoformat()}")
+        pr_stream, issue_stream = pr_streams[(owner, repo)], issue_streams[(owner, repo)]
+        result = {"owner": owner, "repo": repo}
+        is_modified = bool(pr_stream["saved"]) if updated_since else True
+        result.update(pr_stream_result(owner, repo, pr_stream["saved"], is_modified, pr_stream["counts"]))
+        finish_sync(owner, repo, [], cutoff_dt, updated_since, pr_stream["complete"], latest=pr_stream["latest"])
+        result.update(issue_stream_result(owner, repo, issue_stream["saved"], issue_stream["counts"]))
+        results.append(_finalize_status(result))
+    return results
+
+
+def fetch_repositories(repositories: list, days: int, force: bool = False, workers: int = 1,
+                       batch_size: int = 1) -> list:
+    """
+    複数リポジトリを取得
+    workers > 1 の場合はリポジトリ単位とPR/Issue単位で並列取得する。
+    GraphQLリクエストは fetcher の共有セッションとリクエスト予算を経由するため、
+    同時実行数は workers で頭打ちになる。
+    batch_size > 1 の場合は batch_size 個ずつエイリアス付きの1クエリにまとめて取得する。
+    """
+    if batch_size > 1:
+        batches = [repositories[i:i + batch_size] for i in range(0, len(repositories), batch_size)]
+        if workers <= 1:
+            return [r for batch in batches for r in fetch_repository_batch(batch, days, force)]
+        configure_concurrency(workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fetch_repository_batch, batch, days, force) for batch in batches]
+            return [r for f in futures for r in f.result()]
+    
+    if workers <= 1:
+        results = []
+        for owner, repo in repositories:
+            results.append(fetch_repository(owner, repo, days, force))
+            print()
+        return results
+    
+    configure_concurrency(workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fetch_repository, owner, repo, days, force, True, True)
+            for owner, repo in repositories
+        ]
+        return [f.result() for f in futures]
+
+
+def estimate_run_cost(repositories: list, days: int, force: bool = False,
+                      fetch_issues: bool = True, max_pages: int = 50) -> dict:
+    """
+    取得に必要なGraphQLポイントを見積もる
+    差分同期できるリポジトリは1ページ、それ以外はキャッシュ件数からページ数を推定する
+    （キャッシュが無ければ max_pages を上限として見積もる）。
+    """
+    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
+    pr_cost, rate_limit = estimate_page_cost("pr")
+    issue_cost = estimate_page_cost("issue")[0] if fetch_issues else 0
+
+    def _pages(count, page_size):
+        if not count:
+            return max_pages
+        return min(max_pages, -(-count // page_size))
+
+    repos = []
+    for owner, repo in repositories:
+        if resolve_updated_since(owner, repo, cutoff_dt, force):
+            pr_pages = 1
+        else:
+            info = db_cache.get_cache_info(owner, repo)
+            pr_pages = _pages(info['count'] if info else 0, PR_PAGE_SIZE)
+        issue_pages = 0
+        if fetch_issues:
+            info = db_cache.get_issue_cache_info(owner, repo)
+            issue_pages = _pages(info['count'] if info else 0, ISSUE_PAGE_SIZE)
+        repos.append({
+            "owner": owner,
+            "repo": repo,
+            "pr_pages": pr_pages,
+            "issue_pages": issue_pages,
+            "cost": pr_pages * pr_cost + issue_pages * issue_cost,
+        })
+
+    return {
+        "repositories": repos,
+        "total": sum(r["cost"] for r in repos),
+        "pr_page_cost": pr_cost,
+        "issue_page_cost": issue_cost,
+        "remaining": rate_limit.get("remaining"),
+        "limit": rate_limit.get("limit"),
+        "reset_at": rate_limit.get("resetAt"),
+    }
+
+
+def print_cost_estimate(estimate: dict) -> None:
+    """見積もり結果を表示"""
+    print(f"Cost per page: PR={estimate['pr_page_cost']} Issue={estimate['issue_page_cost']}")
+    for r in estimate["repositories"]:
+        print(f"   {r['owner']}/{r['repo']}: ~{r['cost']} points "
+              f"({r['pr_pages']} PR pages, {r['issue_pages']} Issue pages)")
+    print(f"Estimated total: ~{estimate['total']} points")
+    if estimate["remaining"] is not None:
+        print(f"Remaining: {estimate['remaining']}/{estimate['limit']} (reset at {estimate['reset_at']})")
+        if estimate["total"] > estimate["remaining"]:
+            print("[WARN] Estimated cost exceeds remaining budget; requests will be paced until reset")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="GitHub PR データ取得スクリプト",
@@ -305,7 +857,7 @@ def main():
     parser.add_argument(
         '--force',
         action='store_true',
-        help='ETagを無視して強制取得'
+        help='差分同期を無視して全期間を強制取得'
     )
     parser.add_argument(
         '--days',
@@ -313,6 +865,39 @@ def main():
         default=365,
         help='取得対象期間（日）デフォルト: 365'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='並列取得数（リポジトリ/PR・Issue単位）デフォルト: 1（逐次）'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1,
+        help='1クエリにまとめるリポジトリ数（--all時）デフォルト: 1（まとめない）'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='asyncioクライアント（aiohttp）で取得。同時リクエスト数は --workers'
+    )
+    parser.add_argument(
+        '--open-only',
+        action='store_true',
+        help='キャッシュ上のオープンPRだけを再取得（数分おきの高速更新用）'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='取得せずに消費ポイントの見積もりだけを表示'
+    )
+    parser.add_argument(
+        '--estimate',
+        action='store_true',
+        help='取得前に消費ポイントを見積もり、残ポイントを超える場合はペース配分する（dryRunリクエストを消費）'
+    )
     
     args = parser.parse_args()
     
@@ -321,7 +906,7 @@ def main():
     print(f"Start: {start_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
     print(f"Target period: {args.days} days")
     if args.force:
-        print(f"Force mode: ETag ignored")
+        print(f"Force mode: incremental sync disabled")
     print()
     
     results = []
@@ -332,29 +917,60 @@ def main():
             repositories = [(r['owner'], r['repo']) for r in config.REPOSITORIES]
         else:
             repositories = [(config.DEFAULT_OWNER, config.DEFAULT_REPO)]
-        
+    elif args.repository:
+        # コマンドライン引数で指定
+        repositories = [parse_repo_arg(args.repository)]
+    else:
+        # デフォルトリポジトリ
+        repositories = [(config.DEFAULT_OWNER, config.DEFAULT_REPO)]
+    
+    # --estimate / --dry-run 指定時だけ消費ポイントを見積もり、残ポイントを超える場合はペース配分する
+    # （見積もり自体が dryRun リクエストを使うため既定では行わない。--open-only は件数が少ないため見積もらない）
+    estimate = None
+    try:
+        if (args.estimate or args.dry_run) and not args.open_only:
+            estimate = estimate_run_cost(repositories, args.days, args.force)
+    except Exception as e:
+        if args.dry_run:
+            print(f"[ERROR] Cost estimation failed: {e}")
+            sys.exit(1)
+        print(f"[WARN] Cost estimation failed: {e}")
+        estimate = None
+    if estimate:
+        print_cost_estimate(estimate)
+        print()
+        if not args.dry_run:
+            SCHEDULER.plan(estimate["total"])
+    # --dry-run は見積もりだけで終了し、取得・DB書き込みは一切しない
+    if args.dry_run:
+        if args.open_only:
+            print("Nothing to estimate for --open-only (open PRs are refreshed by number)")
+        elif not estimate:
+            print("No cost estimate available")
+        return
+    
+    if args.open_only:
+        results = fetch_open_repositories(repositories, args.workers)
+    
+    elif args.all:
         print(f"Fetching {len(repositories)} repositories from config")
+        if args.workers > 1:
+            print(f"Workers: {args.workers}")
+        if args.batch_size > 1:
+            print(f"Batch size: {args.batch_size}")
         print()
         
-        for owner, repo in repositories:
-            result = fetch_repository(owner, repo, args.days, args.force)
-            results.append(result)
-            print()
+        if args.use_async:
+            results = fetch_repositories_async(repositories, args.days, args.force, max(args.workers, 1))
+        else:
+            results = fetch_repositories(repositories, args.days, args.force, args.workers, args.batch_size)
     
-    elif args.repository:
-        # コマンドライン引数で指定
-        owner, repo = parse_repo_arg(args.repository)
-        result = fetch_repository(owner, repo, args.days, args.force)
-        results.append(result)
+    elif args.use_async:
+        results = fetch_repositories_async(repositories, args.days, args.force, max(args.workers, 1))
     
     else:
-        # デフォルトリポジトリ
-        result = fetch_repository(
-            config.DEFAULT_OWNER,
-            config.DEFAULT_REPO,
-            args.days,
-            args.force
-        )
+        owner, repo = repositories[0]
+        result = fetch_repository(owner, repo, args.days, args.force)
         results.append(result)
     
     # サマリ表示
@@ -371,6 +987,15 @@ def main():
     print(f"End: {end_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
     print()
     
+    # 分析ページ用の列指向スナップショットを更新（内容が変わっていなければ作り直さない）
+    for result in results:
+        if result['status'] in ['updated', 'unchanged']:
+            try:
+                if snapshot.refresh_snapshot(result['owner'], result['repo']):
+                    print(f"Snapshot written: {snapshot.snapshot_path(result['owner'], result['repo'])}")
+            except Exception as e:
+                print(f"[WARN] Snapshot failed for {result['owner']}/{result['repo']}: {e}")
+    
     # キャッシュ統計
     for result in results:
         if result['status'] in ['updated', 'unchanged']:
@@ -1,9 +1,10 @@
 # fetcher.py
-import os, requests, datetime as dt, time
+import os, requests, datetime as dt, time, threading
+from contextlib import contextmanager
 from dateutil import parser as dp
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Iterator
 import config
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -28,74 +29,440 @@ else:
 
 print(f"[DEBUG] fetcher endpoint decision: config='{_raw_cfg}' env='{_raw_env}' final='{API_URL_DEFAULT}'")
 
-def _session():
+# 1ホストあたりの最大コネクション数（並列取得時に共有セッションで使い回す）
+POOL_MAXSIZE = 32
+
+_shared_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """プロセス内で共有するコネクションプール付きセッションを返す"""
+    global _shared_session
     if not GITHUB_TOKEN:
         raise RuntimeError("GITHUB_TOKEN が未設定です。環境変数で設定してください。")
-    s = requests.Session()
-    retry = Retry(
-        total=5,
-        backoff_factor=1.2,
-        status_forcelist=[502, 503, 504, 520, 522],
-        allowed_methods={"POST"},
-        raise_on_status=False,
-    )
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.headers.update({
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json",
-    })
-    return s
+    with _session_lock:
+        if _shared_session is None:
+            s = requests.Session()
+            retry = Retry(
+                total=5,
+                backoff_factor=1.2,
+                status_forcelist=[502, 503, 504, 520, 522],
+                allowed_methods={"GET", "POST"},
+                raise_on_status=False,
+            )
+            s.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=POOL_MAXSIZE))
+            s.headers.update({
+                "Authorization": f"Bearer {GITHUB_TOKEN}",
+                "Accept": "application/vnd.github+json",
+            })
+            _shared_session = s
+        return _shared_session
+
+
+class RequestBudget:
+    """
+    全スレッド共通のAPIリクエスト予算
+    同時実行数と最小リクエスト間隔を制限し、セカンダリレートリミットを避ける。
+    レートリミット応答を受けたスレッドは pause() で全スレッドを一時停止させる。
+    """
+
+    def __init__(self, max_in_flight: int = 1, min_interval: float = 0.0):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self.max_in_flight = self.limit = 1
+        self.min_interval = 0.0
+        self.configure(max_in_flight, min_interval)
+
+    def configure(self, max_in_flight: int, min_interval: Optional[float] = None) -> None:
+        """
+        同時実行数の上限を設定する
+        throttle で絞っている場合（SCHEDULER.plan のペース配分など）は、その同時実行数と最小間隔を保つ
+        """
+        with self._cond:
+            throttled = self.limit < self.max_in_flight
+            self.max_in_flight = max(1, int(max_in_flight))
+            self.limit = min(self.limit, self.max_in_flight) if throttled else self.max_in_flight
+            if min_interval is not None:
+                self.min_interval = max(0.0, float(min_interval))
+            self._cond.notify_all()
+
+    def throttle(self, limit: Optional[int] = None, min_interval: Optional[float] = None) -> None:
+        """実行中に同時実行数（max_in_flight以下）と最小間隔を調整する"""
+        with self._cond:
+            if limit is not None:
+                self.limit = max(1, min(int(limit), self.max_in_flight))
+            if min_interval is not None:
+                self.min_interval = max(0.0, float(min_interval))
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def paused_for(self) -> float:
+        """一時停止の残り秒数（停止中でなければ 0）"""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def _acquire_locked(self) -> float:
+        """枠を1つ確保し、最小間隔・一時停止を考慮した開始までの待ち秒数を返す（_cond 保持中に呼ぶ）"""
+        self._in_flight += 1
+        now = time.monotonic()
+        start_at = max(now, self._next_start, self._paused_until)
+        self._next_start = start_at + self.min_interval
+        return start_at - now
+    
+    def try_acquire(self) -> Optional[float]:
+        """
+        slot のブロックしない版（asyncio クライアント用）
+        枠を確保できれば開始までの待ち秒数を返し、同時実行数が上限なら None。確保した枠は release で返す
+        """
+        with self._cond:
+            if self._in_flight >= self.limit:
+                return None
+            return self._acquire_locked()
+    
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            delay = self._acquire_locked()
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            self.release()
+
+
+REQUEST_BUDGET = RequestBudget()
+
+
+def configure_concurrency(max_in_flight: int, min_interval: Optional[float] = None) -> None:
+    """並列取得時の同時リクエスト数と最小間隔を設定（min_interval=None なら現在の間隔を保つ）"""
+    REQUEST_BUDGET.configure(max_in_flight, min_interval)
+
+
+class RateLimitScheduler:
+    """
+    GraphQLのポイント予算に基づくスケジューラ
+
+    各レスポンスの rateLimit { cost remaining resetAt } を記録し、
+    - 残ポイントが予備分を下回りそうなら resetAt まで全スレッドを待機させる
+    - plan() で登録した実行計画が残ポイントを超える場合はリクエスト間隔を広げて
+      resetAt までに予算を使い切らないようペース配分する
+    - 残ポイントが少ないときはページサイズと同時実行数を絞る
+    """
+
+    # 安全のため常に残しておくポイント
+    RESERVE_POINTS = 50
+    # 残ポイントがこの割合を下回ったら逐次実行に落とす
+    LOW_BUDGET_RATIO = 0.1
+    # resetAt 待ちの上限（秒）
+    MAX_WAIT_SECONDS = 3700
+
+    def __init__(self, budget: RequestBudget):
+        self._budget = budget
+        self._lock = threading.Lock()
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.costs: dict = {}
+        self.spent = 0
+        self.planned_cost = 0
+
+    def observe(self, rate_limit: Optional[dict], kind: str, dry_run: bool = False) -> None:
+        """レスポンスの rateLimit を記録（dryRun はコストを消費しない）"""
+        if not rate_limit:
+            return
+        with self._lock:
+            cost = rate_limit.get("cost") or 0
+            self.costs[kind] = cost
+            if not dry_run:
+                self.spent += cost
+            self.limit = rate_limit.get("limit", self.limit)
+            self.remaining = rate_limit.get("remaining", self.remaining)
+            if rate_limit.get("resetAt"):
+                self.reset_at = dp.parse(rate_limit["resetAt"]).timestamp()
+        self._adjust()
+
+    def plan(self, total_cost: int) -> None:
+        """これから実行する処理の見積もりポイントを登録"""
+        with self._lock:
+            self.planned_cost = total_cost
+            self.spent = 0
+        self._adjust()
+
+    def _seconds_to_reset(self) -> float:
+        if not self.reset_at:
+            return 0.0
+        return max(0.0, self.reset_at - time.time())
+
+    def _adjust(self) -> None:
+        with self._lock:
+            if self.remaining is None:
+                return
+            low = self.limit and self.remaining < self.limit * self.LOW_BUDGET_RATIO
+            interval = 0.0
+            left = self.planned_cost - self.spent
+            avg_cost = max(1, sum(self.costs.values()) / len(self.costs)) if self.costs else 1
+            if left > self.remaining and self.remaining > self.RESERVE_POINTS:
+                # 残ポイントで実行できるリクエスト数を resetAt まで均等に配分
+                requests_left = max(1.0, (self.remaining - self.RESERVE_POINTS) / avg_cost)
+                interval = self._seconds_to_reset() / requests_left
+        self._budget.throttle(limit=1 if low else self._budget.max_in_flight, min_interval=interval)
+
+    def before_request(self, kind: str) -> None:
+        """リクエスト前に呼ぶ。予算不足なら resetAt まで全スレッドを待機させる"""
+        with self._lock:
+            if self.remaining is None:
+                return
+            expected = self.costs.get(kind, 1)
+            if self.remaining - expected >= self.RESERVE_POINTS:
+                return
+            wait = min(self._seconds_to_reset() + 1, self.MAX_WAIT_SECONDS)
+            # 待機後は予算が回復している前提でリセット
+            self.remaining = None
+        print(f"[INFO] GraphQL rate limit budget low; waiting {wait:.0f}s for reset")
+        self._budget.pause(wait)
+
+    def page_size(self, default: int, kind: str) -> int:
+        """残ポイントに収まるようページサイズを縮める"""
+        with self._lock:
+            cost = self.costs.get(kind)
+            if self.remaining is None or not cost:
+                return default
+            affordable = self.remaining - self.RESERVE_POINTS
+            if affordable >= cost:
+                return default
+            return max(1, int(default * max(affordable, 1) / cost))
+
+
+SCHEDULER = RateLimitScheduler(REQUEST_BUDGET)
+
+PR_PAGE_SIZE = 30
+ISSUE_PAGE_SIZE = 30
+
+# PR_QUERY のネストしたコネクションは小さめに取得し、
+# hasNextPage が立ったPRだけ追加クエリ（PR_CONNECTION_QUERIES）で残りを取得する
+_THREAD_FRAGMENT = """
+fragment ThreadFields on PullRequestReviewThread {
+  id
+  isResolved
+  isOutdated
+  resolvedBy { login }
+  comments(first:20) {
+    totalCount
+    pageInfo { hasNextPage endCursor }
+    nodes { author { login } body createdAt isMinimized }
+  }
+}
+"""
+
+_NODE_CONNECTION_QUERY = """
+query($id:ID!, $cursor:String) {
+  rateLimit { cost limit remaining resetAt }
+  node(id:$id) {
+    ... on %(type)s {
+      %(field)s(first:100, after:$cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { %(nodes)s }
+      }
+    }
+  }
+}
+"""
+
+# PRノード上のコネクション名 -> 追加取得クエリ
+PR_CONNECTION_QUERIES = {
+    "files": _NODE_CONNECTION_QUERY % {
+        "type": "PullRequest", "field": "files", "nodes": "path additions deletions"},
+    "labels": _NODE_CONNECTION_QUERY % {
+        "type": "PullRequest", "field": "labels", "nodes": "name"},
+    "reviews": _NODE_CONNECTION_QUERY % {
+        "type": "PullRequest", "field": "reviews", "nodes": "state author { login } createdAt"},
+    "reviewThreads": _NODE_CONNECTION_QUERY % {
+        "type": "PullRequest", "field": "reviewThreads", "nodes": "...ThreadFields"} + _THREAD_FRAGMENT,
+}
+
+THREAD_COMMENTS_QUERY = _NODE_CONNECTION_QUERY % {
+    "type": "PullRequestReviewThread", "field": "comments",
+    "nodes": "author { login } body createdAt isMinimized"}
+
+
+class AdaptivePager:
+    """
+    PR一覧のページサイズを応答状況に合わせて調整する
+    タイムアウト・502/504・ノード上限エラーでは半分に縮めて同じカーソルを再試行し、
+    応答が速いページが続けば少しずつ大きくする。
+    """
+
+    MIN_SIZE = 5
+    MAX_SIZE = 50
+    # この秒数より速ければページサイズを増やす
+    FAST_SECONDS = 3.0
+    # この秒数より遅ければページサイズを減らす
+    SLOW_SECONDS = 10.0
+    GROW_FACTOR = 1.5
+
+    _RETRYABLE_MESSAGES = ("timeout", "timed out", "node limit", "something went wrong", "resource limits",
+                           "http error: 502", "http error: 504")
+
+    def __init__(self, size: int = PR_PAGE_SIZE):
+        self.size = max(self.MIN_SIZE, min(self.MAX_SIZE, size))
+
+    def observe(self, elapsed: float) -> None:
+        """
+        成功したページの所要時間を記録
+        elapsed は HTTP の往復時間（response.elapsed）。リクエスト間隔の調整やレートリミットの待機は含めない
+        """
+        if elapsed < self.FAST_SECONDS:
+            self.size = min(self.MAX_SIZE, int(self.size * self.GROW_FACTOR) or self.MIN_SIZE)
+        elif elapsed > self.SLOW_SECONDS:
+            self.size = max(self.MIN_SIZE, self.size // 2)
+
+    def shrink(self, error: Exception) -> bool:
+        """
+        失敗を記録。縮小して再試行できる場合は True、
+        再試行すべきでないエラー、または最小サイズに達している場合は False
+        """
+        if not self._is_retryable(error) or self.size <= self.MIN_SIZE:
+            return False
+        self.size = max(self.MIN_SIZE, self.size // 2)
+        print(f"[INFO] Page too heavy ({error}); retrying with page size {self.size}")
+        return True
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (requests.Timeout, requests.exceptions.RetryError, TimeoutError)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code in (502, 504)
+        message = str(error).lower()
+        return isinstance(error, RuntimeError) and any(m in message for m in self._RETRYABLE_MESSAGES)
+
+PR_FIELDS_FRAGMENT = """
+fragment PrFields on PullRequest {
+  id number title url state isDraft
+  createdAt closedAt mergedAt updatedAt
+  author { login }
+  baseRefName headRefName
+  additions deletions changedFiles
+  labels(first:20){ pageInfo { hasNextPage endCursor } nodes { name } }
+  comments { totalCount }
+  reviewThreads(first:30) {
+    totalCount
+    pageInfo { hasNextPage endCursor }
+    nodes { ...ThreadFields }
+  }
+  reviewRequests(first:10){ nodes { requestedReviewer { __typename ... on User { login } ... on Team { name } } } }
+  reviews(first:30){ pageInfo { hasNextPage endCursor } nodes { state author { login } createdAt } }
+  reviewDecision
+  mergeable
+  mergeStateStatus
+  commits(last:1){
+    nodes{
+      commit{
+        statusCheckRollup{ state }
+        committedDate
+      }
+    }
+  }
+  files(first:50){ pageInfo { hasNextPage endCursor } nodes { path additions deletions } }
+  projectItems(first:10){ nodes { project { title } } }
+}
+""" + _THREAD_FRAGMENT
 
 PR_QUERY = """
-query($owner:String!, $name:String!, $cursor:String) {
+query($owner:String!, $name:String!, $cursor:String, $orderField:IssueOrderField = CREATED_AT,
+      $pageSize:Int = 30, $dryRun:Boolean = false) {
+  rateLimit(dryRun: $dryRun) { cost limit remaining resetAt }
   repository(owner:$owner, name:$name) {
     pullRequests(
-      first: 30,
+      first: $pageSize,
       after: $cursor,
-      orderBy: {field: CREATED_AT, direction: DESC},
+      orderBy: {field: $orderField, direction: DESC},
       states: [OPEN, CLOSED, MERGED]
     ) {
       pageInfo { hasNextPage endCursor }
-      nodes {
-        number title url state isDraft
-        createdAt closedAt mergedAt
-        author { login }
-        baseRefName headRefName
-        additions deletions changedFiles
-        labels(first:50){ nodes { name } }
-        comments { totalCount }
-        reviewThreads(first:100) {
-          totalCount
-          nodes {
-            isResolved
-            isOutdated
-            resolvedBy { login }
-            comments(first:50) {
-              totalCount
-              nodes {
-                author { login }
-                body
-                createdAt
-                isMinimized
-              }
-            }
+      nodes { ...PrFields }
+    }
+  }
+}
+""" + PR_FIELDS_FRAGMENT
+
+ISSUE_FIELDS_FRAGMENT = """
+fragment IssueFields on Issue {
+  number title url state
+  createdAt closedAt updatedAt
+  author { login }
+  assignees(first:10) { nodes { login } }
+  labels(first:50) { nodes { name } }
+  comments { totalCount }
+  milestone { title dueOn state }
+  projectItems(first:10) { 
+    nodes { 
+      project { title }
+      fieldValues(first:10) {
+        nodes {
+          ... on ProjectV2ItemFieldSingleSelectValue {
+            name
+            field { ... on ProjectV2SingleSelectField { name } }
+          }
+          ... on ProjectV2ItemFieldTextValue {
+            text
+            field { ... on ProjectV2Field { name } }
           }
         }
-        reviewRequests(first:10){ nodes { requestedReviewer { __typename ... on User { login } ... on Team { name } } } }
-        reviews(first:50){ nodes { state author { login } createdAt } }
-        reviewDecision
-        mergeable
-        mergeStateStatus
-        commits(last:1){
-          nodes{
-            commit{
-              statusCheckRollup{ state }
-              committedDate
-            }
+      }
+    } 
+  }
+  timelineItems(first:100, itemTypes: [CONNECTED_EVENT, DISCONNECTED_EVENT, CROSS_REFERENCED_EVENT]) {
+    nodes {
+      __typename
+      ... on ConnectedEvent {
+        createdAt
+        subject {
+          ... on PullRequest {
+            number
+            title
+            state
+            url
+            mergedAt
+          }
+        }
+      }
+      ... on DisconnectedEvent {
+        createdAt
+        subject {
+          ... on PullRequest {
+            number
+            title
+            state
+            url
+          }
+        }
+      }
+      ... on CrossReferencedEvent {
+        createdAt
+        source {
+          ... on PullRequest {
+            number
+            title
+            state
+            url
+            mergedAt
           }
         }
-        files(first:100){ nodes { path additions deletions } }
-        projectItems(first:10){ nodes { project { title } } }
       }
     }
   }
@@ -103,157 +470,309 @@ query($owner:String!, $name:String!, $cursor:String) {
 """
 
 ISSUE_QUERY = """
-query($owner:String!, $name:String!, $cursor:String) {
+query($owner:String!, $name:String!, $cursor:String, $pageSize:Int = 30, $dryRun:Boolean = false) {
+  rateLimit(dryRun: $dryRun) { cost limit remaining resetAt }
   repository(owner:$owner, name:$name) {
     issues(
-      first: 30,
+      first: $pageSize,
       after: $cursor,
       orderBy: {field: CREATED_AT, direction: DESC},
       states: [OPEN, CLOSED]
     ) {
       pageInfo { hasNextPage endCursor }
-      nodes {
-        number title url state
-        createdAt closedAt updatedAt
-        author { login }
-        assignees(first:10) { nodes { login } }
-        labels(first:50) { nodes { name } }
-        comments { totalCount }
-        milestone { title dueOn state }
-        projectItems(first:10) { 
-          nodes { 
-            project { title }
-            fieldValues(first:10) {
-              nodes {
-                ... on ProjectV2ItemFieldSingleSelectValue {
-                  name
-                  field { ... on ProjectV2SingleSelectField { name } }
-                }
-                ... on ProjectV2ItemFieldTextValue {
-                  text
-                  field { ... on ProjectV2Field { name } }
-                }
-              }
-            }
-          } 
-        }
-        timelineItems(first:100, itemTypes: [CONNECTED_EVENT, DISCONNECTED_EVENT, CROSS_REFERENCED_EVENT]) {
-          nodes {
-            __typename
-            ... on ConnectedEvent {
-              createdAt
-              subject {
-                ... on PullRequest {
-                  number
-                  title
-                  state
-                  url
-                  mergedAt
-                }
-              }
-            }
-            ... on DisconnectedEvent {
-              createdAt
-              subject {
-                ... on PullRequest {
-                  number
-                  title
-                  state
-                  url
-                }
-              }
-            }
-            ... on CrossReferencedEvent {
-              createdAt
-              source {
-                ... on PullRequest {
-                  number
-                  title
-                  state
-                  url
-                  mergedAt
-                }
-              }
-            }
-          }
-        }
-      }
+      nodes { ...IssueFields }
     }
   }
 }
-"""
+""" + ISSUE_FIELDS_FRAGMENT
+
+# 複数リポジトリを1リクエストにまとめるバッチクエリの接続定義
+_BATCH_CONNECTIONS = {
+    "pr": ("pullRequests", "orderBy: {field: $orderField, direction: DESC}, states: [OPEN, CLOSED, MERGED]",
+           "PrFields", PR_FIELDS_FRAGMENT),
+    "issue": ("issues", "orderBy: {field: CREATED_AT, direction: DESC}, states: [OPEN, CLOSED]",
+              "IssueFields", ISSUE_FIELDS_FRAGMENT),
+}
+
+
+def build_pr_numbers_query(count: int) -> str:
+    """
+    1リポジトリ内の count 件のPRを番号指定で取得するクエリ
+    エイリアス p0, p1, ... に対して変数 $num0, $num1, ... を渡す
+    """
+    var_defs = ["$owner:String!", "$name:String!"] + [f"$num{i}:Int!" for i in range(count)]
+    aliases = "\n".join(f"    p{i}: pullRequest(number:$num{i}) {{ ...PrFields }}" for i in range(count))
+    return (
+        "query(" + ", ".join(var_defs) + ") {\n"
+        "  rateLimit { cost limit remaining resetAt }\n"
+        "  repository(owner:$owner, name:$name) {\n"
+        + aliases + "\n  }\n}\n" + PR_FIELDS_FRAGMENT
+    )
+
+
+def build_batch_query(kind: str, count: int) -> str:
+    """
+    count 個のリポジトリをエイリアス r0, r1, ... で1つのドキュメントにまとめる
+    変数は $o{i}（owner）, $n{i}（name）, $c{i}（cursor）と共通の $pageSize
+    """
+    connection, args, fragment_name, fragment = _BATCH_CONNECTIONS[kind]
+    var_defs = ["$pageSize:Int = 30"]
+    if kind == "pr":
+        var_defs.append("$orderField:IssueOrderField = CREATED_AT")
+    aliases = []
+    for i in range(count):
+        var_defs.append(f"$o{i}:String!, $n{i}:String!, $c{i}:String")
+        aliases.append(
+            f"  r{i}: repository(owner:$o{i}, name:$n{i}) {{\n"
+            f"    {connection}(first: $pageSize, after: $c{i}, {args}) {{\n"
+            f"      pageInfo {{ hasNextPage endCursor }}\n"
+            f"      nodes {{ ...{fragment_name} }}\n"
+            f"    }}\n"
+            f"  }}"
+        )
+    return (
+        "query(" + ", ".join(var_defs) + ") {\n"
+        "  rateLimit { cost limit remaining resetAt }\n"
+        + "\n".join(aliases) + "\n}\n" + fragment
+    )
+
+def _rate_limit_wait(r) -> Optional[float]:
+    """レートリミット応答なら待機秒数を返す"""
+    return rate_limit_wait(r.status_code, r.headers)
+
+
+def rate_limit_wait(status_code: int, headers) -> Optional[float]:
+    """ステータスとヘッダーからレートリミットの待機秒数を求める（非レートリミットなら None）"""
+    if status_code not in (403, 429):
+        return None
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        return float(retry_after)
+    reset = headers.get("X-RateLimit-Reset")
+    remaining = headers.get("X-RateLimit-Remaining")
+    if remaining == "0" and reset:
+        return max(0, int(reset) - int(time.time())) + 1
+    return None
+
 
 def _post_with_rate_limit(sess, payload, timeout=30):
-    r = sess.post(API_URL_DEFAULT, json=payload, timeout=timeout)
-    if r.status_code == 403:
-        reset = r.headers.get("X-RateLimit-Reset")
-        remaining = r.headers.get("X-RateLimit-Remaining")
-        if remaining == "0" and reset:
-            wait = max(0, int(reset) - int(time.time())) + 1
-            time.sleep(min(wait, 30))
+    with REQUEST_BUDGET.slot():
+        r = sess.post(API_URL_DEFAULT, json=payload, timeout=timeout)
+    wait = _rate_limit_wait(r)
+    if wait is not None:
+        REQUEST_BUDGET.pause(min(wait, RateLimitScheduler.MAX_WAIT_SECONDS))
+        with REQUEST_BUDGET.slot():
             r = sess.post(API_URL_DEFAULT, json=payload, timeout=timeout)
     r.raise_for_status()
     return r
 
-def run_query(
+
+def _missing_aliases(data: dict, parent: str) -> Optional[set]:
+    """
+    エラーがすべて parent 配下のエイリアスの NOT_FOUND なら、そのエイリアス名の集合を返す
+    parent 自体が解決できない（改名・移管・権限なし）などそれ以外のエラーを含む場合は None
+    """
+    if not (data.get("data") or {}).get(parent):
+        return None
+    aliases = set()
+    for err in data["errors"]:
+        path = err.get("path") or []
+        if err.get("type") != "NOT_FOUND" or len(path) != 2 or path[0] != parent:
+            return None
+        aliases.add(path[1])
+    return aliases
+
+
+def _execute(sess, query: str, variables: dict, kind: str, timeout: int = 30,
+             missing_ok_under: Optional[str] = None):
+    """
+    GraphQLを実行し、rateLimit をスケジューラに記録して (response, data) を返す
+    missing_ok_under: このフィールド直下のエイリアスの NOT_FOUND だけは例外にせず、data の該当エイリアスを null のまま返す
+    """
+    SCHEDULER.before_request(kind)
+    r = _post_with_rate_limit(sess, {"query": query, "variables": variables}, timeout=timeout)
+    data = r.json()
+    if "errors" in data and not (missing_ok_under and _missing_aliases(data, missing_ok_under)):
+        msgs = []
+        for err in data["errors"]:
+            path = ".".join(str(p) for p in err.get("path", [])) if err.get("path") else ""
+            msgs.append(f"{err.get('message')}({path})")
+        raise RuntimeError("GraphQL errors: " + " | ".join(msgs))
+    SCHEDULER.observe((data.get("data") or {}).get("rateLimit"), kind, dry_run=bool(variables.get("dryRun")))
+    return r, data
+
+
+def estimate_page_cost(kind: str = "pr", owner: str = None, repo: str = None) -> Tuple[int, Optional[dict]]:
+    """
+    dryRun で1ページ分のポイントを見積もる（クエリは評価されない）
+    ポイントはクエリ形状とページサイズで決まるためリポジトリに依存しない。
+    Returns: (1ページのコスト, rateLimit情報)
+    """
+    query, page_size = (PR_QUERY, PR_PAGE_SIZE) if kind == "pr" else (ISSUE_QUERY, ISSUE_PAGE_SIZE)
+    variables = {
+        "owner": owner or config.DEFAULT_OWNER,
+        "name": repo or config.DEFAULT_REPO,
+        "cursor": None,
+        "pageSize": page_size,
+        "dryRun": True,
+    }
+    _, data = _execute(get_session(), query, variables, kind)
+    rate_limit = (data.get("data") or {}).get("rateLimit") or {}
+    return rate_limit.get("cost", 1), rate_limit
+
+
+def _fetch_remaining_nodes(sess, query: str, node_id: str, cursor: Optional[str]) -> List[dict]:
+    """node(id:) のコネクションを cursor 以降すべて取得"""
+    nodes = []
+    while True:
+        _, data = _execute(sess, query, {"id": node_id, "cursor": cursor}, "pr_detail")
+        node = (data.get("data") or {}).get("node") or {}
+        conn = next(iter(node.values()), None) if node else None
+        if not conn:
+            break
+        nodes.extend(conn.get("nodes") or [])
+        if not conn["pageInfo"]["hasNextPage"]:
+            break
+        cursor = conn["pageInfo"]["endCursor"]
+    return nodes
+
+
+def complete_pr_node(sess, n: dict) -> dict:
+    """
+    ネストしたコネクションで hasNextPage が立っている箇所だけ追加取得し、
+    生ノードに残りを追記する（normalize_pr の前に呼ぶ）
+    """
+    for field, query in PR_CONNECTION_QUERIES.items():
+        conn = n.get(field) or {}
+        page_info = conn.get("pageInfo") or {}
+        if page_info.get("hasNextPage") and n.get("id"):
+            conn["nodes"] = (conn.get("nodes") or []) + _fetch_remaining_nodes(
+                sess, query, n["id"], page_info.get("endCursor"))
+            conn["pageInfo"] = {"hasNextPage": False, "endCursor": None}
+    for thread in (n.get("reviewThreads") or {}).get("nodes") or []:
+        comments = thread.get("comments") or {}
+        page_info = comments.get("pageInfo") or {}
+        if page_info.get("hasNextPage") and thread.get("id"):
+            comments["nodes"] = (comments.get("nodes") or []) + _fetch_remaining_nodes(
+                sess, THREAD_COMMENTS_QUERY, thread["id"], page_info.get("endCursor"))
+            comments["pageInfo"] = {"hasNextPage": False, "endCursor": None}
+    return n
+
+
+def _collect_pr_nodes(sess, nodes: List[dict], cutoff_dt: Optional[dt.datetime],
+                      updated_since: Optional[dt.datetime]) -> Tuple[List[dict], bool]:
+    """1ページ分のPRノードを正規化する。Returns: (PRリスト, 走査を打ち切るか)"""
+    page_prs = []
+    for n in nodes:
+        if updated_since:
+            updated = dp.parse(n["updatedAt"])
+            if updated < updated_since:
+                return page_prs, True
+        if cutoff_dt:
+            created = dp.parse(n["createdAt"])
+            if created < cutoff_dt:
+                if updated_since:
+                    continue
+                return page_prs, True
+        page_prs.append(normalize_pr(complete_pr_node(sess, n)))
+    return page_prs, False
+
+
+def _collect_issue_nodes(nodes: List[dict], cutoff_dt: Optional[dt.datetime]) -> Tuple[List[dict], bool]:
+    """1ページ分のIssueノードを正規化する。Returns: (Issueリスト, 走査を打ち切るか)"""
+    page_issues = []
+    for n in nodes:
+        if cutoff_dt:
+            created = dp.parse(n["createdAt"])
+            if created < cutoff_dt:
+                return page_issues, True
+        page_issues.append(normalize_issue(n))
+    return page_issues, False
+
+
+def iter_pr_pages(
     owner: str,
     repo: str,
     cutoff_dt: Optional[dt.datetime] = None,
     max_pages: int = 50,
-    etag: Optional[str] = None,
-    last_modified: Optional[str] = None
-) -> Tuple[List[dict], Optional[str], Optional[str], bool]:
-    print(f"[DEBUG] run_query using endpoint='{API_URL_DEFAULT}' owner='{owner}' repo='{repo}'")
-    sess = _session()
-    all_prs, cursor, pages = [], None, 0
-    response_etag = None
-    response_last_modified = None
+    updated_since: Optional[dt.datetime] = None,
+    cursor: Optional[str] = None
+) -> Iterator[Tuple[List[dict], Optional[str]]]:
+    """
+    PRをページ単位で取得するジェネレータ
 
-    while pages < max_pages:
-        variables = {"owner": owner, "name": repo, "cursor": cursor}
-        r = _post_with_rate_limit(sess, {"query": PR_QUERY, "variables": variables}, timeout=30)
+    1ページ取得・正規化するごとに (PRリスト, 次ページのカーソル) を返す。
+    次ページのカーソルは走査が終わるページでは None。max_pages で打ち切った場合は
+    最後のページでも続きのカーソルを返すため、None かどうかで走査を終えたか判定できる。
+    cursor を渡すとそのページから再開する。
+    呼び出し側はページごとに保存でき、全PRをメモリに溜めずに済む。
 
-        if pages == 0:
-            response_etag = r.headers.get("ETag")
-            response_last_modified = r.headers.get("Last-Modified")
+    updated_since を指定すると差分モード: UPDATED_AT 降順で走査し、
+    updatedAt が updated_since より古いPRに到達した時点で打ち切る
+    （updated_since と同時刻のPRは取り直し、保存時の内容ハッシュで重複を除く）。
+    差分モードでは createdAt が cutoff_dt より古いPRはスキップするが走査は続ける。
 
-        data = r.json()
-        if "errors" in data:
-            msgs = []
-            for err in data["errors"]:
-                path = ".".join(err.get("path", [])) if err.get("path") else ""
-                msgs.append(f"{err.get('message')}({path})")
-            raise RuntimeError("GraphQL errors: " + " | ".join(msgs))
+    ページサイズは AdaptivePager で応答状況に応じて増減し、
+    ファイル・スレッド・レビュー等が1ページに収まらないPRは complete_pr_node で補完する。
+    """
+    print(f"[DEBUG] run_query using endpoint='{API_URL_DEFAULT}' owner='{owner}' repo='{repo}'")
+    sess = get_session()
+    order_field = "UPDATED_AT" if updated_since else "CREATED_AT"
+    pages = 0
+    pager = AdaptivePager()
+
+    while pages < max_pages:
+        variables = {
+            "owner": owner, "name": repo, "cursor": cursor, "orderField": order_field,
+            "pageSize": SCHEDULER.page_size(pager.size, "pr"),
+        }
+        try:
+            r, data = _execute(sess, PR_QUERY, variables, "pr")
+        except (requests.RequestException, RuntimeError) as e:
+            if pager.shrink(e):
+                continue
+            raise
+        pager.observe(r.elapsed.total_seconds())
 
         repo_obj = data.get("data", {}).get("repository")
         if not repo_obj:
             raise RuntimeError(f"Repository not found or inaccessible: {owner}/{repo}")
 
         prs = repo_obj["pullRequests"]
-        nodes = prs["nodes"] or []
-        quit_early = False
-        for n in nodes:
-            if cutoff_dt:
-                created = dp.parse(n["createdAt"])
-                if created < cutoff_dt:
-                    quit_early = True
-                    break
-            all_prs.append(normalize_pr(n))
-
-        if quit_early or not prs["pageInfo"]["hasNextPage"]:
-            break
-        cursor = prs["pageInfo"]["endCursor"]
+        page_prs, quit_early = _collect_pr_nodes(sess, prs["nodes"] or [], cutoff_dt, updated_since)
         pages += 1
+        done = quit_early or not prs["pageInfo"]["hasNextPage"]
+        cursor = None if done else prs["pageInfo"]["endCursor"]
+        yield page_prs, cursor
+        if done:
+            break
+
+
+def run_query(
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50,
+    updated_since: Optional[dt.datetime] = None
+) -> Tuple[List[dict], bool]:
+    """
+    PRを取得する（iter_pr_pages の全ページをまとめて返す）
+
+    is_modified は差分モードで変更PRが1件以上あった場合のみ True。
+    変更の有無は updated_since（updatedAt の最高水位）で判定する。GraphQL の POST には
+    ETag / Last-Modified による条件付きリクエストが効かないため使わない。
+    大量のPRを保存する場合は iter_pr_pages でページごとに保存すること。
+    """
+    all_prs = []
+    for page_prs, _ in iter_pr_pages(owner, repo, cutoff_dt, max_pages, updated_since):
+        all_prs.extend(page_prs)
+
+    is_modified = bool(all_prs) if updated_since else True
+    return all_prs, is_modified
 
-    return all_prs, response_etag, response_last_modified, True
 
 def normalize_pr(n: dict) -> dict:
-    created = dp.parse(n["createdAt"])
-    closed = dp.parse(n["closedAt"]) if n["closedAt"] else None
-    merged = dp.parse(n["mergedAt"]) if n["mergedAt"] else None
-    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
-    end_time = merged or closed or now
-    age_hours = (end_time - created).total_seconds() / 3600.0
+    # 経過時間（age_hours）は取得時刻で変わるので保存しない（読み込み時に derived.add_age_columns で計算）
     reviews = (n.get("reviews") or {}).get("nodes") or []
     changes_requested = sum(1 for rv in reviews if rv.get("state") == "CHANGES_REQUESTED")
     approvals = sum(1 for rv in reviews if rv.get("state") == "APPROVED")
@@ -321,7 +840,7 @@ def normalize_pr(n: dict) -> dict:
         "createdAt": n["createdAt"],
         "closedAt": n["closedAt"],
         "mergedAt": n["mergedAt"],
-        "age_hours": age_hours,
+        "updatedAt": n.get("updatedAt"),
         "labels": [l["name"] for l in ((n["labels"] or {}).get("nodes") or [])],
         "comments_count": (n.get("comments") or {}).get("totalCount", 0),
         "review_threads": total_threads,
@@ -337,61 +856,156 @@ def normalize_pr(n: dict) -> dict:
     }
 
 
-def run_issue_query(
+def iter_issue_pages(
     owner: str,
     repo: str,
     cutoff_dt: Optional[dt.datetime] = None,
-    max_pages: int = 50
-) -> List[dict]:
-    """Fetch issues from GitHub GraphQL API"""
+    max_pages: int = 50,
+    cursor: Optional[str] = None
+) -> Iterator[Tuple[List[dict], Optional[str]]]:
+    """
+    Issueをページ単位で取得するジェネレータ。(Issueリスト, 次ページのカーソル) を返す
+    次ページのカーソルの扱いは iter_pr_pages と同じ（max_pages で打ち切った場合も続きのカーソルを返す）
+    """
     print(f"[DEBUG] run_issue_query using endpoint='{API_URL_DEFAULT}' owner='{owner}' repo='{repo}'")
-    sess = _session()
-    all_issues, cursor, pages = [], None, 0
+    sess = get_session()
+    pages = 0
 
     while pages < max_pages:
-        variables = {"owner": owner, "name": repo, "cursor": cursor}
-        r = _post_with_rate_limit(sess, {"query": ISSUE_QUERY, "variables": variables}, timeout=30)
-
-        data = r.json()
-        if "errors" in data:
-            msgs = []
-            for err in data["errors"]:
-                path = ".".join(err.get("path", [])) if err.get("path") else ""
-                msgs.append(f"{err.get('message')}({path})")
-            raise RuntimeError("GraphQL errors: " + " | ".join(msgs))
+        variables = {
+            "owner": owner, "name": repo, "cursor": cursor,
+            "pageSize": SCHEDULER.page_size(ISSUE_PAGE_SIZE, "issue"),
+        }
+        _, data = _execute(sess, ISSUE_QUERY, variables, "issue")
 
         repo_obj = data.get("data", {}).get("repository")
         if not repo_obj:
             raise RuntimeError(f"Repository not found or inaccessible: {owner}/{repo}")
 
         issues = repo_obj["issues"]
-        nodes = issues["nodes"] or []
-        quit_early = False
-        for n in nodes:
-            if cutoff_dt:
-                created = dp.parse(n["createdAt"])
-                if created < cutoff_dt:
-                    quit_early = True
-                    break
-            all_issues.append(normalize_issue(n))
-
-        if quit_early or not issues["pageInfo"]["hasNextPage"]:
-            break
-        cursor = issues["pageInfo"]["endCursor"]
+        page_issues, quit_early = _collect_issue_nodes(issues["nodes"] or [], cutoff_dt)
         pages += 1
+        done = quit_early or not issues["pageInfo"]["hasNextPage"]
+        cursor = None if done else issues["pageInfo"]["endCursor"]
+        yield page_issues, cursor
+        if done:
+            break
+
 
+def run_issue_query(
+    owner: str,
+    repo: str,
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50
+) -> List[dict]:
+    """Fetch issues from GitHub GraphQL API"""
+    all_issues = []
+    for page_issues, _ in iter_issue_pages(owner, repo, cutoff_dt, max_pages):
+        all_issues.extend(page_issues)
     return all_issues
 
 
+def iter_batch_pages(
+    repositories: List[Tuple[str, str]],
+    kind: str = "pr",
+    cutoff_dt: Optional[dt.datetime] = None,
+    max_pages: int = 50,
+    updated_since: Optional[dict] = None,
+    cursors: Optional[dict] = None
+) -> Iterator[Tuple[Tuple[str, str], List[dict], Optional[str]]]:
+    """
+    複数リポジトリのPR（kind="pr"）またはIssue（kind="issue"）をエイリアス付きの
+    1クエリでまとめて取得するジェネレータ。リポジトリごとにカーソルを持ち、全リポジトリを
+    走査し終えるまで未完了のものだけで次のクエリを組み立てる。
+
+    1クエリごとにリポジトリ単位で ((owner, repo), 正規化済みPR/Issueリスト, 次ページのカーソル) を返す。
+    次ページのカーソルの扱いは iter_pr_pages と同じ（None なら走査完了、
+    max_pages で打ち切った場合は続きのカーソル）。呼び出し側はページごとに保存できる。
+    cursors に {(owner, repo): カーソル} を渡すとそのリポジトリはそのページから再開する。
+    
+    updated_since に {(owner, repo): datetime} を渡すとPRは差分モード（UPDATED_AT 降順）で
+    走査する。差分モードと全期間モードは並び順が異なるため同じバッチに混在させないこと。
+    """
+    print(f"[DEBUG] iter_batch_pages using endpoint='{API_URL_DEFAULT}' kind='{kind}' repos={len(repositories)}")
+    sess = get_session()
+    # key -> [cursor, pages]
+    active = {key: [(cursors or {}).get(key), 0] for key in repositories}
+    pager = AdaptivePager(PR_PAGE_SIZE if kind == "pr" else ISSUE_PAGE_SIZE)
+    query_cache = {}
+
+    while active:
+        keys = list(active)
+        if len(keys) not in query_cache:
+            query_cache[len(keys)] = build_batch_query(kind, len(keys))
+        variables = {"pageSize": SCHEDULER.page_size(pager.size, kind)}
+        if kind == "pr":
+            variables["orderField"] = "UPDATED_AT" if updated_since else "CREATED_AT"
+        for i, (owner, repo) in enumerate(keys):
+            variables.update({f"o{i}": owner, f"n{i}": repo, f"c{i}": active[(owner, repo)][0]})
+
+        try:
+            r, data = _execute(sess, query_cache[len(keys)], variables, kind)
+        except (requests.RequestException, RuntimeError) as e:
+            if pager.shrink(e):
+                continue
+            raise
+        pager.observe(r.elapsed.total_seconds())
+
+        for i, key in enumerate(keys):
+            repo_obj = (data.get("data") or {}).get(f"r{i}")
+            if not repo_obj:
+                raise RuntimeError(f"Repository not found or inaccessible: {key[0]}/{key[1]}")
+            if kind == "pr":
+                conn = repo_obj["pullRequests"]
+                since = (updated_since or {}).get(key)
+                items, quit_early = _collect_pr_nodes(sess, conn["nodes"] or [], cutoff_dt, since)
+            else:
+                conn = repo_obj["issues"]
+                items, quit_early = _collect_issue_nodes(conn["nodes"] or [], cutoff_dt)
+
+            state = active[key]
+            state[1] += 1
+            done = quit_early or not conn["pageInfo"]["hasNextPage"]
+            state[0] = None if done else conn["pageInfo"]["endCursor"]
+            yield key, items, state[0]
+            if done or state[1] >= max_pages:
+                del active[key]
+
+
+def run_pr_numbers_query(owner: str, repo: str, numbers: List[int], batch_size: int = 20) -> List[dict]:
+    """
+    指定番号のPRだけを再取得する（オープンPRの高速更新用）
+    batch_size 件ずつエイリアス付きの1クエリにまとめる。削除・移管されたPRは結果に含まれない。
+    リポジトリ自体を解決できない場合（改名・移管・権限なし）は例外にする。
+    """
+    print(f"[DEBUG] run_pr_numbers_query using endpoint='{API_URL_DEFAULT}' owner='{owner}' repo='{repo}' "
+          f"count={len(numbers)}")
+    sess = get_session()
+    prs = []
+    query_cache = {}
+
+    for start in range(0, len(numbers), batch_size):
+        chunk = numbers[start:start + batch_size]
+        if len(chunk) not in query_cache:
+            query_cache[len(chunk)] = build_pr_numbers_query(len(chunk))
+        variables = {"owner": owner, "name": repo}
+        variables.update({f"num{i}": number for i, number in enumerate(chunk)})
+        # 存在しない番号は repository.p{i} の NOT_FOUND になり、そのエイリアスだけ null で返る
+        _, data = _execute(sess, query_cache[len(chunk)], variables, "pr_open", missing_ok_under="repository")
+        
+        repo_obj = (data.get("data") or {}).get("repository")
+        if not repo_obj:
+            raise RuntimeError(f"Repository not found or inaccessible: {owner}/{repo}")
+        for i in range(len(chunk)):
+            node = repo_obj.get(f"p{i}")
+            if node:
+                prs.append(normalize_pr(complete_pr_node(sess, node)))
+
+    return prs
+
+
 def normalize_issue(n: dict) -> dict:
     """Normalize issue data from GitHub GraphQL API"""
-    created = dp.parse(n["createdAt"])
-    closed = dp.parse(n["closedAt"]) if n["closedAt"] else None
-    updated = dp.parse(n["updatedAt"]) if n["updatedAt"] else None
-    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
-    end_time = closed or now
-    age_hours = (end_time - created).total_seconds() / 3600.0
-    
     # Extract assignees
     assignees = [a["login"] for a in ((n.get("assignees") or {}).get("nodes") or [])]
     
@@ -450,6 +1064,7 @@ def normalize_issue(n: dict) -> dict:
             })
     
     # Calculate cycle time (time from issue creation to first linked PR merge)
+    created = dp.parse(n["createdAt"])
     cycle_time_hours = None
     first_merged_pr = None
     for pr in linked_prs:
@@ -460,6 +1075,7 @@ def normalize_issue(n: dict) -> dict:
                 cycle_time_hours = cycle
                 first_merged_pr = pr["number"]
     
+    # 経過時間（age_hours）は取得時刻で変わるので保存しない（PRと同じく読み込み側で計算する）
     return {
         "number": n["number"],
         "title": n["title"],
@@ -469,7 +1085,6 @@ def normalize_issue(n: dict) -> dict:
         "createdAt": n["createdAt"],
         "closedAt": n["closedAt"],
         "updatedAt": n["updatedAt"],
-        "age_hours": age_hours,
         "labels": [l["name"] for l in ((n["labels"] or {}).get("nodes") or [])],
         "comments_count": (n.get("comments") or {}).get("totalCount", 0),
         "assignees": assignees,
@@ -0,0 +1,417 @@
+# four_keys.py
+"""
+Four Keys（DORA）の日次・週次ロールアップ（SQLite）
+
+マージ済みPR = デプロイとして、PRの保存時（db_cache.save_prs と同じトランザクション）に
+影響する日だけを集計し直す。どの期間の指標も日次ロールアップの合計で求まるので、
+ページは全PRを読み込んだり、タイトル・ラベルのキーワードを毎回照合したりしない。
+
+  four_keys_deploys: デプロイ1件 = 1行（マージ日時, リードタイム, 失敗判定）
+  four_keys_daily / four_keys_weekly: 日（UTC）・週（月曜始まり）ごとの件数・合計・最小・最大（最初・最後のマージ日時も）
+
+期間はマージ日（UTC の日単位）で絞る（期間内にマージされたPR = 期間内のデプロイ）。
+中央値は合計できないため、期間内の four_keys_deploys のリードタイム列だけを読んで正確に求める。
+失敗判定のキーワード（config.FOUR_KEYS_FAILURE_KEYWORDS）やロールアップの定義が変わると、
+次回のDB初期化時に全体を作り直す（ensure_rollups）。
+
+    conn = db_cache.get_connection()
+    summary = four_keys.summary(conn, owner, repo, since=cutoff_dt)
+    daily = four_keys.daily(conn, owner, repo, since=cutoff_dt)
+"""
+import datetime as dt
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import pandas as pd
+
+import config
+
+DEFAULT_FAILURE_KEYWORDS = ("revert", "hotfix", "urgent", "fix", "rollback", "emergency", "critical")
+# タイトルまたはラベルにいずれかを含むマージ済みPRを失敗（復旧のための変更）とみなす（大文字小文字を区別しない）
+FAILURE_KEYWORDS = tuple(getattr(config, "FOUR_KEYS_FAILURE_KEYWORDS", None) or DEFAULT_FAILURE_KEYWORDS)
+
+# ロールアップの定義の版（集計方法を変えたら上げる）
+ROLLUP_VERSION = 2
+
+# IN 句に渡すパラメータ数の上限
+_IN_CHUNK = 500
+
+_AGGREGATES = """
+    COUNT(*) AS deploys, SUM(is_failure) AS failures,
+    COUNT(lead_time_hours) AS lead_time_count, SUM(lead_time_hours) AS lead_time_sum,
+    MIN(lead_time_hours) AS lead_time_min, MAX(lead_time_hours) AS lead_time_max,
+    SUM(is_failure AND lead_time_hours IS NOT NULL) AS restore_time_count,
+    SUM(CASE WHEN is_failure THEN lead_time_hours END) AS restore_time_sum,
+    MIN(merged_at) AS first_merged_at, MAX(merged_at) AS last_merged_at
+"""
+# 週 = その日を含む週の月曜日
+_WEEK_OF_DAY = "date(day, '-6 days', 'weekday 1')"
+_TABLES = ("four_keys_deploys", "four_keys_daily", "four_keys_weekly")
+# 旧版のテーブル（作り直し時に削除する）
+_LEGACY_TABLES = ("four_keys_lead_time",)
+_ROLLUP_COLUMNS = ("deploys", "failures", "lead_time_count", "lead_time_sum", "lead_time_min",
+                   "lead_time_max", "restore_time_count", "restore_time_sum", "first_merged_at", "last_merged_at")
+
+
+def settings_key() -> str:
+    """ロールアップの計算条件（保存済みのロールアップとの照合に使う）"""
+    return repr((ROLLUP_VERSION, FAILURE_KEYWORDS))
+
+
+def is_failure(title: Optional[str], labels: Iterable[str], keywords: Sequence[str] = FAILURE_KEYWORDS) -> bool:
+    """タイトルまたはラベルに keywords のいずれかを含むか"""
+    texts = [(title or "").lower()] + [(label or "").lower() for label in labels]
+    return any(kw.lower() in text for kw in keywords for text in texts)
+
+
+def _week_start(day: str) -> str:
+    date = dt.date.fromisoformat(day)
+    return (date - dt.timedelta(days=date.weekday())).isoformat()
+
+
+def _day(value) -> Optional[str]:
+    """datetime / ISO8601文字列 → 日（UTC, YYYY-MM-DD）"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:10]
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc)
+    return value.strftime("%Y-%m-%d")
+
+
+def _chunks(values: List, size: int = _IN_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+# ---- スキーマ・更新（db_cache のトランザクション内で実行） ----
+
+def create_tables(cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS four_keys_deploys (
+            owner TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            merged_at TEXT NOT NULL,
+            lead_time_hours REAL,
+            is_failure INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (owner, repo, pr_number)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_four_keys_deploys_day
+        ON four_keys_deploys(owner, repo, day)
+    """)
+    for table, period in (("four_keys_daily", "day"), ("four_keys_weekly", "week")):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                {period} TEXT NOT NULL,
+                deploys INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                lead_time_count INTEGER NOT NULL DEFAULT 0,
+                lead_time_sum REAL,
+                lead_time_min REAL,
+                lead_time_max REAL,
+                restore_time_count INTEGER NOT NULL DEFAULT 0,
+                restore_time_sum REAL,
+                first_merged_at TEXT,
+                last_merged_at TEXT,
+                PRIMARY KEY (owner, repo, {period})
+            )
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS four_keys_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _deploy_rows(cursor, owner: str, repo: str, pr_numbers: Optional[List[int]]) -> List[tuple]:
+    """pull_requests のマージ済みPRから four_keys_deploys の行を作る"""
+    sql = """
+        SELECT p.pr_number, p.merged_at, p.lead_time_hours, p.title,
+               (SELECT json_group_array(l.label) FROM pr_labels l 
+                 WHERE l.owner = p.owner AND l.repo = p.repo AND l.pr_number = p.pr_number) 
+        FROM pull_requests p 
+        WHERE p.owner = ? AND p.repo = ? AND p.merged_at IS NOT NULL AND p.merged_at != ''
+    """
+    if pr_numbers is None:
+        fetched = cursor.execute(sql, (owner, repo)).fetchall()
+    else:
+        fetched = []
+        for chunk in _chunks(pr_numbers):
+            fetched += cursor.execute(sql + f" AND p.pr_number IN ({','.join('?' * len(chunk))})",
+                                      (owner, repo, *chunk)).fetchall()
+    return [
+        (owner, repo, number, _day(merged_at), merged_at, lead_time,
+         int(is_failure(title, json.loads(labels or "[]"))))
+        for number, merged_at, lead_time, title, labels in fetched
+    ]
+
+
+def _refresh_rollups(cursor, owner: str, repo: str, days: Optional[Set[str]]) -> None:
+    """days（None なら全期間）の日次・週次ロールアップを four_keys_deploys から集計し直す"""
+    if days is None:
+        for table in ("four_keys_daily", "four_keys_weekly"):
+            cursor.execute(f"DELETE FROM {table} WHERE owner = ? AND repo = ?", (owner, repo))
+        day_filters = [("", [])]
+        week_filters = [("", [])]
+    else:
+        days = sorted(days)
+        weeks = sorted({_week_start(day) for day in days})
+        day_filters = [(f"AND day IN ({','.join('?' * len(chunk))})", chunk) for chunk in _chunks(days)]
+        week_filters = [(f"AND {_WEEK_OF_DAY} IN ({','.join('?' * len(chunk))})", chunk) for chunk in _chunks(weeks)]
+        for where, chunk in day_filters:
+            cursor.execute(f"DELETE FROM four_keys_daily WHERE owner = ? AND repo = ? {where}", (owner, repo, *chunk))
+        for chunk in _chunks(weeks):
+            cursor.execute(f"""
+                DELETE FROM four_keys_weekly 
+                WHERE owner = ? AND repo = ? AND week IN ({','.join('?' * len(chunk))})
+            """, (owner, repo, *chunk))
+
+    columns = ", ".join(_ROLLUP_COLUMNS)
+    for where, chunk in day_filters:
+        cursor.execute(f"""
+            INSERT INTO four_keys_daily (owner, repo, day, {columns}) 
+            SELECT owner, repo, day, {_AGGREGATES} 
+            FROM four_keys_deploys 
+            WHERE owner = ? AND repo = ? {where} 
+            GROUP BY day
+        """, (owner, repo, *chunk))
+    # 週次は日次の合計
+    for where, chunk in week_filters:
+        cursor.execute(f"""
+            INSERT INTO four_keys_weekly (owner, repo, week, {columns}) 
+            SELECT owner, repo, {_WEEK_OF_DAY}, SUM(deploys), SUM(failures), SUM(lead_time_count),
+                   SUM(lead_time_sum), MIN(lead_time_min), MAX(lead_time_max),
+                   SUM(restore_time_count), SUM(restore_time_sum), MIN(first_merged_at), MAX(last_merged_at) 
+            FROM four_keys_daily 
+            WHERE owner = ? AND repo = ? {where} 
+            GROUP BY {_WEEK_OF_DAY}
+        """, (owner, repo, *chunk))
+
+
+def update_rollups(cursor, owner: str, repo: str, pr_numbers: Optional[List[int]] = None) -> None:
+    """
+    PRの保存・削除後に、そのPRのデプロイ行と影響する日のロールアップを更新する
+    pull_requests / pr_labels の書き込み後に同じトランザクションで呼ぶ（pr_numbers が None ならリポジトリ全体）
+    マージ日が変わったPR・削除されたPRは、元の日も集計し直す
+    """
+    if pr_numbers is None:
+        cursor.execute("DELETE FROM four_keys_deploys WHERE owner = ? AND repo = ?", (owner, repo))
+        cursor.executemany("INSERT INTO four_keys_deploys VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           _deploy_rows(cursor, owner, repo, None))
+        _refresh_rollups(cursor, owner, repo, None)
+        return
+
+    pr_numbers = list(pr_numbers)
+    days = set()
+    for chunk in _chunks(pr_numbers):
+        marks = ",".join("?" * len(chunk))
+        days.update(row[0] for row in cursor.execute(f"""
+            SELECT day FROM four_keys_deploys 
+            WHERE owner = ? AND repo = ? AND pr_number IN ({marks})
+        """, (owner, repo, *chunk)))
+        cursor.execute(f"""
+            DELETE FROM four_keys_deploys 
+            WHERE owner = ? AND repo = ? AND pr_number IN ({marks})
+        """, (owner, repo, *chunk))
+    rows = _deploy_rows(cursor, owner, repo, pr_numbers)
+    cursor.executemany("INSERT INTO four_keys_deploys VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    days.update(row[3] for row in rows)
+    if days:
+        _refresh_rollups(cursor, owner, repo, days)
+
+
+def ensure_rollups(cursor) -> None:
+    """
+    ロールアップの計算条件（settings_key）が保存時と違えば、全リポジトリ分を作り直す
+    （ロールアップ導入前のDB・失敗キーワードやロールアップの定義の変更時）
+    ロールアップは pull_requests から再計算できるので、定義が変わったらテーブルごと作り直す
+    """
+    create_tables(cursor)
+    stored = cursor.execute("SELECT value FROM four_keys_meta WHERE key = 'settings'").fetchone()
+    if stored and stored[0] == settings_key():
+        return
+    for table in _TABLES + _LEGACY_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    create_tables(cursor)
+    repos = cursor.execute("""
+        SELECT owner, repo FROM pull_requests 
+        UNION SELECT owner, repo FROM four_keys_deploys
+    """).fetchall()
+    for owner, repo in repos:
+        update_rollups(cursor, owner, repo)
+    cursor.execute("INSERT OR REPLACE INTO four_keys_meta (key, value) VALUES ('settings', ?)", (settings_key(),))
+
+
+# ---- 読み込み（期間 = マージ日が since 以上の日、UTC の日単位） ----
+
+def _period_filter(owner: str, repo: str, since=None, until=None, alias: str = ""):
+    clauses = [f"{alias}owner = ?", f"{alias}repo = ?"]
+    params = [owner, repo]
+    if since is not None:
+        clauses.append(f"{alias}day >= ?")
+        params.append(_day(since))
+    if until is not None:
+        clauses.append(f"{alias}day <= ?")
+        params.append(_day(until))
+    return " AND ".join(clauses), params
+
+
+def _numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """集計列を数値にする（すべて NULL の列も float の NaN に）"""
+    for col in _ROLLUP_COLUMNS[:-2]:
+        df[col] = pd.to_numeric(df[col]).astype(float if col.endswith(("_sum", "_min", "_max")) else int)
+    return df
+
+
+def daily(conn: sqlite3.Connection, owner: str, repo: str, since=None, until=None) -> pd.DataFrame:
+    """
+    日次ロールアップ（デプロイのあった日のみ）
+    列: day（datetime, UTC）, deploys, failures, lead_time_count, lead_time_sum, lead_time_min,
+        lead_time_max, restore_time_count, restore_time_sum, first_merged_at, last_merged_at（ISO8601文字列）
+    """
+    where, params = _period_filter(owner, repo, since, until)
+    df = pd.read_sql_query(f"""
+        SELECT day, {", ".join(_ROLLUP_COLUMNS)} 
+        FROM four_keys_daily 
+        WHERE {where} 
+        ORDER BY day
+    """, conn, params=params)
+    df["day"] = pd.to_datetime(df["day"], utc=True)
+    return _numeric(df)
+
+
+def weekly(conn: sqlite3.Connection, owner: str, repo: str, since=None, until=None) -> pd.DataFrame:
+    """
+    週次ロールアップ（週 = 月曜の日付）
+    期間を指定すると端の週は期間内の日だけを合計するため、日次ロールアップを週にまとめる
+    列: week（datetime, UTC）, daily と同じ集計列
+    """
+    columns = ", ".join(_ROLLUP_COLUMNS)
+    if since is None and until is None:
+        sql = f"""
+            SELECT week, {columns} 
+            FROM four_keys_weekly 
+            WHERE owner = ? AND repo = ? 
+            ORDER BY week
+        """
+        params = [owner, repo]
+    else:
+        where, params = _period_filter(owner, repo, since, until)
+        sql = f"""
+            SELECT {_WEEK_OF_DAY} AS week, SUM(deploys) AS deploys, SUM(failures) AS failures,
+                   SUM(lead_time_count) AS lead_time_count, SUM(lead_time_sum) AS lead_time_sum,
+                   MIN(lead_time_min) AS lead_time_min, MAX(lead_time_max) AS lead_time_max,
+                   SUM(restore_time_count) AS restore_time_count, SUM(restore_time_sum) AS restore_time_sum,
+                   MIN(first_merged_at) AS first_merged_at, MAX(last_merged_at) AS last_merged_at 
+            FROM four_keys_daily 
+            WHERE {where} 
+            GROUP BY {_WEEK_OF_DAY} 
+            ORDER BY week
+        """
+    df = pd.read_sql_query(sql, conn, params=params)
+    df["week"] = pd.to_datetime(df["week"], utc=True)
+    return _numeric(df)
+
+
+def lead_times(conn: sqlite3.Connection, owner: str, repo: str, since=None, until=None) -> pd.DataFrame:
+    """
+    期間のデプロイごとのリードタイム（four_keys_deploys だけを読む。中央値・散布図用）
+    列: number, mergedAt_dt（datetime, UTC）, lead_time_hours, is_failure（マージ日時の古い順）
+    """
+    where, params = _period_filter(owner, repo, since, until)
+    df = pd.read_sql_query(f"""
+        SELECT pr_number AS number, merged_at AS mergedAt, lead_time_hours, is_failure 
+        FROM four_keys_deploys 
+        WHERE {where} AND lead_time_hours IS NOT NULL 
+        ORDER BY merged_at, pr_number
+    """, conn, params=params)
+    df["mergedAt_dt"] = pd.to_datetime(df.pop("mergedAt"), format="ISO8601", utc=True, errors="coerce")
+    df["lead_time_hours"] = df["lead_time_hours"].astype(float)
+    df["is_failure"] = df["is_failure"].astype(bool)
+    return df
+
+
+def summary(conn: sqlite3.Connection, owner: str, repo: str, since=None, until=None) -> Dict:
+    """
+    期間の Four Keys（件数・合計は日次ロールアップ、中央値はデプロイごとのリードタイムから）
+    Returns: deploys, failures, first_merged_at, last_merged_at（datetime。デプロイが無ければ None）,
+             deployment_frequency（週あたり）, change_failure_rate（%）,
+             lead_time_median_hours, lead_time_mean_hours, lead_time_min_hours, lead_time_max_hours,
+             mttr_median_hours, mttr_mean_hours（該当なしは None）
+    """
+    where, params = _period_filter(owner, repo, since, until)
+    row = conn.execute(f"""
+        SELECT MIN(first_merged_at), MAX(last_merged_at), SUM(deploys), SUM(failures), SUM(lead_time_count), SUM(lead_time_sum),
+               MIN(lead_time_min), MAX(lead_time_max), SUM(restore_time_count), SUM(restore_time_sum) 
+        FROM four_keys_daily 
+        WHERE {where}
+    """, params).fetchone()
+    first_merged_at, last_merged_at, deploys, failures, lt_count, lt_sum, lt_min, lt_max, rt_count, rt_sum = row
+    deploys, failures = deploys or 0, failures or 0
+
+    # 中央値は合計できないため、期間内のリードタイム列だけを読んで求める
+    times = lead_times(conn, owner, repo, since, until)
+    lead_time_median = float(times["lead_time_hours"].median()) if len(times) else None
+    restore_times = times.loc[times["is_failure"], "lead_time_hours"]
+    mttr_median = float(restore_times.median()) if len(restore_times) else None
+
+    first = pd.Timestamp(first_merged_at).to_pydatetime() if first_merged_at else None
+    last = pd.Timestamp(last_merged_at).to_pydatetime() if last_merged_at else None
+    # 最初と最後のデプロイの間の週数（日未満は切り捨て、1週未満は1週）
+    weeks = max((last - first).days / 7, 1) if first else 1
+    return {
+        "deploys": deploys,
+        "failures": failures,
+        "first_merged_at": first,
+        "last_merged_at": last,
+        "deployment_frequency": deploys / weeks,
+        "change_failure_rate": failures / deploys * 100 if deploys else 0.0,
+        "lead_time_median_hours": lead_time_median,
+        "lead_time_mean_hours": lt_sum / lt_count if lt_count else None,
+        "lead_time_min_hours": lt_min,
+        "lead_time_max_hours": lt_max,
+        "mttr_median_hours": mttr_median,
+        "mttr_mean_hours": rt_sum / rt_count if rt_count else None,
+    }
+
+
+def load_deploys(conn: sqlite3.Connection, owner: str, repo: str, since=None, until=None,
+                 failures_only: bool = False, order_by_lead_time: bool = False,
+                 limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    期間のデプロイ（マージ済みPR）1件 = 1行（PRのタイトル・作成者・URL・ラベルを結合済み）
+    failures_only: 失敗PRのみ, order_by_lead_time: リードタイムの長い順（既定はマージ日の新しい順）
+    列: number, title, author, url, labels（list）, createdAt, mergedAt（+ _dt）, lead_time_hours, is_failure
+    """
+    where, params = _period_filter(owner, repo, since, until, alias="d.")
+    if failures_only:
+        where += " AND d.is_failure = 1"
+    order = "d.lead_time_hours DESC, d.pr_number DESC" if order_by_lead_time else "p.merged_at DESC, d.pr_number DESC"
+    sql = f"""
+        SELECT d.pr_number AS number, p.title, p.author, p.url,
+               (SELECT json_group_array(l.label) FROM pr_labels l 
+                 WHERE l.owner = d.owner AND l.repo = d.repo AND l.pr_number = d.pr_number) AS labels,
+               p.created_at AS createdAt, p.merged_at AS mergedAt, d.lead_time_hours, d.is_failure 
+        FROM four_keys_deploys d 
+        JOIN pull_requests p 
+          ON p.owner = d.owner AND p.repo = d.repo AND p.pr_number = d.pr_number 
+        WHERE {where} 
+        ORDER BY {order}
+    """
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    df = pd.read_sql_query(sql, conn, params=params)
+    for col in ("createdAt", "mergedAt"):
+        df[f"{col}_dt"] = pd.to_datetime(df[col], format="ISO8601", utc=True, errors="coerce")
+    df["labels"] = df["labels"].map(json.loads)
+    df["is_failure"] = df["is_failure"].astype(bool)
+    return df
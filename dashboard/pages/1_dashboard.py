@@ -1,19 +1,22 @@
 # dashboard.py - GitHub PR dashboard (Streamlit)
 import re
 import time
-from datetime import datetime, timedelta, timezone
-from typing import Iterable, List, Tuple
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 from zoneinfo import ZoneInfo
 
 import action_tracker
+import derived
 
 import config
 from fetcher import run_query
 import db_cache  # SQLiteキャッシュ
+import data_access  # メモ化したデータ読み込み
 
 
 st.set_page_config(page_title="PRダッシュボード", layout="wide", page_icon="📊")
@@ -85,55 +88,6 @@ else:
 JST = ZoneInfo("Asia/Tokyo")
 
 
-def calculate_business_hours(start_dt: datetime, end_dt: datetime) -> float:
-    """
-    営業日（平日のみ）で経過時間を計算する
-    土日を除外し、営業時間のみをカウント
-    
-    Args:
-        start_dt: 開始日時
-        end_dt: 終了日時
-    
-    Returns:
-        営業日ベースの経過時間（時間単位）
-    """
-    if pd.isna(start_dt) or pd.isna(end_dt):
-        return 0.0
-    
-    # datetimeに変換
-    if isinstance(start_dt, str):
-        start_dt = pd.to_datetime(start_dt, format="ISO8601", utc=True)
-    if isinstance(end_dt, str):
-        end_dt = pd.to_datetime(end_dt, format="ISO8601", utc=True)
-    
-    # 同じ日の場合は単純な差分
-    if start_dt.date() == end_dt.date():
-        # 土日なら0を返す
-        if start_dt.weekday() >= 5:
-            return 0.0
-        return (end_dt - start_dt).total_seconds() / 3600
-    
-    # 日をまたぐ場合は日ごとに計算
-    current = start_dt
-    total_hours = 0.0
-    
-    while current.date() < end_dt.date():
-        # 平日のみカウント（月曜=0, 日曜=6）
-        if current.weekday() < 5:
-            # その日の残り時間（翌日0時まで）
-            next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-            total_hours += (next_day - current).total_seconds() / 3600
-        
-        # 次の日へ
-        current = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-    
-    # 最終日の時間を追加
-    if end_dt.weekday() < 5:
-        total_hours += (end_dt - current).total_seconds() / 3600
-    
-    return total_hours
-
-
 def parse_owner_repo(owner_in: str, repo_in: str) -> Tuple[str, str]:
     """Normalize owner/repo strings even if URLs are provided."""
 
@@ -149,15 +103,34 @@ def parse_owner_repo(owner_in: str, repo_in: str) -> Tuple[str, str]:
     return (owner_in or "").strip().strip("/"), (repo_in or "").strip().strip("/")
 
 
-def build_pr_timeline_df(source: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
-    """Create a DataFrame tailored for Plotly timeline charts."""
-
-    now_iso = datetime.now(timezone.utc).isoformat()
+TIMELINE_COLUMNS = [
+    "number",
+    "Task",
+    "Start",
+    "Finish",
+    "state",
+    "age_hours",
+    "business_hours",
+    "business_days",
+    "comments_count",
+    "changes_requested",
+    "url",
+    "title_info",
+    "author_info",
+    "action_owner",
+]
+# 現在時刻で変わる列（メモ化しない）
+TIMELINE_NOW_COLUMNS = ["Finish", "age_hours", "business_hours", "business_days"]
+
+
+def build_pr_timeline_base(source: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
+    """
+    タイムライン用の列のうち現在時刻に依存しないもの（メモ化できる部分）
+    OPEN の終了時刻（End は NaT）と経過時間は add_timeline_times で追加する
+    """
     df = source.copy()
     df["Start"] = pd.to_datetime(df["createdAt"], format="ISO8601", utc=True)
-    df["Finish"] = pd.to_datetime(
-        df["mergedAt"].fillna(df["closedAt"]).fillna(now_iso), format="ISO8601", utc=True
-    )
+    df["End"] = pd.to_datetime(df["mergedAt"].fillna(df["closedAt"]), format="ISO8601", utc=True)
 
     if compact:
         df["Task"] = "#" + df["number"].astype(str)
@@ -174,37 +147,31 @@ def build_pr_timeline_df(source: pd.DataFrame, compact: bool = False) -> pd.Data
     df["title_info"] = df["title"].fillna("")
     df["author_info"] = df["author"].fillna("")
     
-    # 営業日ベースの経過時間を計算
-    df["business_hours"] = df.apply(
-        lambda row: calculate_business_hours(row["Start"], row["Finish"]),
-        axis=1
-    )
-    df["business_days"] = (df["business_hours"] / 24).round(1)
-    
     # 担当者情報を追加
-    df["action_owner"] = df.apply(
-        lambda row: action_tracker.format_action_for_hover(row.to_dict()), 
-        axis=1
-    )
+    df["action_owner"] = action_tracker.format_actions_for_hover(action_tracker.classify_actions(df))
 
-    return df[
-        [
-            "number",
-            "Task",
-            "Start",
-            "Finish",
-            "state",
-            "age_hours",
-            "business_hours",
-            "business_days",
-            "comments_count",
-            "changes_requested",
-            "url",
-            "title_info",
-            "author_info",
-            "action_owner",
-        ]
-    ]
+    return df[[c for c in TIMELINE_COLUMNS if c not in TIMELINE_NOW_COLUMNS] + ["End"]]
+
+
+def add_timeline_times(base: pd.DataFrame, source: pd.DataFrame, now: datetime) -> pd.DataFrame:
+    """
+    現在時刻で変わる列（OPEN の Finish = now と経過時間）を追加する
+    経過時間（age_hours, business_hours, business_days）は derived.add_age_columns で計算済みの source から取る
+    base は source と同じ行の並び（キャッシュ済みの base は索引が異なることがあるので位置で対応させる）
+    """
+    df = base.copy()
+    df["Finish"] = df["End"].fillna(pd.Timestamp(now))
+    for column in ("age_hours", "business_hours", "business_days"):
+        df[column] = source[column].to_numpy()
+    return df[TIMELINE_COLUMNS]
+
+
+def build_pr_timeline_df(source: pd.DataFrame, compact: bool = False,
+                         now: Optional[datetime] = None) -> pd.DataFrame:
+    """Create a DataFrame tailored for Plotly timeline charts."""
+    
+    now = now or datetime.now(timezone.utc)
+    return add_timeline_times(build_pr_timeline_base(source, compact=compact), source, now)
 
 
 def build_files_table(df_all: pd.DataFrame) -> pd.DataFrame:
@@ -231,6 +198,24 @@ def build_files_table(df_all: pd.DataFrame) -> pd.DataFrame:
     return pr_uni
 
 
+@st.cache_data(show_spinner=False, ttl=data_access.CACHE_TTL, max_entries=data_access.MAX_ENTRIES)
+def cached_timeline_base(_source: pd.DataFrame, owner: str, repo: str, data_version: int, days: int,
+                         numbers: tuple, index: tuple, compact: bool = False) -> pd.DataFrame:
+    """
+    build_pr_timeline_base のメモ化版（担当者の行ごとの計算を再実行時に省く）
+    _source はハッシュしない。同じデータ版・期間なら PR番号の並び（numbers）と索引（index）で内容が決まる。
+    現在時刻で変わる列はキャッシュせず、呼び出し側で add_timeline_times により追加する
+    """
+    return build_pr_timeline_base(_source, compact=compact)
+
+
+@st.cache_data(show_spinner=False, ttl=data_access.CACHE_TTL, max_entries=data_access.MAX_ENTRIES)
+def cached_files_table(_df_all: pd.DataFrame, owner: str, repo: str, data_version: int, days: int,
+                       states: tuple) -> pd.DataFrame:
+    """build_files_table のメモ化版（キーは data_access と同じ）"""
+    return build_files_table(_df_all)
+
+
 def dir_key(path: str, depth: int) -> str:
     parts = (path or "").split("/")
     if depth <= 0:
@@ -351,33 +336,11 @@ def directory_explorer_v2(
     return "", "dir"
 
 
-def infer_blocker(row: pd.Series, stale_hours: int = 168) -> str | None:
-    if row["state"] != "OPEN":
-        return None
-    if row.get("isDraft"):
-        return "Draft"
-    if row.get("reviewDecision") == "CHANGES_REQUESTED" or row.get("changes_requested", 0) > 0:
-        return "Changes requested"
-    checks = (row.get("checks_state") or "").upper()
-    if checks in ("FAILURE", "FAILED"):
-        return "Checks failing"
-    if checks in ("PENDING", "EXPECTED"):
-        return "Checks pending"
-    if row.get("mergeable") == "CONFLICTING" or row.get("mergeStateStatus") in ("DIRTY", "BEHIND", "BLOCKED"):
-        return "Merge conflict"
-    if row.get("reviewDecision") == "REVIEW_REQUIRED":
-        if row.get("requested_reviewers", 0) > 0:
-            return "Waiting for review"
-        return "No reviewer"
-    age = float(row.get("age_hours") or 0.0)
-    if row.get("mergeable") == "MERGEABLE" or row.get("mergeStateStatus") in ("CLEAN", "UNSTABLE", "HAS_HOOKS"):
-        return "Ready to merge" if age < stale_hours else "Stale"
-    return "Stale" if age >= stale_hours else "Unknown"
-
-
-def compute_and_cache_stats(owner: str, repo: str, raw_df: pd.DataFrame, filtered_df: pd.DataFrame, files_df_all: pd.DataFrame = None) -> None:
+def compute_and_cache_stats(owner: str, repo: str, raw_df: pd.DataFrame, filtered_df: pd.DataFrame,
+                            files_df_all: pd.DataFrame, data_version: int, params: dict) -> None:
     """
     統計情報を事前計算してDBに保存（ファイルツリー含む）
+    data_version: raw_df を読む前に取得したデータ版, params: raw_df / filtered_df の絞り込み条件
     """
     stats = {}
     
@@ -390,31 +353,21 @@ def compute_and_cache_stats(owner: str, repo: str, raw_df: pd.DataFrame, filtere
         'latest_created': raw_df["createdAt_dt"].max().isoformat() if not raw_df.empty else None,
     }
     
+    # 経過時間は表示時刻で変わるのでキャッシュせず、OPEN の作成日時の中央値を保存する
+    # （OPEN の経過時間 = 現在時刻 - 作成日時 なので、中央値も 現在時刻 - 作成日時の中央値）
     open_only = filtered_df[filtered_df["state"] == "OPEN"]
     if not open_only.empty:
-        stats['summary']['median_open_age'] = float(open_only["age_hours"].median())
-    else:
-        stats['summary']['median_open_age'] = 0.0
-    
-    # 滞留バケット集計
-    if not open_only.empty:
-        bucket_counts = (
-            open_only.groupby("age_bucket", observed=True)
-            .size()
-            .reset_index(name="count")
-        )
-        bucket_counts["age_bucket"] = bucket_counts["age_bucket"].astype(str)
-        stats['buckets'] = bucket_counts.to_dict('records')
+        stats['summary']['median_open_created'] = open_only["createdAt_dt"].median().isoformat()
     
     # DBに保存
-    db_cache.save_aggregated_stats(owner, repo, 'summary', stats)
+    db_cache.save_aggregated_stats(owner, repo, 'summary', stats, data_version, params)
     
     # ファイルツリーとディレクトリ統計をキャッシュ
     if files_df_all is not None and not files_df_all.empty:
         # ファイルパス一覧とツリー構造
         all_paths = sorted(set(files_df_all["files"].dropna().astype(str)))
         path_tree = build_path_tree(all_paths)
-        db_cache.save_file_tree(owner, repo, all_paths, path_tree)
+        db_cache.save_file_tree(owner, repo, all_paths, path_tree, data_version, params)
         
         # ディレクトリ統計
         files_df_copy = files_df_all.copy()
@@ -431,72 +384,68 @@ def compute_and_cache_stats(owner: str, repo: str, raw_df: pd.DataFrame, filtere
             )
             .reset_index()
         )
-        db_cache.save_dir_stats(owner, repo, dir_agg)
+        db_cache.save_dir_stats(owner, repo, dir_agg, data_version, params)
+
 
+# このページで使うPRのキー（thread_details などの大きいフィールドは読み込まない）
+PR_COLUMNS = [
+    "number", "title", "url", "state", "isDraft", "author", "createdAt", "closedAt", "mergedAt",
+    "reviewDecision", "mergeable", "mergeStateStatus", "checks_state",
+    "requested_reviewers", "requested_reviewers_list", "review_details", "unresolved_threads",
+    "changes_requested", "comments_count", "files",
+]
 
-def load_local_prs(owner: str, repo: str, cutoff_dt) -> tuple:
+
+def load_local_prs(owner: str, repo: str, days: int) -> tuple:
     """
     ローカルDBからPRデータを読み込み（GitHub API呼び出しなし）
+    data_access でデータ版ごとにメモ化し、列指向スナップショットがあればそれを使う
+    Returns: (DataFrame, ソース, データ版)
     """
-    cached_data = db_cache.load_prs(owner, repo)
-    
-    if not cached_data:
-        return [], "No cache (run: python fetch_data.py)"
+    # 派生キャッシュのキー（読み込み中に更新されても古い版として扱われるよう、読み込み前に取得）
+    data_version = data_access.get_data_version(owner, repo)
+    frame = data_access.load_pr_frame(owner, repo, data_version, days=days, columns=tuple(PR_COLUMNS))
     
-    # 期間フィルタ
-    if cutoff_dt:
-        cutoff_iso = cutoff_dt.isoformat()
-        cached_data = [
-            pr for pr in cached_data 
-            if pr.get("createdAt", "") >= cutoff_iso
-        ]
+    if frame.empty and not db_cache.get_cache_info(owner, repo):
+        return frame, "No cache (run: python fetch_data.py)", data_version
     
-    return cached_data, "Local cache"
+    return frame, "Local cache", data_version
 
 
-def fetch_and_cache_prs(owner: str, repo: str, cutoff_dt, force_refresh: bool = False):
+def fetch_and_cache_prs(owner: str, repo: str, days: int, force_refresh: bool = False):
     """
     PRデータを取得（強制更新時のみGitHub APIを呼び出す）
     通常はローカルキャッシュから読み込み
+    Returns: (DataFrame, ソース, データ版)
     """
     # 通常はローカルキャッシュから読み込み
     if not force_refresh:
-        return load_local_prs(owner, repo, cutoff_dt)
+        return load_local_prs(owner, repo, days)
     
     # 強制更新の場合のみGitHub APIを呼び出す
-    etag_info = db_cache.get_etag(owner, repo)
-    
     try:
-        etag = etag_info["etag"] if etag_info else None
-        last_modified = etag_info["last_modified"] if etag_info else None
-        
-        pr_list, new_etag, new_last_modified, is_modified = run_query(
+        pr_list, is_modified = run_query(
             owner, repo, 
-            cutoff_dt=cutoff_dt,
-            etag=etag,
-            last_modified=last_modified
+            cutoff_dt=data_access.cutoff_for(days)
         )
         
-        # ETag情報を保存
-        if new_etag or new_last_modified:
-            db_cache.save_etag(owner, repo, new_etag, new_last_modified)
-        
         if is_modified and pr_list:
-            # 変更あり → DBに保存
+            # 変更あり → DBに保存し、保存後のDBから読み直す（データ版が進むのでメモ化は使われない）
             db_cache.save_prs(owner, repo, pr_list)
-            return pr_list, "API (updated)"
+            frame, _, data_version = load_local_prs(owner, repo, days)
+            return frame, "API (updated)", data_version
         elif not is_modified:
             # 変更なし → DBから読み込み
-            return load_local_prs(owner, repo, cutoff_dt)
+            return load_local_prs(owner, repo, days)
         else:
             # 空の場合もDBから
-            return load_local_prs(owner, repo, cutoff_dt)
+            return load_local_prs(owner, repo, days)
             
     except Exception as e:
         # API失敗時はキャッシュにフォールバック
-        cached_data, source = load_local_prs(owner, repo, cutoff_dt)
-        if cached_data:
-            return cached_data, f"Cache (API error: {str(e)[:50]})"
+        cached_data, source, data_version = load_local_prs(owner, repo, days)
+        if len(cached_data):
+            return cached_data, f"Cache (API error: {str(e)[:50]})", data_version
         raise
 
 
@@ -593,7 +542,6 @@ with st.sidebar:
     owner_tmp, repo_tmp = parse_owner_repo(owner_input_final, repo_input_final)
     if owner_tmp and repo_tmp:
         cache_info = db_cache.get_cache_info(owner_tmp, repo_tmp)
-        etag_info = db_cache.get_etag(owner_tmp, repo_tmp)
         
         with st.expander("キャッシュ情報", expanded=False):
             if cache_info:
@@ -603,11 +551,6 @@ with st.sidebar:
                 st.metric("PR数", cache_info['count'])
                 st.caption(f"最終取得: {age_hours:.1f}時間前")
                 
-                if etag_info:
-                    checked = datetime.fromisoformat(etag_info["checked_at"])
-                    check_age_min = (datetime.now(timezone.utc) - checked).total_seconds() / 60
-                    st.caption(f"最終確認: {check_age_min:.0f}分前")
-                
                 # 定期更新の案内
                 if age_hours > 24:
                     st.warning("データが24時間以上古いです")
@@ -647,11 +590,9 @@ t0 = time.perf_counter()
 set_progress(5, "入力を確認中")
 status_ph.info("PR データを読み込み中...")
 
-cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
-
 try:
     force_refresh = st.session_state.refresh_count > 0
-    data, source = fetch_and_cache_prs(owner, repo, cutoff_dt, force_refresh=force_refresh)
+    data, source, data_version = fetch_and_cache_prs(owner, repo, days, force_refresh=force_refresh)
     
     # refresh_countをリセット（次回は通常モード）
     if force_refresh and st.session_state.refresh_count > 0:
@@ -673,22 +614,16 @@ except Exception as exc:  # pragma: no cover
 
 set_progress(35, "データを整理中")
 
-if not data:
+if len(data) == 0:
     status_ph.warning("対象期間に PR が見つからなかったよ。期間やリポジトリを調整してみて！")
     set_progress(100, "完了")
     progress.empty()
     progress_txt.empty()
     st.stop()
 
-raw_df = pd.DataFrame(data)
-raw_df["createdAt_dt"] = pd.to_datetime(raw_df["createdAt"], format="ISO8601", utc=True)
-raw_df["closedAt_dt"] = pd.to_datetime(raw_df["closedAt"], format="ISO8601", utc=True, errors="coerce")
-raw_df["mergedAt_dt"] = pd.to_datetime(raw_df["mergedAt"], format="ISO8601", utc=True, errors="coerce")
-raw_df["age_hours"] = pd.to_numeric(raw_df["age_hours"], errors="coerce").fillna(0.0)
-
-bins = [0, 24, 72, 168, 336, 672, 999999]
-labels = ["<1d", "1-3d", "3-7d", "7-14d", "14-28d", ">=28d"]
-raw_df["age_bucket"] = pd.cut(raw_df["age_hours"], bins=bins, labels=labels, right=False)
+# 日時列などの派生列は data_access で計算済み。経過時間はこの実行の時刻から求める
+now_utc = datetime.now(timezone.utc)
+raw_df = derived.add_age_columns(data, now_utc)
 
 if not state_filter:
     status_ph.warning("ステータスが一つも選ばれてないから、全ステータスを対象にするね。")
@@ -701,18 +636,19 @@ filtered_df.reset_index(drop=True, inplace=True)
 set_progress(55, "メトリクスを計算中")
 
 # ファイルテーブルを先に構築（キャッシュ用）
-files_df_all = build_files_table(filtered_df)
+files_df_all = cached_files_table(filtered_df, owner, repo, data_version, days, tuple(state_filter))
 
-# 統計情報を計算してDBにキャッシュ（API取得時のみ、ファイル情報含む）
-if source == "API" or source.startswith("API"):
-    compute_and_cache_stats(owner, repo, raw_df, filtered_df, files_df_all)
+# キャッシュされた統計を読み込み（データ版と期間・ステータスが一致する場合のみ）
+stats_params = {"days": days, "states": state_filter}
+cached_stats = db_cache.load_aggregated_stats(owner, repo, 'summary', params=stats_params, data_version=data_version)
+if cached_stats is None:
+    # データが変わったか初めての条件なので計算してDBにキャッシュ（ファイル情報含む）
+    compute_and_cache_stats(owner, repo, raw_df, filtered_df, files_df_all, data_version, stats_params)
 
 open_only = filtered_df[filtered_df["state"] == "OPEN"].copy()
 uniq_all = filtered_df.copy()
 uniq = filtered_df.copy()
 
-# キャッシュされた統計を読み込み（1時間有効）
-cached_stats = db_cache.load_aggregated_stats(owner, repo, 'summary', max_age_minutes=60)
 if cached_stats and 'summary' in cached_stats:
     summary = cached_stats['summary']
     latest_created_iso = summary.get('latest_created')
@@ -723,7 +659,11 @@ if cached_stats and 'summary' in cached_stats:
     open_count = summary.get('open_count', 0)
     closed_count = summary.get('closed_count', 0)
     merged_count = summary.get('merged_count', 0)
-    median_open_age = summary.get('median_open_age', 0.0)
+    median_open_created = summary.get('median_open_created')
+    if median_open_created:
+        median_open_age = (now_utc - pd.Timestamp(median_open_created)).total_seconds() / 3600
+    else:
+        median_open_age = open_only["age_hours"].median() if not open_only.empty else 0
 else:
     # フォールバック: リアルタイム計算
     latest_created = raw_df["createdAt_dt"].max().tz_convert(JST)
@@ -738,7 +678,7 @@ with st.container():
         f"### {owner}/{repo}"
     )
     st.caption(f"最新PR作成: {latest_created.strftime('%Y-%m-%d %H:%M')} JST | "
-               f"キャッシュ有効期限: 24時間 | "
+               f"データ版: {data_version} | "
                f"表示時刻: {now_jst.strftime('%Y-%m-%d %H:%M')} JST")
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("総PR件数 (フィルタ後)", len(uniq))
@@ -813,7 +753,10 @@ with tab1:
         st.info("該当するPRがありません")
     else:
         # compact=True でPR番号のみ表示
-        tl_df = build_pr_timeline_df(src, compact=True)
+        tl_df = add_timeline_times(cached_timeline_base(src, owner, repo, data_version, days,
+                                                        tuple(src["number"].tolist()), tuple(src.index.tolist()),
+                                                        compact=True),
+                                   src, now_utc)
 
         # PR番号とURLのマッピングを作成
         pr_number_to_url = dict(zip(tl_df["Task"], tl_df["url"]))
@@ -945,13 +888,13 @@ with tab2:
     st.markdown("### ファイル変更")
 
     # キャッシュからファイルツリーとディレクトリ統計を読み込み
-    cached_tree = db_cache.load_file_tree(owner, repo, max_age_hours=24)
-    cached_dir_stats = db_cache.load_dir_stats(owner, repo, max_age_hours=24)
+    cached_tree = db_cache.load_file_tree(owner, repo, params=stats_params, data_version=data_version)
+    cached_dir_stats = db_cache.load_dir_stats(owner, repo, params=stats_params, data_version=data_version)
     
     # キャッシュがない場合はリアルタイム計算
     if cached_tree is None or cached_dir_stats is None:
         set_progress(72, "ファイルツリーを構築中（初回のみ）")
-        files_df_all = build_files_table(filtered_df)
+        files_df_all = cached_files_table(filtered_df, owner, repo, data_version, days, tuple(state_filter))
         
         if files_df_all.empty:
             st.info("ファイル変更情報がありません")
@@ -981,7 +924,7 @@ with tab2:
         dir_agg = cached_dir_stats
         
         # files_df_allを復元（詳細表示用）
-        files_df_all = build_files_table(filtered_df)
+        files_df_all = cached_files_table(filtered_df, owner, repo, data_version, days, tuple(state_filter))
         if not files_df_all.empty:
             files_df_all = files_df_all.copy()
             files_df_all["files"] = files_df_all["files"].astype(str)
@@ -1043,7 +986,11 @@ with tab2:
                     key="file_timeline_sort"
                 )
                 
-                gantt_df = build_pr_timeline_df(gantt_src, compact=True)
+                gantt_df = add_timeline_times(
+                    cached_timeline_base(gantt_src, owner, repo, data_version, days,
+                                         tuple(gantt_src["number"].tolist()), tuple(gantt_src.index.tolist()),
+                                         compact=True),
+                    gantt_src, now_utc)
 
                 # ソート順を適用
                 if file_sort_mode == "開始が新しい順":
@@ -1212,32 +1159,33 @@ with tab3:
         st.info("OPEN PR がありません")
     else:
         # 人ごとのアクションリストを作成
-        user_actions = action_tracker.build_action_summary(open_prs.to_dict('records'))
+        summary = action_tracker.action_summary_frame(open_prs)
         
-        if not user_actions:
+        if summary.empty:
             st.info("アクションが必要なPRはありません")
         else:
-            st.caption(f"📋 {len(user_actions)}人に対応が必要なアクションがあります")
+            action_counts = summary.groupby(level="user", sort=False).size()
+            st.caption(f"📋 {len(action_counts)}人に対応が必要なアクションがあります")
             
-            # 人ごとに表示
-            for user, actions in sorted(user_actions.items(), key=lambda x: len(x[1]), reverse=True):
-                action_count = len(actions)
+            # 人ごとに表示（件数の多い順）
+            for user, action_count in action_counts.sort_values(ascending=False, kind="stable").items():
+                actions = summary.xs(user, level="user", drop_level=False)
+                age_hours = actions["age_hours"].fillna(0)
                 
                 # 滞留チェック（168時間 = 7日以上待ちの場合）
-                stale_count = sum(1 for a in actions if a["pr"].get("age_hours", 0) > 168)
+                stale_count = int((age_hours > 168).sum())
                 stale_mark = " 滞留あり" if stale_count > 0 else ""
                 
                 with st.expander(f"👤 **{user}** ({action_count}件){stale_mark}", expanded=False):
-                    for action in sorted(actions, key=lambda x: x["pr"].get("age_hours", 0), reverse=True):
-                        pr = action["pr"]
-                        action_info = action["action_info"]
+                    for position in np.argsort(-age_hours.to_numpy(), kind="stable"):
+                        action = actions.iloc[position]
                         role = action["role"]
                         
-                        age_days = pr.get("age_hours", 0) / 24
-                        pr_number = pr.get("number")
-                        pr_title = pr.get("title", "")
-                        pr_url = pr.get("url", "")
-                        author = pr.get("author", "")
+                        age_days = age_hours.iloc[position] / 24
+                        pr_number = actions.index[position][1]
+                        pr_title = action.get("title", "")
+                        pr_url = action.get("url", "")
+                        author = action.get("author", "")
                         
                         # 経過日数でマーク
                         age_mark = ""
@@ -1255,7 +1203,7 @@ with tab3:
                         with col_pr_info:
                             st.markdown(f"""
 **[#{pr_number}]({pr_url})** {pr_title[:60]}{'...' if len(pr_title) > 60 else ''}{age_mark}
-- 役割: {role_badge} | 理由: {action_info['reason']} | 経過: {age_days:.1f}日
+- 役割: {role_badge} | 理由: {action['reason']} | 経過: {age_days:.1f}日
 - 作成者: {author}
                             """)
                         with col_pr_btn:
@@ -1,7 +1,7 @@
 # analytics.py - GitHub PR Analytics Dashboard (Streamlit)
 import re
 import time
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from typing import Tuple
 
 import pandas as pd
@@ -11,10 +11,14 @@ import streamlit as st
 from zoneinfo import ZoneInfo
 
 import action_tracker
+import blocker
+from business_hours import business_hours, business_days, default_calendar
+import derived
 
 import config
 from fetcher import run_query
 import db_cache
+import data_access  # メモ化したデータ読み込み・集計
 
 
 def add_click_to_pr_handler(fig, df, number_col="number", owner="MitsubishiElectric-InnerSource", repo="MMNGA"):
@@ -133,55 +137,6 @@ else:
 JST = ZoneInfo("Asia/Tokyo")
 
 
-def calculate_business_hours(start_dt: datetime, end_dt: datetime) -> float:
-    """
-    営業日（平日のみ）で経過時間を計算する
-    土日を除外し、営業時間のみをカウント
-    
-    Args:
-        start_dt: 開始日時
-        end_dt: 終了日時
-    
-    Returns:
-        営業日ベースの経過時間（時間単位）
-    """
-    if pd.isna(start_dt) or pd.isna(end_dt):
-        return 0.0
-    
-    # datetimeに変換
-    if isinstance(start_dt, str):
-        start_dt = pd.to_datetime(start_dt, format="ISO8601", utc=True)
-    if isinstance(end_dt, str):
-        end_dt = pd.to_datetime(end_dt, format="ISO8601", utc=True)
-    
-    # 同じ日の場合は単純な差分
-    if start_dt.date() == end_dt.date():
-        # 土日なら0を返す
-        if start_dt.weekday() >= 5:
-            return 0.0
-        return (end_dt - start_dt).total_seconds() / 3600
-    
-    # 日をまたぐ場合は日ごとに計算
-    current = start_dt
-    total_hours = 0.0
-    
-    while current.date() < end_dt.date():
-        # 平日のみカウント（月曜=0, 日曜=6）
-        if current.weekday() < 5:
-            # その日の残り時間（翌日0時まで）
-            next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-            total_hours += (next_day - current).total_seconds() / 3600
-        
-        # 次の日へ
-        current = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-    
-    # 最終日の時間を追加
-    if end_dt.weekday() < 5:
-        total_hours += (end_dt - current).total_seconds() / 3600
-    
-    return total_hours
-
-
 def parse_owner_repo(owner_in: str, repo_in: str) -> Tuple[str, str]:
     """Normalize owner/repo strings even if URLs are provided."""
 
@@ -197,85 +152,57 @@ def parse_owner_repo(owner_in: str, repo_in: str) -> Tuple[str, str]:
     return (owner_in or "").strip().strip("/"), (repo_in or "").strip().strip("/")
 
 
-def infer_blocker(row: pd.Series, stale_hours: int = 168) -> str | None:
-    if row["state"] != "OPEN":
-        return None
-    if row.get("isDraft"):
-        return "Draft"
-    if row.get("reviewDecision") == "CHANGES_REQUESTED" or row.get("changes_requested", 0) > 0:
-        return "Changes requested"
-    checks = (row.get("checks_state") or "").upper()
-    if checks in ("FAILURE", "FAILED"):
-        return "Checks failing"
-    if checks in ("PENDING", "EXPECTED"):
-        return "Checks pending"
-    if row.get("mergeable") == "CONFLICTING" or row.get("mergeStateStatus") in ("DIRTY", "BEHIND", "BLOCKED"):
-        return "Merge conflict"
-    if row.get("reviewDecision") == "REVIEW_REQUIRED":
-        if row.get("requested_reviewers", 0) > 0:
-            return "Waiting for review"
-        return "No reviewer"
-    age = float(row.get("age_hours") or 0.0)
-    if row.get("mergeable") == "MERGEABLE" or row.get("mergeStateStatus") in ("CLEAN", "UNSTABLE", "HAS_HOOKS"):
-        return "Ready to merge" if age < stale_hours else "Stale"
-    return "Stale" if age >= stale_hours else "Unknown"
+# このページで使うPRのキー（thread_details などの大きいフィールドは読み込まない）
+PR_COLUMNS = [
+    "number", "title", "url", "state", "isDraft", "author", "createdAt", "closedAt", "mergedAt",
+    "reviewDecision", "mergeable", "mergeStateStatus", "checks_state",
+    "requested_reviewers", "requested_reviewers_list", "review_details", "unresolved_threads",
+    "changes_requested", "comments_count", "additions", "deletions", "reviews_count",
+]
 
 
-def load_local_prs(owner: str, repo: str, cutoff_dt) -> tuple:
+def load_local_prs(owner: str, repo: str, days: int) -> tuple:
     """
     ローカルDBからPRデータを読み込み（GitHub API呼び出しなし）
+    data_access でデータ版ごとにメモ化し、列指向スナップショットがあればそれを使う
+    Returns: (DataFrame, ソース, データ版)
     """
-    cached_data = db_cache.load_prs(owner, repo)
+    data_version = data_access.get_data_version(owner, repo)
+    frame = data_access.load_pr_frame(owner, repo, data_version, days=days, columns=tuple(PR_COLUMNS))
     
-    if not cached_data:
-        return [], "No cache (run: python fetch_data.py)"
+    if frame.empty and not db_cache.get_cache_info(owner, repo):
+        return frame, "No cache (run: python fetch_data.py)", data_version
     
-    # 期間フィルタ
-    if cutoff_dt:
-        cutoff_iso = cutoff_dt.isoformat()
-        cached_data = [
-            pr for pr in cached_data 
-            if pr.get("createdAt", "") >= cutoff_iso
-        ]
-    
-    return cached_data, "Local cache"
+    return frame, "Local cache", data_version
 
 
-def fetch_and_cache_prs(owner: str, repo: str, cutoff_dt, force_refresh: bool = False):
+def fetch_and_cache_prs(owner: str, repo: str, days: int, force_refresh: bool = False):
     """PRデータを取得（強制更新時のみGitHub APIを呼び出す）"""
     # 通常はローカルキャッシュから読み込み
     if not force_refresh:
-        return load_local_prs(owner, repo, cutoff_dt)
+        return load_local_prs(owner, repo, days)
     
     # 強制更新の場合のみGitHub APIを呼び出す
-    etag_info = db_cache.get_etag(owner, repo)
-    
     try:
-        etag = etag_info["etag"] if etag_info else None
-        last_modified = etag_info["last_modified"] if etag_info else None
-        
-        pr_list, new_etag, new_last_modified, is_modified = run_query(
+        pr_list, is_modified = run_query(
             owner, repo,
-            cutoff_dt=cutoff_dt,
-            etag=etag,
-            last_modified=last_modified
+            cutoff_dt=data_access.cutoff_for(days)
         )
         
-        if new_etag or new_last_modified:
-            db_cache.save_etag(owner, repo, new_etag, new_last_modified)
-        
         if is_modified and pr_list:
+            # 保存後のDBから読み直す（データ版が進むのでメモ化は使われない）
             db_cache.save_prs(owner, repo, pr_list)
-            return pr_list, "API (updated)"
+            frame, _, data_version = load_local_prs(owner, repo, days)
+            return frame, "API (updated)", data_version
         elif not is_modified:
-            return load_local_prs(owner, repo, cutoff_dt)
+            return load_local_prs(owner, repo, days)
         else:
-            return load_local_prs(owner, repo, cutoff_dt)
+            return load_local_prs(owner, repo, days)
             
     except Exception as e:
-        cached_data, source = load_local_prs(owner, repo, cutoff_dt)
-        if cached_data:
-            return cached_data, f"Cache (API error: {str(e)[:50]})"
+        cached_data, source, data_version = load_local_prs(owner, repo, days)
+        if len(cached_data):
+            return cached_data, f"Cache (API error: {str(e)[:50]})", data_version
         raise
 
 
@@ -362,7 +289,6 @@ with st.sidebar:
     owner_tmp, repo_tmp = parse_owner_repo(owner_input_final, repo_input_final)
     if owner_tmp and repo_tmp:
         cache_info = db_cache.get_cache_info(owner_tmp, repo_tmp)
-        etag_info = db_cache.get_etag(owner_tmp, repo_tmp)
         
         with st.expander("キャッシュ情報", expanded=False):
             if cache_info:
@@ -372,11 +298,6 @@ with st.sidebar:
                 st.metric("PR数", cache_info['count'])
                 st.caption(f"最終取得: {age_hours:.1f}時間前")
                 
-                if etag_info:
-                    checked = datetime.fromisoformat(etag_info["checked_at"])
-                    check_age_min = (datetime.now(timezone.utc) - checked).total_seconds() / 60
-                    st.caption(f"最終確認: {check_age_min:.0f}分前")
-                
                 if age_hours > 24:
                     st.warning("データが24時間以上古いです")
                     st.caption("💡 `python fetch_data.py` で更新")
@@ -419,11 +340,9 @@ t0 = time.perf_counter()
 set_progress(5, "データ読み込み中")
 status_ph.info("PR データを読み込み中...")
 
-cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
-
 try:
     force_refresh = st.session_state.refresh_count > 0
-    data, source = fetch_and_cache_prs(owner, repo, cutoff_dt, force_refresh=force_refresh)
+    data, source, data_version = fetch_and_cache_prs(owner, repo, days, force_refresh=force_refresh)
     
     # refresh_countをリセット
     if force_refresh and st.session_state.refresh_count > 0:
@@ -445,35 +364,16 @@ except Exception as exc:
 
 set_progress(35, "データを整理中")
 
-if not data:
+if len(data) == 0:
     status_ph.warning("対象期間に PR が見つからなかったよ。期間やリポジトリを調整してみて！")
     set_progress(100, "完了")
     progress.empty()
     progress_txt.empty()
     st.stop()
 
-raw_df = pd.DataFrame(data)
-raw_df["createdAt_dt"] = pd.to_datetime(raw_df["createdAt"], format="ISO8601", utc=True)
-raw_df["closedAt_dt"] = pd.to_datetime(raw_df["closedAt"], format="ISO8601", utc=True, errors="coerce")
-raw_df["mergedAt_dt"] = pd.to_datetime(raw_df["mergedAt"], format="ISO8601", utc=True, errors="coerce")
-raw_df["age_hours"] = pd.to_numeric(raw_df["age_hours"], errors="coerce").fillna(0.0)
-
-# 営業日ベースの経過時間を計算
+# 日時列などの派生列は data_access で計算済み。経過時間はこの実行の時刻から求める
 now_utc = datetime.now(timezone.utc)
-raw_df["end_dt"] = raw_df.apply(
-    lambda row: row["mergedAt_dt"] if pd.notna(row["mergedAt_dt"]) 
-    else (row["closedAt_dt"] if pd.notna(row["closedAt_dt"]) else now_utc),
-    axis=1
-)
-raw_df["business_hours"] = raw_df.apply(
-    lambda row: calculate_business_hours(row["createdAt_dt"], row["end_dt"]),
-    axis=1
-)
-raw_df["business_days"] = (raw_df["business_hours"] / 24).round(1)
-
-bins = [0, 24, 72, 168, 336, 672, 999999]
-labels = ["<1d", "1-3d", "3-7d", "7-14d", "14-28d", ">=28d"]
-raw_df["age_bucket"] = pd.cut(raw_df["age_hours"], bins=bins, labels=labels, right=False)
+raw_df = derived.add_age_columns(data, now_utc)
 
 if not state_filter:
     status_ph.warning("ステータスが一つも選ばれてないから、全ステータスを対象にするね。")
@@ -612,9 +512,7 @@ with tab2:
         st.info("OPEN PR なし")
     else:
         open_only_copy = open_only.copy()
-        open_only_copy["blocker"] = open_only_copy.apply(
-            lambda row: infer_blocker(row, stale_hours=stale_hours), axis=1
-        )
+        open_only_copy["blocker"] = blocker.classify_blockers(open_only_copy, stale_hours=stale_hours)
         
         col_left, col_right = st.columns([1, 1])
         
@@ -701,59 +599,31 @@ with tab3:
     st.markdown("### � レビュワー分析")
     st.caption("誰がレビューしているか、誰がレビューしていないかを可視化")
     
-    # レビュー詳細情報を展開
-    reviewer_activities = []
-    
-    for idx, row in filtered_df.iterrows():
-        review_details = row.get("review_details", [])
-        if isinstance(review_details, list):
-            for review in review_details:
-                reviewer = review.get("author")
-                review_created_at = review.get("createdAt")
-                if reviewer:
-                    reviewer_activities.append({
-                        "PR#": row["number"],
-                        "タイトル": row["title"],
-                        "作成者": row["author"],
-                        "レビュワー": reviewer,
-                        "レビュー状態": review.get("state"),
-                        "レビュー日時": review_created_at,
-                        "レビュー日時_dt": pd.to_datetime(review_created_at, format="ISO8601", utc=True) if review_created_at else None,
-                        "PR状態": row["state"],
-                        "未解決スレッド": row.get("unresolved_threads", 0),
-                        "コメント数": row.get("comments_count", 0),
-                        "URL": row["url"]
-                    })
+    # レビュー詳細情報（正規化テーブルから1レビュー1行で取得）
+    reviewer_df = data_access.load_reviews_frame(owner, repo, data_version, days=days, states=tuple(state_filter))
+    reviewer_df = reviewer_df[reviewer_df["reviewer"].fillna("") != ""].rename(columns={
+        "number": "PR#",
+        "title": "タイトル",
+        "author": "作成者",
+        "reviewer": "レビュワー",
+        "review_state": "レビュー状態",
+        "reviewedAt": "レビュー日時",
+        "reviewedAt_dt": "レビュー日時_dt",
+        "state": "PR状態",
+        "unresolved_threads": "未解決スレッド",
+        "comments_count": "コメント数",
+        "url": "URL",
+    })
     
-    if reviewer_activities:
-        reviewer_df = pd.DataFrame(reviewer_activities)
-        
-        # レビュワー別統計
+    if not reviewer_df.empty:
+        # レビュワー別統計（SQLで集計）
         st.markdown("#### レビュワー別アクティビティ")
         
-        reviewer_stats = (
-            reviewer_df.groupby("レビュワー")
-            .agg({
-                "PR#": "nunique",  # ユニークなPR数
-                "レビュー状態": "count",  # 総レビュー数
-            })
-            .reset_index()
-            .rename(columns={
-                "PR#": "レビューしたPR数",
-                "レビュー状態": "総レビュー回数"
-            })
-        )
-        
-        # レビュー状態別のカウント
-        review_state_counts = (
-            reviewer_df.groupby(["レビュワー", "レビュー状態"])
-            .size()
-            .unstack(fill_value=0)
-            .reset_index()
-        )
-        
-        # マージ
-        reviewer_stats = reviewer_stats.merge(review_state_counts, on="レビュワー", how="left")
+        reviewer_stats = data_access.reviewer_stats(owner, repo, data_version, days=days, states=tuple(state_filter)).rename(columns={
+            "reviewer": "レビュワー",
+            "prs_reviewed": "レビューしたPR数",
+            "total_reviews": "総レビュー回数",
+        })
         
         # 承認率を計算
         if "APPROVED" in reviewer_stats.columns:
@@ -763,8 +633,6 @@ with tab3:
         else:
             reviewer_stats["承認率(%)"] = 0.0
         
-        reviewer_stats = reviewer_stats.sort_values("レビューしたPR数", ascending=False)
-        
         col_left, col_right = st.columns([1, 1])
         
         with col_left:
@@ -887,16 +755,11 @@ with tab3:
         ].copy()
         
         if not unresolved_reviews.empty:
-            # 現在時刻
-            now_utc = datetime.now(timezone.utc)
-            
             # レビューからの経過時間を計算 (営業日)
             unresolved_reviews["未応答時間(h)"] = unresolved_reviews["レビュー日時_dt"].apply(
                 lambda dt: (now_utc - dt).total_seconds() / 3600 if pd.notna(dt) else 0
             )
-            unresolved_reviews["未応答営業日"] = unresolved_reviews["レビュー日時_dt"].apply(
-                lambda dt: calculate_business_hours(dt, now_utc) / 24 if pd.notna(dt) else 0
-            )
+            unresolved_reviews["未応答営業日"] = business_days(unresolved_reviews["レビュー日時_dt"], now_utc)
             
             # PR#ごとに最後のレビュー時刻でグループ化
             pr_unresolved = (
@@ -1005,55 +868,30 @@ with tab3:
         st.markdown("#### コメントスレッド詳細分析")
         st.caption("指摘→返信→解決の流れを可視化")
         
-        # レビュースレッド詳細情報を展開
-        thread_activities = []
-        
-        for idx, row in filtered_df.iterrows():
-            thread_details = row.get("thread_details", [])
-            if isinstance(thread_details, list):
-                for thread in thread_details:
-                    comments = thread.get("comments", [])
-                    if comments:
-                        # 最初のコメント作成者 (レビュー指摘者)
-                        first_comment = comments[0]
-                        first_author = first_comment.get("author")
-                        first_created_at = first_comment.get("createdAt")
-                        
-                        # 最後のコメント作成者と時刻
-                        last_comment = comments[-1]
-                        last_author = last_comment.get("author")
-                        last_created_at = last_comment.get("createdAt")
-                        
-                        # 解決者
-                        resolved_by = thread.get("resolvedBy")
-                        is_resolved = thread.get("isResolved", False)
-                        
-                        # 未解決の場合、最初のコメント作成者が応答待ち
-                        if not is_resolved and row["state"] == "OPEN":
-                            waiting_for = first_author
-                        else:
-                            waiting_for = None
-                        
-                        thread_activities.append({
-                            "PR#": row["number"],
-                            "タイトル": row["title"],
-                            "作成者": row["author"],
-                            "指摘者": first_author,
-                            "指摘日時": first_created_at,
-                            "指摘日時_dt": pd.to_datetime(first_created_at, format="ISO8601", utc=True) if first_created_at else None,
-                            "最終返信者": last_author,
-                            "最終返信日時": last_created_at,
-                            "最終返信日時_dt": pd.to_datetime(last_created_at, format="ISO8601", utc=True) if last_created_at else None,
-                            "解決済み": is_resolved,
-                            "解決者": resolved_by,
-                            "応答待ち": waiting_for,
-                            "コメント数": len(comments),
-                            "PR状態": row["state"],
-                            "URL": row["url"]
-                        })
+        # レビュースレッド詳細情報（正規化テーブルから1スレッド1行で取得）
+        thread_df = data_access.load_thread_frame(owner, repo, data_version, days=days, states=tuple(state_filter))
         
-        if thread_activities:
-            thread_df = pd.DataFrame(thread_activities)
+        if not thread_df.empty:
+            # 未解決の場合、最初のコメント作成者が応答待ち
+            thread_df["応答待ち"] = thread_df["first_author"].where(
+                ~thread_df["isResolved"] & (thread_df["state"] == "OPEN")
+            )
+            thread_df = thread_df.rename(columns={
+                "number": "PR#",
+                "title": "タイトル",
+                "author": "作成者",
+                "first_author": "指摘者",
+                "firstCommentedAt": "指摘日時",
+                "firstCommentedAt_dt": "指摘日時_dt",
+                "last_author": "最終返信者",
+                "lastCommentedAt": "最終返信日時",
+                "lastCommentedAt_dt": "最終返信日時_dt",
+                "isResolved": "解決済み",
+                "resolvedBy": "解決者",
+                "comment_count": "コメント数",
+                "state": "PR状態",
+                "url": "URL",
+            })
             
             # OPENで未解決のスレッドを抽出
             open_unresolved = thread_df[
@@ -1062,13 +900,8 @@ with tab3:
             ].copy()
             
             if not open_unresolved.empty:
-                # 現在時刻
-                now_utc = datetime.now(timezone.utc)
-                
                 # 指摘からの経過時間を計算
-                open_unresolved["未解決日数"] = open_unresolved["指摘日時_dt"].apply(
-                    lambda dt: calculate_business_hours(dt, now_utc) / 24 if pd.notna(dt) else 0
-                )
+                open_unresolved["未解決日数"] = business_days(open_unresolved["指摘日時_dt"], now_utc)
                 
                 st.markdown("##### 解決待ちレビュワー (OPEN PRのみ)")
                 st.caption("指摘したが解決マークをつけていないレビュワー")
@@ -1168,15 +1001,8 @@ with tab3:
 with tab4:
     st.markdown("### 時系列トレンド分析")
     
-    # 週ごとの集計
-    df_timeline = filtered_df.copy()
-    df_timeline["week"] = df_timeline["createdAt_dt"].dt.to_period("W").astype(str)
-    
-    weekly_stats = (
-        df_timeline.groupby(["week", "state"], observed=True)
-        .size()
-        .reset_index(name="count")
-    )
+    # 週ごとの集計（集計エンジンでSQL集計）
+    weekly_stats = data_access.weekly_pr_counts(owner, repo, data_version, days=days, states=tuple(state_filter))
     
     st.markdown("#### 週次PR作成数")
     fig_weekly = px.line(
@@ -1199,15 +1025,8 @@ with tab4:
     
     # 累積PR数
     st.markdown("#### 累積PR数推移")
-    cumulative = (
-        df_timeline.groupby(["week", "state"], observed=True)
-        .size()
-        .groupby(level=1)
-        .cumsum()
-        .reset_index(name="cumulative")
-    )
-    cumulative["week"] = weekly_stats["week"]
-    cumulative["state"] = weekly_stats["state"]
+    cumulative = weekly_stats[["week", "state"]].copy()
+    cumulative["cumulative"] = weekly_stats.groupby("state")["count"].cumsum()
     
     fig_cumulative = px.line(
         cumulative,
@@ -1235,35 +1054,30 @@ with tab5:
         st.info("OPEN PR なし")
     else:
         # アクション集計
-        user_actions = action_tracker.build_action_summary(open_prs.to_dict('records'))
+        summary = action_tracker.action_summary_frame(open_prs)
         
-        if not user_actions:
+        if summary.empty:
             st.info("アクション待ちPRなし")
         else:
-            # レビュアー別の待ちPR数
-            reviewer_stats = []
-            reviewer_prs = {}  # レビュアーごとのPR情報を保存
+            def role_stats(role: str, user_col: str, count_col: str):
+                """役割ごとの行（人の初出順）と人ごとの集計"""
+                rows = summary[summary["role"] == role].reset_index()
+                age_hours = rows["age_hours"].fillna(0)
+                by_user = age_hours.groupby(rows["user"], sort=False)
+                stats = pd.DataFrame({
+                    user_col: by_user.size().index,
+                    count_col: by_user.size().to_numpy(),
+                    "平均待ち時間(日)": by_user.mean().to_numpy() / 24,
+                    "滞留PR数(>7日)": (age_hours > 168).groupby(rows["user"], sort=False).sum().to_numpy()
+                })
+                return rows, stats
             
-            for user, actions in user_actions.items():
-                reviewer_actions = [a for a in actions if a["role"] == "reviewer"]
-                if reviewer_actions:
-                    total_prs = len(reviewer_actions)
-                    avg_age = sum(a["pr"].get("age_hours", 0) for a in reviewer_actions) / total_prs
-                    stale_count = sum(1 for a in reviewer_actions if a["pr"].get("age_hours", 0) > 168)
-                    
-                    reviewer_stats.append({
-                        "レビュアー": user,
-                        "待ちPR数": total_prs,
-                        "平均待ち時間(日)": avg_age / 24,
-                        "滞留PR数(>7日)": stale_count
-                    })
-                    
-                    # PRリスト保存
-                    reviewer_prs[user] = [a["pr"] for a in reviewer_actions]
+            # レビュアー別の待ちPR数
+            reviewer_rows, reviewer_stats = role_stats("reviewer", "レビュアー", "待ちPR数")
             
-            if reviewer_stats:
+            if not reviewer_stats.empty:
                 st.markdown("#### レビュアー別 待ちPR数")
-                reviewer_df = pd.DataFrame(reviewer_stats).sort_values("待ちPR数", ascending=False)
+                reviewer_df = reviewer_stats.sort_values("待ちPR数", ascending=False)
                 
                 fig_reviewer = px.bar(
                     reviewer_df.head(20),
@@ -1308,16 +1122,10 @@ with tab5:
                 )
                 
                 if selected_reviewer == "すべて":
-                    all_reviewer_prs = []
-                    for user, prs in reviewer_prs.items():
-                        for pr in prs:
-                            pr_copy = pr.copy()
-                            pr_copy["reviewer"] = user
-                            all_reviewer_prs.append(pr_copy)
-                    display_prs = pd.DataFrame(all_reviewer_prs)
+                    display_prs = reviewer_rows.rename(columns={"user": "reviewer"})
                 else:
-                    display_prs = pd.DataFrame(reviewer_prs[selected_reviewer])
-                    display_prs["reviewer"] = selected_reviewer
+                    display_prs = reviewer_rows[reviewer_rows["user"] == selected_reviewer].reset_index(drop=True)
+                    display_prs = display_prs.rename(columns={"user": "reviewer"})
                 
                 if not display_prs.empty:
                     display_cols = ["number", "title", "author", "reviewer", "age_hours", "url"]
@@ -1342,28 +1150,10 @@ with tab5:
             st.markdown("---")
             st.markdown("#### ✍️ 作成者別 修正待ちPR数")
             
-            author_stats = []
-            author_prs = {}  # 作成者ごとのPR情報を保存
+            author_rows, author_stats = role_stats("author", "作成者", "修正待ちPR数")
             
-            for user, actions in user_actions.items():
-                author_actions = [a for a in actions if a["role"] == "author"]
-                if author_actions:
-                    total_prs = len(author_actions)
-                    avg_age = sum(a["pr"].get("age_hours", 0) for a in author_actions) / total_prs
-                    stale_count = sum(1 for a in author_actions if a["pr"].get("age_hours", 0) > 168)
-                    
-                    author_stats.append({
-                        "作成者": user,
-                        "修正待ちPR数": total_prs,
-                        "平均待ち時間(日)": avg_age / 24,
-                        "滞留PR数(>7日)": stale_count
-                    })
-                    
-                    # PRリスト保存
-                    author_prs[user] = [a["pr"] for a in author_actions]
-            
-            if author_stats:
-                author_df = pd.DataFrame(author_stats).sort_values("修正待ちPR数", ascending=False)
+            if not author_stats.empty:
+                author_df = author_stats.sort_values("修正待ちPR数", ascending=False)
                 
                 fig_author = px.bar(
                     author_df.head(20),
@@ -1408,13 +1198,9 @@ with tab5:
                 )
                 
                 if selected_author == "すべて":
-                    all_author_prs = []
-                    for user, prs in author_prs.items():
-                        for pr in prs:
-                            all_author_prs.append(pr)
-                    display_prs = pd.DataFrame(all_author_prs)
+                    display_prs = author_rows
                 else:
-                    display_prs = pd.DataFrame(author_prs[selected_author])
+                    display_prs = author_rows[author_rows["user"] == selected_author].reset_index(drop=True)
                 
                 if not display_prs.empty:
                     display_cols = ["number", "title", "author", "age_hours", "url"]
@@ -1442,8 +1228,10 @@ with tab6:
     else:
         # タイムラインイベントからレビュー時間を計算
         review_times = []
+        # マージまでの営業時間は列ごとにまとめて計算
+        merge_hours_all = business_hours(merged_prs["createdAt_dt"], merged_prs["mergedAt_dt"])
         
-        for idx, row in merged_prs.iterrows():
+        for (idx, row), merge_hours in zip(merged_prs.iterrows(), merge_hours_all):
             created = row["createdAt_dt"]
             merged = row["mergedAt_dt"]
             
@@ -1452,16 +1240,13 @@ with tab6:
             reviews_count = row.get("reviews_count", 0)
             
             if reviews_count > 0 or comments_count > 0:
-                # マージまでの時間を営業日で計算
-                merge_hours = calculate_business_hours(created, merged)
-                
                 review_times.append({
                     "PR#": row["number"],
                     "タイトル": row["title"],
                     "作成者": row["author"],
                     "作成日": created,
                     "マージ日": merged,
-                    "レビュー時間(営業日)": merge_hours / 24,
+                    "レビュー時間(営業日)": merge_hours / default_calendar().hours_per_day,
                     "コメント数": comments_count,
                     "レビュー数": reviews_count,
                     "URL": row["url"]
@@ -1565,42 +1350,15 @@ with tab7:
     st.markdown("### 変更パターン分析")
     st.caption("どのファイルが頻繁に変更されているかを分析")
     
-    # ファイル変更情報を収集
-    file_changes = []
+    # ファイル別変更頻度（正規化テーブルをSQLで集計）
+    file_freq = data_access.file_change_stats(owner, repo, data_version, days=days, states=tuple(state_filter), limit=30).rename(columns={
+        "path": "ファイル",
+        "change_count": "変更回数",
+        "total_lines": "変更総行数",
+    })
     
-    for idx, row in filtered_df.iterrows():
-        changed_files = row.get("changed_files", [])
-        additions = row.get("additions", 0)
-        deletions = row.get("deletions", 0)
-        
-        if isinstance(changed_files, list) and changed_files:
-            for file_path in changed_files:
-                file_changes.append({
-                    "PR#": row["number"],
-                    "ファイル": file_path,
-                    "作成者": row["author"],
-                    "追加行数": additions,
-                    "削除行数": deletions,
-                    "変更総行数": additions + deletions,
-                    "状態": row["state"]
-                })
-    
-    if file_changes:
-        files_df = pd.DataFrame(file_changes)
-        
-        # ファイル別変更頻度
+    if not file_freq.empty:
         st.markdown("#### 最も変更されるファイル TOP30")
-        file_freq = (
-            files_df.groupby("ファイル")
-            .agg({
-                "PR#": "count",
-                "変更総行数": "sum"
-            })
-            .reset_index()
-            .rename(columns={"PR#": "変更回数"})
-            .sort_values("変更回数", ascending=False)
-            .head(30)
-        )
         
         fig_files = px.bar(
             file_freq,
@@ -1636,18 +1394,9 @@ with tab7:
         # PR規模分析
         st.markdown("#### 📏 PR規模の分布")
         
-        pr_sizes = (
-            filtered_df.groupby("number")
-            .agg({
-                "additions": "first",
-                "deletions": "first",
-                "changed_files_count": "first",
-                "title": "first",
-                "author": "first",
-                "state": "first"
-            })
-            .reset_index()
-        )
+        pr_sizes = data_access.load_pr_table(owner, repo, data_version, days=days, states=tuple(state_filter))[
+            ["number", "additions", "deletions", "changedFiles", "title", "author", "state"]
+        ].rename(columns={"changedFiles": "changed_files_count"})
         pr_sizes["変更総行数"] = pr_sizes["additions"] + pr_sizes["deletions"]
         
         col_left, col_right = st.columns([1, 1])
@@ -3,11 +3,12 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from datetime import datetime, timedelta, timezone
 import numpy as np
 
 import config
 import db_cache
+import data_access
+import four_keys
 
 st.set_page_config(page_title="Four Keys", layout="wide", page_icon="🔑")
 
@@ -59,37 +60,6 @@ else:
     )
 
 
-def calculate_business_hours(start_dt: datetime, end_dt: datetime) -> float:
-    """営業日（平日のみ）で経過時間を計算（時間単位）"""
-    if pd.isna(start_dt) or pd.isna(end_dt):
-        return 0.0
-    
-    if isinstance(start_dt, str):
-        start_dt = pd.to_datetime(start_dt, format="ISO8601", utc=True)
-    if isinstance(end_dt, str):
-        end_dt = pd.to_datetime(end_dt, format="ISO8601", utc=True)
-    
-    if start_dt.date() == end_dt.date():
-        if start_dt.weekday() >= 5:
-            return 0.0
-        return (end_dt - start_dt).total_seconds() / 3600
-    
-    current = start_dt
-    total_hours = 0.0
-    
-    while current.date() < end_dt.date():
-        if current.weekday() < 5:
-            next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-            total_hours += (next_day - current).total_seconds() / 3600
-        current = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-    
-    if end_dt.weekday() < 5:
-        day_start = datetime.combine(end_dt.date(), datetime.min.time(), tzinfo=end_dt.tzinfo)
-        total_hours += (end_dt - day_start).total_seconds() / 3600
-    
-    return total_hours
-
-
 def classify_dora_level(value: float, metric: str) -> tuple:
     """DORA指標のレベル分類 (value, metric) -> (level, color)"""
     if metric == "deployment_frequency":  # 週あたりのデプロイ回数
@@ -146,6 +116,7 @@ st.info("""
 
 Four Keysメトリクスは以下の仮定に基づいて計算しています:
 
+- **対象期間**: 期間内に**マージされた**PR（マージ日・UTC の日単位で判定。作成日は問わない）
 - **Deployment Frequency**: MERGEDステータスのPRを「デプロイ」と見なす
 - **Lead Time for Changes**: PR作成からマージまでの時間で計算
 - **Change Failure Rate**: 
@@ -198,82 +169,49 @@ st.markdown("---")
 # データ取得
 owner_tmp = owner
 repo_tmp = repo
-cutoff_dt = datetime.now(timezone.utc) - timedelta(days=days)
+data_version = data_access.get_data_version(owner_tmp, repo_tmp)
 
-cached_data = db_cache.load_prs(owner_tmp, repo_tmp)
-
-if not cached_data:
+if not db_cache.get_cache_info(owner_tmp, repo_tmp):
     st.error("データがありません。`python fetch_data.py --all` を実行してください。")
     st.stop()
 
-# DataFrameに変換
-df_all = pd.DataFrame(cached_data)
-
-# 日時変換
-df_all["createdAt_dt"] = pd.to_datetime(df_all["createdAt"], format="ISO8601", utc=True)
-df_all["closedAt_dt"] = pd.to_datetime(df_all["closedAt"], format="ISO8601", utc=True, errors='coerce')
-df_all["mergedAt_dt"] = pd.to_datetime(df_all["mergedAt"], format="ISO8601", utc=True, errors='coerce')
+# 期間内のPR数（週×ステータスの集計SQLの合計）
+state_counts = data_access.weekly_pr_counts(owner_tmp, repo_tmp, data_version, days=days).groupby("state")["count"].sum()
 
-# 期間フィルタ
-df_filtered = df_all[df_all["createdAt_dt"] >= cutoff_dt].copy()
-
-st.caption(f"対象PR数: {len(df_filtered)}件 (OPEN: {(df_filtered['state']=='OPEN').sum()}, MERGED: {(df_filtered['state']=='MERGED').sum()}, CLOSED: {(df_filtered['state']=='CLOSED').sum()})")
+st.caption(f"対象PR数: {state_counts.sum()}件 (OPEN: {state_counts.get('OPEN', 0)}, MERGED: {state_counts.get('MERGED', 0)}, CLOSED: {state_counts.get('CLOSED', 0)})")
+st.caption(f"Four Keys は過去{days}日間にマージされたPRで集計（マージ日・UTC の日単位。上の件数は作成日で数えた期間内のPR）")
 
 # ========== Four Keys計算 ==========
+# マージ済みPR = デプロイ。指標はPR保存時に更新される日次・週次ロールアップ（four_keys）の合計で求める
+# 期間はマージ日（UTC の日単位）で絞る。失敗判定（タイトル・ラベルのキーワード一致）も保存時に済んでいる
+failure_keywords = list(four_keys.FAILURE_KEYWORDS)
+fk_summary = data_access.four_keys_summary(owner_tmp, repo_tmp, data_version, days=days)
+daily_rollup = data_access.four_keys_daily(owner_tmp, repo_tmp, data_version, days=days)
+weekly_rollup = data_access.four_keys_weekly(owner_tmp, repo_tmp, data_version, days=days)
+total_deploys = fk_summary["deploys"]
 
 # 1. Deployment Frequency (デプロイ頻度)
-merged_prs = df_filtered[df_filtered["state"] == "MERGED"].copy()
-if not merged_prs.empty:
-    # 週数を計算
-    date_range = (merged_prs["mergedAt_dt"].max() - merged_prs["mergedAt_dt"].min()).days
-    weeks = max(date_range / 7, 1)
-    deployment_frequency = len(merged_prs) / weeks
-    
-    # 週ごとの集計
-    merged_prs["week"] = merged_prs["mergedAt_dt"].dt.to_period("W").astype(str)
-    weekly_deploys = merged_prs.groupby("week").size().reset_index(name="deploys")
-else:
-    deployment_frequency = 0
-    weekly_deploys = pd.DataFrame()
+# 最初と最後のデプロイの間の週数あたり
+deployment_frequency = fk_summary["deployment_frequency"]
+weekly_deploys = weekly_rollup[["week", "deploys"]]
 
 # 2. Lead Time for Changes (変更のリードタイム)
-if not merged_prs.empty:
-    merged_prs["lead_time_hours"] = (merged_prs["mergedAt_dt"] - merged_prs["createdAt_dt"]).dt.total_seconds() / 3600
-    merged_prs["lead_time_days"] = merged_prs["lead_time_hours"] / 24
-    avg_lead_time_days = merged_prs["lead_time_days"].median()  # 中央値を使用
-else:
-    avg_lead_time_days = 0
+# 中央値・散布図はデプロイごとのリードタイム（four_keys_deploys の列だけ）から求める
+avg_lead_time_days = (fk_summary["lead_time_median_hours"] or 0) / 24
+lead_times = data_access.four_keys_lead_times(owner_tmp, repo_tmp, data_version, days=days)
+lead_times["lead_time_days"] = lead_times["lead_time_hours"] / 24
 
 # 3. Change Failure Rate (変更失敗率)
 # 仮定: "revert", "hotfix", "urgent", "fix" などのキーワードを含むPRを失敗と見なす
-failure_keywords = ["revert", "hotfix", "urgent", "fix", "rollback", "emergency", "critical"]
-
-if not merged_prs.empty:
-    merged_prs["is_failure"] = merged_prs.apply(
-        lambda row: any(
-            keyword in str(row["title"]).lower() or 
-            keyword in ",".join(row.get("labels", [])).lower()
-            for keyword in failure_keywords
-        ),
-        axis=1
-    )
-    
-    failure_count = merged_prs["is_failure"].sum()
-    change_failure_rate = (failure_count / len(merged_prs)) * 100 if len(merged_prs) > 0 else 0
-    
-    # 失敗PRリスト
-    failure_prs = merged_prs[merged_prs["is_failure"]].copy()
-else:
-    change_failure_rate = 0
-    failure_prs = pd.DataFrame()
+change_failure_rate = fk_summary["change_failure_rate"]
+# 失敗PRリスト（失敗PRの行だけを読む）
+failure_prs = data_access.four_keys_deploys(owner_tmp, repo_tmp, data_version, days=days, failures_only=True)
 
 # 4. Time to Restore Service (MTTR: Mean Time To Restore)
 # 仮定: 失敗PRの作成からマージまでの時間を復旧時間とする
 if not failure_prs.empty:
     failure_prs["restore_time_hours"] = failure_prs["lead_time_hours"]
-    avg_mttr_hours = failure_prs["restore_time_hours"].median()  # 中央値を使用
-else:
-    avg_mttr_hours = 0
+avg_mttr_hours = fk_summary["mttr_median_hours"] or 0  # 中央値を使用
 
 # 4つのメトリクス表示エリア
 st.markdown("## Four Keys メトリクス")
@@ -290,7 +228,7 @@ with col1:
         <p style="margin: 0; font-weight: bold; color: {color};">DORA Level: {level}</p>
     </div>
     """, unsafe_allow_html=True)
-    st.caption(f"総デプロイ数: {len(merged_prs)}件")
+    st.caption(f"総デプロイ数: {total_deploys}件")
 
 with col2:
     level, color = classify_dora_level(avg_lead_time_days, "lead_time")
@@ -312,7 +250,7 @@ with col3:
         <p style="margin: 0; font-weight: bold; color: {color};">DORA Level: {level}</p>
     </div>
     """, unsafe_allow_html=True)
-    st.caption(f"失敗PR: {len(failure_prs)}件 / {len(merged_prs)}件")
+    st.caption(f"失敗PR: {len(failure_prs)}件 / {total_deploys}件")
 
 with col4:
     level, color = classify_dora_level(avg_mttr_hours, "mttr")
@@ -338,10 +276,9 @@ with col1:
     st.markdown("#### Deployment Frequency")
     df_level, df_color = classify_dora_level(deployment_frequency, "deployment_frequency")
     
-    # 日別デプロイ数を集計
-    if not merged_prs.empty:
-        daily_deploys = merged_prs.groupby(merged_prs["mergedAt_dt"].dt.date).size().reset_index(name="count")
-        daily_deploys.columns = ["date", "count"]
+    # 日別デプロイ数（日次ロールアップ）
+    if total_deploys:
+        daily_deploys = pd.DataFrame({"date": daily_rollup["day"].dt.date, "count": daily_rollup["deploys"]})
         
         fig_df = go.Figure()
         fig_df.add_trace(go.Scatter(
@@ -377,9 +314,8 @@ with col2:
     lt_level, lt_color = classify_dora_level(avg_lead_time_days, "lead_time")
     
     # リードタイムの推移
-    if not merged_prs.empty:
-        lead_time_by_date = merged_prs[["mergedAt_dt", "lead_time_days"]].copy()
-        lead_time_by_date = lead_time_by_date.sort_values("mergedAt_dt")
+    if not lead_times.empty:
+        lead_time_by_date = lead_times[["mergedAt_dt", "lead_time_days"]].copy()
         
         fig_lt = go.Figure()
         fig_lt.add_trace(go.Scatter(
@@ -426,15 +362,12 @@ with col1:
     st.markdown("#### Change Failure Rate")
     cfr_level, cfr_color = classify_dora_level(change_failure_rate, "change_failure_rate")
     
-    # 週ごとの失敗率
-    if not merged_prs.empty:
-        merged_prs["week_period"] = merged_prs["mergedAt_dt"].dt.to_period("W")
-        weekly_failure = merged_prs.groupby("week_period").agg({
-            "is_failure": ["sum", "count"]
-        }).reset_index()
-        weekly_failure.columns = ["week", "failures", "total"]
+    # 週ごとの失敗率（週次ロールアップ）
+    if total_deploys:
+        weekly_failure = weekly_rollup[["week", "failures", "deploys"]].rename(columns={"deploys": "total"})
         weekly_failure["failure_rate"] = (weekly_failure["failures"] / weekly_failure["total"]) * 100
-        weekly_failure["week_str"] = weekly_failure["week"].astype(str)
+        weekly_failure["week_str"] = (weekly_failure["week"].dt.strftime("%Y-%m-%d") + "/"
+                                      + (weekly_failure["week"] + pd.Timedelta(days=6)).dt.strftime("%Y-%m-%d"))
         
         fig_cfr = go.Figure()
         fig_cfr.add_trace(go.Bar(
@@ -461,7 +394,7 @@ with col1:
         delta=f"{cfr_level}",
         delta_color="normal" if cfr_level in ["Elite", "High"] else "inverse"
     )
-    st.caption(f"失敗PR: {len(failure_prs)}件 / {len(merged_prs)}件")
+    st.caption(f"失敗PR: {len(failure_prs)}件 / {total_deploys}件")
 
 # 右下: Mean Time to Restore
 with col2:
@@ -582,10 +515,9 @@ tab1, tab2, tab3, tab4 = st.tabs(["Deployment Frequency", "Lead Time", "Change F
 with tab1:
     st.markdown("### Deployment Frequency (デプロイ頻度)")
     
-    if not merged_prs.empty:
-        # 日別デプロイ数を集計
-        daily_deploys_tab = merged_prs.groupby(merged_prs["mergedAt_dt"].dt.date).size().reset_index(name="count")
-        daily_deploys_tab.columns = ["date", "count"]
+    if total_deploys:
+        # 日別デプロイ数（日次ロールアップ）
+        daily_deploys_tab = pd.DataFrame({"date": daily_rollup["day"].dt.date, "count": daily_rollup["deploys"]})
         
         fig_df = go.Figure()
         fig_df.add_trace(go.Scatter(
@@ -611,7 +543,7 @@ with tab1:
         st.markdown("#### 統計")
         col_a, col_b, col_c = st.columns(3)
         with col_a:
-            st.metric("総デプロイ数", f"{len(merged_prs)}件")
+            st.metric("総デプロイ数", f"{total_deploys}件")
         with col_b:
             st.metric("週平均", f"{deployment_frequency:.1f}件")
         with col_c:
@@ -623,10 +555,9 @@ with tab1:
 with tab2:
     st.markdown("### Lead Time for Changes (変更のリードタイム)")
     
-    if not merged_prs.empty:
+    if total_deploys:
         # リードタイムの時系列推移
-        lead_time_sorted = merged_prs[["mergedAt_dt", "lead_time_days", "number", "title"]].copy()
-        lead_time_sorted = lead_time_sorted.sort_values("mergedAt_dt")
+        lead_time_sorted = lead_times[["mergedAt_dt", "lead_time_days", "number"]].copy()
         
         fig_lt = go.Figure()
         fig_lt.add_trace(go.Scatter(
@@ -663,16 +594,19 @@ with tab2:
         st.markdown("#### 統計")
         col_a, col_b, col_c, col_d = st.columns(4)
         with col_a:
-            st.metric("中央値", f"{merged_prs['lead_time_days'].median():.1f}日")
+            st.metric("中央値", f"{avg_lead_time_days:.1f}日")
         with col_b:
-            st.metric("平均", f"{merged_prs['lead_time_days'].mean():.1f}日")
+            st.metric("平均", f"{(fk_summary['lead_time_mean_hours'] or 0) / 24:.1f}日")
         with col_c:
-            st.metric("最小", f"{merged_prs['lead_time_days'].min():.1f}日")
+            st.metric("最小", f"{(fk_summary['lead_time_min_hours'] or 0) / 24:.1f}日")
         with col_d:
-            st.metric("最大", f"{merged_prs['lead_time_days'].max():.1f}日")
+            st.metric("最大", f"{(fk_summary['lead_time_max_hours'] or 0) / 24:.1f}日")
         
         st.markdown("#### � リードタイムが長いPR TOP10")
-        slow_prs = merged_prs.nlargest(10, "lead_time_days")[["number", "title", "author", "lead_time_days", "url"]]
+        slow_prs = data_access.four_keys_deploys(owner_tmp, repo_tmp, data_version, days=days,
+                                                 order_by_lead_time=True, limit=10)
+        slow_prs["lead_time_days"] = slow_prs["lead_time_hours"] / 24
+        slow_prs = slow_prs[["number", "title", "author", "lead_time_days", "url"]]
         st.dataframe(
             slow_prs.rename(columns={
                 "number": "PR#",
@@ -695,14 +629,10 @@ with tab3:
     これらのキーワードがタイトルまたはラベルに含まれるPRを「失敗」と見なしています。
     """)
     
-    if not merged_prs.empty:
-        # 週ごとの失敗率推移
-        merged_prs_tab = merged_prs.copy()
-        merged_prs_tab["week_start"] = merged_prs_tab["mergedAt_dt"].dt.to_period("W").apply(lambda r: r.start_time)
-        weekly_failure_tab = merged_prs_tab.groupby("week_start").agg({
-            "is_failure": ["sum", "count"]
-        }).reset_index()
-        weekly_failure_tab.columns = ["week", "failures", "total"]
+    if total_deploys:
+        # 週ごとの失敗率推移（週次ロールアップ）
+        weekly_failure_tab = weekly_rollup[["week", "failures", "deploys"]].rename(columns={"deploys": "total"})
+        weekly_failure_tab["week"] = weekly_failure_tab["week"].dt.tz_localize(None)
         weekly_failure_tab["failure_rate"] = (weekly_failure_tab["failures"] / weekly_failure_tab["total"]) * 100
         weekly_failure_tab["success_rate"] = 100 - weekly_failure_tab["failure_rate"]
         
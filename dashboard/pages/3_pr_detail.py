@@ -10,7 +10,10 @@ import streamlit as st
 
 import config
 import db_cache
+import data_access
 import action_tracker
+from business_hours import calculate_business_hours, default_calendar
+import derived
 
 st.set_page_config(page_title="PR詳細", layout="wide", page_icon="📄")
 
@@ -150,41 +153,14 @@ def build_pr_timeline_events(pr: dict) -> list:
     return events
 
 
-def calculate_business_hours(start_dt, end_dt):
-    """営業日ベースの経過時間(平日のみ)を時間単位で算出。
-    土日を完全に除外し、日跨ぎは部分時間を合算。Streamlit他ページと同一ロジック。
-    """
-    import pandas as pd
-    from datetime import datetime, timedelta
-    if start_dt is None or end_dt is None:
-        return 0.0
-    # 文字列ならISOとして解釈
-    if isinstance(start_dt, str):
-        start_dt = pd.to_datetime(start_dt, format="ISO8601", utc=True)
-    if isinstance(end_dt, str):
-        end_dt = pd.to_datetime(end_dt, format="ISO8601", utc=True)
-    # 同日処理
-    if start_dt.date() == end_dt.date():
-        if start_dt.weekday() >= 5:  # 土日
-            return 0.0
-        return (end_dt - start_dt).total_seconds() / 3600
-    current = start_dt
-    total_hours = 0.0
-    while current.date() < end_dt.date():
-        if current.weekday() < 5:
-            next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-            total_hours += (next_day - current).total_seconds() / 3600
-        current = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-    if end_dt.weekday() < 5:
-        total_hours += (end_dt - current).total_seconds() / 3600
-    return total_hours
-
-
 st.title("📄 PR詳細サマリ")
 
 # ページトップにスクロール
 st.markdown('<script>window.scrollTo(0, 0);</script>', unsafe_allow_html=True)
 
+# タイムラインから隣のPRを続けて開くことが多いので、前後この件数を先読みする
+PREFETCH_NEIGHBOURS = 3
+
 # クエリパラメータから情報取得
 query_params = st.query_params
 owner = query_params.get("owner", "")
@@ -205,21 +181,16 @@ except ValueError:
 
 # キャッシュからPRデータを取得
 with st.spinner("PR情報を読み込み中..."):
-    cached_prs = db_cache.load_prs(owner, repo)
+    # 主キーで1件だけ読み込む（前後のPRも先読みしておく）
+    data_version = data_access.get_data_version(owner, repo)
+    pr = data_access.load_pr(owner, repo, data_version, pr_number, prefetch=PREFETCH_NEIGHBOURS)
     
-    if not cached_prs:
+    if not pr and not db_cache.get_cache_info(owner, repo):
         st.error(f"キャッシュにデータがありません。先にダッシュボードでデータを取得してください。")
         if st.button("← ダッシュボードに戻る"):
             st.switch_page("pages/1_dashboard.py")
         st.stop()
     
-    # 該当PRを検索
-    pr = None
-    for p in cached_prs:
-        if p.get("number") == pr_number:
-            pr = p
-            break
-    
     if not pr:
         st.error(f"PR #{pr_number} が見つかりません")
         if st.button("← ダッシュボードに戻る"):
@@ -272,7 +243,7 @@ with col2:
     st.metric("👀 レビュー数", review_count)
 
 with col3:
-    age_days = pr.get("age_hours", 0) / 24
+    age_days = derived.age_hours(pr) / 24
     st.metric("⏱️ 経過日数", f"{age_days:.1f}日")
 
 with col4:
@@ -288,8 +259,9 @@ with col5:
     created_at = pr.get("createdAt")
     end_candidate = pr.get("mergedAt") or pr.get("closedAt") or datetime.now(timezone.utc).isoformat()
     business_hours = calculate_business_hours(created_at, end_candidate)
-    business_days = business_hours / 24.0
-    st.metric("🏢 営業日数", f"{business_days:.1f}日", help="土日を除外した経過日数。深夜もフルカウントで暫定版")
+    business_days = business_hours / default_calendar().hours_per_day
+    st.metric("🏢 営業日数", f"{business_days:.1f}日",
+              help="営業カレンダー（config.BUSINESS_CALENDAR）で数えた経過日数。既定は土日を除外し終日カウント")
 
 st.divider()
 
@@ -8,7 +8,7 @@ from zoneinfo import ZoneInfo
 import json
 
 import config
-import db_cache
+import data_access
 
 st.set_page_config(page_title="統計情報・週間レポート", layout="wide", page_icon="📊")
 
@@ -230,19 +230,11 @@ def analyze_metrics_correlation(df: pd.DataFrame, four_keys: dict) -> dict:
         files_changed = row.get('files_count', 0)
         pr_sizes.append(files_changed)
     
-    # レビュー時間（作成から最初のレビューまでの時間）
-    review_times = []
-    for _, row in df.iterrows():
-        if row.get('first_review_at'):
-            try:
-                created_at = pd.to_datetime(row['createdAt'], format="ISO8601", utc=True)
-                first_review_at = pd.to_datetime(row['first_review_at'], format="ISO8601", utc=True)
-                review_time_days = (first_review_at - created_at).total_seconds() / 86400
-                review_times.append(review_time_days)
-            except:
-                review_times.append(None)
-        else:
-            review_times.append(None)
+    # レビュー時間（作成から最初のレビューまでの時間。取り込み時に計算済みの first_review_hours）
+    if 'first_review_hours' in df.columns:
+        review_times = [None if pd.isna(h) else h / 24 for h in df['first_review_hours']]
+    else:
+        review_times = [None] * len(df)
     
     # Four Keysメトリクスとの相関を分析
     metrics_to_analyze = {
@@ -318,35 +310,6 @@ def display_correlation_insights(correlations: dict) -> list:
             })
     
     return insights
-def calculate_business_hours(start_dt: datetime, end_dt: datetime) -> float:
-    """営業日（平日のみ）で経過時間を計算（時間単位）"""
-    if pd.isna(start_dt) or pd.isna(end_dt):
-        return 0.0
-    
-    if isinstance(start_dt, str):
-        start_dt = pd.to_datetime(start_dt, format="ISO8601", utc=True)
-    if isinstance(end_dt, str):
-        end_dt = pd.to_datetime(end_dt, format="ISO8601", utc=True)
-    
-    if start_dt.date() == end_dt.date():
-        if start_dt.weekday() >= 5:
-            return 0.0
-        return (end_dt - start_dt).total_seconds() / 3600
-    
-    current = start_dt
-    total_hours = 0.0
-    
-    while current.date() < end_dt.date():
-        if current.weekday() < 5:
-            next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-            total_hours += (next_day - current).total_seconds() / 3600
-        current = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), tzinfo=current.tzinfo)
-    
-    if end_dt.weekday() < 5:
-        day_start = datetime.combine(end_dt.date(), datetime.min.time(), tzinfo=end_dt.tzinfo)
-        total_hours += (end_dt - day_start).total_seconds() / 3600
-    
-    return total_hours
 
 
 def calculate_median_lead_time(df: pd.DataFrame) -> float:
@@ -578,19 +541,19 @@ with st.sidebar:
     if st.button("📄 週間レポートをダウンロード", use_container_width=True):
         st.session_state['generate_report'] = True
 
-# データ取得
-cached_data = db_cache.load_prs(owner, repo)
+# データ取得（Four Keys は全期間で計算するため期間は絞らず、使うキーだけ読み込む）
+STATS_COLUMNS = [
+    "number", "title", "state", "author", "createdAt", "closedAt", "mergedAt",
+    "comments_count", "review_details", "reviews_count",
+]
+# データ版ごとにメモ化（日時列は変換済み）
+data_version = data_access.get_data_version(owner, repo)
+df_all = data_access.load_pr_frame(owner, repo, data_version, columns=tuple(STATS_COLUMNS))
 
-if not cached_data:
+if df_all.empty:
     st.error("データがありません。`python fetch_data.py --all` を実行してください。")
     st.stop()
 
-# DataFrameに変換
-df_all = pd.DataFrame(cached_data)
-df_all["createdAt_dt"] = pd.to_datetime(df_all["createdAt"], format="ISO8601", utc=True)
-df_all["closedAt_dt"] = pd.to_datetime(df_all["closedAt"], format="ISO8601", utc=True, errors='coerce')
-df_all["mergedAt_dt"] = pd.to_datetime(df_all["mergedAt"], format="ISO8601", utc=True, errors='coerce')
-
 # Four Keysメトリクスを計算
 four_keys = calculate_four_keys_from_prs(df_all)
 
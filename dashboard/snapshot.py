@@ -0,0 +1,183 @@
+# snapshot.py
+"""
+PRキャッシュの列指向スナップショット（Arrow IPC / Feather v2, 非圧縮）
+
+fetch_data.py の同期後にリポジトリごとに書き出し、ページ側はメモリマップで読み込む。
+日時列（*_dt）・リードタイム・クローズ済みPRの営業時間などの派生列（derived.add_derived_columns）は
+書き出し時に計算済みなので、ページ側では JSONのパースも pd.to_datetime も不要になる。
+スキーマのメタデータにDBの版（形式の版数・db_cache のデータ版・営業カレンダー）を記録し、
+DBや営業カレンダーの設定と一致しないスナップショットは読み込み時に作り直す。
+
+pyarrow が無い環境では load_frame が None を返し、ページは db_cache から読む。
+
+    frame = snapshot.load_frame(owner, repo, since=cutoff_dt, columns=PR_COLUMNS)
+"""
+import os
+import json
+import datetime as dt
+from pathlib import Path
+from typing import Optional, List
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:  # スナップショットは pyarrow がある場合のみ使う
+    pa = None
+
+import db_cache
+import derived
+from business_hours import default_calendar
+
+# 列構成を変えたら上げる（古い形式のファイルは作り直される）
+SNAPSHOT_FORMAT = 2
+METADATA_KEY = b"pr_snapshot"
+
+# スナップショットに含めるキー（thread_details などの大きいフィールドは含めない）
+SNAPSHOT_COLUMNS = [
+    "number", "title", "url", "state", "isDraft", "author",
+    "createdAt", "closedAt", "mergedAt", "updatedAt",
+    "reviewDecision", "mergeable", "mergeStateStatus", "checks_state",
+    "requested_reviewers", "requested_reviewers_list", "review_details", "reviews_count",
+    "unresolved_threads", "review_threads", "changes_requested", "approvals",
+    "comments_count", "additions", "deletions", "changedFiles", "labels", "files",
+]
+# リスト型の列（読み込み時にPythonのリストへ戻す）
+LIST_COLUMNS = ("requested_reviewers_list", "review_details", "labels", "files")
+
+
+def snapshot_path(owner: str, repo: str) -> Path:
+    """スナップショットの保存先（DBと同じディレクトリの snapshots/ 配下）"""
+    return Path(db_cache.DB_PATH).parent / "snapshots" / f"{owner}__{repo}.arrow"
+
+
+def data_stamp(owner: str, repo: str) -> Optional[str]:
+    """DBの現在の版（営業時間の計算に使うカレンダーを含む）。キャッシュが無ければ None"""
+    if not db_cache.get_cache_info(owner, repo):
+        return None
+    return f"{SNAPSHOT_FORMAT}:{db_cache.get_data_version(owner, repo)}:{default_calendar().key}"
+
+
+def _build_table(records: List[dict]) -> "pa.Table":
+    df = derived.add_derived_columns(pd.DataFrame(records))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def build_snapshot(owner: str, repo: str) -> Optional[Path]:
+    """
+    DBからスナップショットを書き出す（一時ファイルに書いてから置き換える）
+    Returns: 書き出したパス（キャッシュが無い・pyarrow が無い場合は None）
+    """
+    if pa is None:
+        return None
+    # 版は読み込み前に取る（読み込み中に更新されても次回の読み込みで作り直される）
+    stamp = data_stamp(owner, repo)
+    if stamp is None:
+        return None
+
+    table = _build_table(db_cache.load_prs(owner, repo, columns=SNAPSHOT_COLUMNS))
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps({
+        "stamp": stamp,
+        "owner": owner,
+        "repo": repo,
+        "built_at": dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = snapshot_path(owner, repo)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    feather.write_feather(table, str(tmp_path), compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _open(path: Path, stamp: str) -> Optional["pa.ipc.RecordBatchFileReader"]:
+    """メモリマップで開き、版が一致すればリーダーを返す"""
+    if not path.exists():
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        metadata = json.loads((reader.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    except (OSError, pa.ArrowException, ValueError):
+        return None
+    return reader if metadata.get("stamp") == stamp else None
+
+
+def refresh_snapshot(owner: str, repo: str) -> bool:
+    """
+    スナップショットがDBより古い（または無い）場合だけ作り直す
+    Returns: 書き出したかどうか
+    """
+    if pa is None:
+        return False
+    stamp = data_stamp(owner, repo)
+    if stamp is None or _open(snapshot_path(owner, repo), stamp) is not None:
+        return False
+    return build_snapshot(owner, repo) is not None
+
+
+def load_snapshot(
+    owner: str,
+    repo: str,
+    since: Optional[dt.datetime] = None,
+    columns: Optional[List[str]] = None,
+    rebuild: bool = True
+) -> Optional["pa.Table"]:
+    """
+    スナップショットをメモリマップで読み込み、期間の絞り込みと列の射影をした Table を返す
+    ファイルが無いかDBより古ければ作り直す（rebuild=False なら None を返す）
+    pyarrow が無い・キャッシュが無い・書き出しに失敗した場合も None
+    """
+    if pa is None:
+        return None
+    stamp = data_stamp(owner, repo)
+    if stamp is None:
+        return None
+
+    path = snapshot_path(owner, repo)
+    reader = _open(path, stamp)
+    if reader is None:
+        if not rebuild:
+            return None
+        try:
+            build_snapshot(owner, repo)
+        except (OSError, pa.ArrowException, ValueError, TypeError) as e:
+            print(f"[WARN] Snapshot build failed for {owner}/{repo}: {e}")
+            return None
+        reader = _open(path, stamp)
+        if reader is None:
+            return None
+
+    table = reader.read_all()
+    if columns is not None:
+        # 派生列（derived.DERIVED_COLUMNS）は columns に関係なく含める
+        extra = [c for c in derived.DERIVED_COLUMNS if c in table.column_names and c not in columns]
+        table = table.select([c for c in columns if c in table.column_names] + extra)
+    if since is not None:
+        table = table.filter(pc.greater_equal(table.column("createdAt_dt"), pa.scalar(since)))
+    return table
+
+
+def load_frame(
+    owner: str,
+    repo: str,
+    since: Optional[dt.datetime] = None,
+    columns: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    load_prs と同じ絞り込み（作成日時が since 以降）と列の射影をした DataFrame
+    リスト型の列はPythonのリストに戻す（db_cache から読んだ場合と同じ形）
+    Returns: DataFrame（スナップショットが使えない場合は None）
+    """
+    table = load_snapshot(owner, repo, since=since, columns=columns)
+    if table is None:
+        return None
+    list_columns = [c for c in LIST_COLUMNS if c in table.column_names]
+    df = table.drop_columns(list_columns).to_pandas()
+    for col in list_columns:
+        df[col] = table.column(col).to_pylist()
+    return df[table.column_names]